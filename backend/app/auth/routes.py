@@ -3,13 +3,15 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError
 
 from app.database import get_db
 from app.models.user import User as UserModel
 from app.schemas.user_schemas import UserCreate, UserOut, Token, LoginRequest, UserUpdate
-from app.auth.security import hash_password, verify_password
+from app.auth.security import password_hasher, PasswordHasherBusyError
 from app.auth.jwt import create_access_token, decode_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.user_cache import AuthenticatedUser, user_cache, AUTH_STATELESS_READS
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -21,56 +23,110 @@ def get_user_by_email(db: Session, email_id: str) -> UserModel | None:
     return db.query(UserModel).filter(UserModel.email_id == email_id).first()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserModel:
+def get_token_user_id(token: str) -> int:
+    """Verify the token's signature and expiry and return its subject."""
     try:
         payload = decode_access_token(token)
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token: subject missing")
+    except HTTPException:
+        raise
     except JWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Token error: {str(e)}")
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
 
     try:
-        user = db.get(UserModel, int(user_id))
-    except Exception:
+        return int(user_id)
+    except (TypeError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid user id in token")
 
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> AuthenticatedUser:
+    user_id = get_token_user_id(token)
+
+    # Served from the identity cache on repeat requests; the database is only hit on a miss
+    cached = user_cache.get(user_id, token)
+    if cached is not None:
+        return cached
+
+    generation = user_cache.generation()
+    user = db.get(UserModel, user_id)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    authenticated = AuthenticatedUser.from_model(user)
+    user_cache.set(user_id, token, authenticated, generation)
+    return authenticated
+
+
+def get_current_user_readonly(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> AuthenticatedUser:
+    """Identity for read-only routes.
+
+    With AUTH_STATELESS_READS the signed claims are trusted as-is and no lookup
+    happens at all, so a deleted user keeps read access until the token expires.
+    """
+    if AUTH_STATELESS_READS:
+        return AuthenticatedUser(id=get_token_user_id(token))
+    return get_current_user(token, db)
+
+
+async def authenticate(db: Session, email_id: str, password: str) -> UserModel:
+    """Check credentials on the password hashing executor; re-hash the stored password if its cost is outdated."""
+    user = await run_in_threadpool(get_user_by_email, db, email_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    except PasswordHasherBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+
+    if new_hash:
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
     return user
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED,summary="Register a New User")
-def register_user(payload: UserCreate, db: Session = Depends(get_db)):
+async def register_user(payload: UserCreate, db: Session = Depends(get_db)):
     """
        Allows a new user to register by providing their first name, last name, email, and password. 
        It checks if the email already exists, securely hashes the password, saves the user in the database, 
        and returns the user details (excluding the password).
     """
-    existing = get_user_by_email(db, payload.email_id)
+    existing = await run_in_threadpool(get_user_by_email, db, payload.email_id)
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
+    try:
+        hashed_password = await password_hasher.hash(payload.password)
+    except PasswordHasherBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+
     user = UserModel(
         first_name=payload.first_name,
         last_name=payload.last_name,
         email_id=payload.email_id,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed_password,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+
+    def save():
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    await run_in_threadpool(save)
     return user
 
 
 @router.post("/login", response_model=Token,summary="User Login")
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
+async def login(payload: LoginRequest, db: Session = Depends(get_db)):
     """Authenticates a user using email and password and returns a JWT token."""
-    user = get_user_by_email(db, payload.email_id)
-    if not user or not verify_password(payload.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    user = await authenticate(db, payload.email_id, payload.password)
 
     access_token = create_access_token({"sub": str(user.id)}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     return {"access_token": access_token, "token_type": "bearer"}
@@ -78,11 +134,9 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/token", response_model=Token,summary="Generate OAuth2 Token")
-def token(payload: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def token(payload: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """OAuth2-compatible token endpoint for Swagger / clients that submit form data."""
-    user = get_user_by_email(db, payload.username)
-    if not user or not verify_password(payload.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    user = await authenticate(db, payload.username, payload.password)
 
     access_token = create_access_token({"sub": str(user.id)}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     return {"access_token": access_token, "token_type": "bearer"}
@@ -90,30 +144,34 @@ def token(payload: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(
 
 
 @router.get("/me", response_model=UserOut,summary="Get Current User")
-def read_me(current_user: UserModel = Depends(get_current_user)):
+def read_me(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Fetches the details of the currently authenticated user using the access token."""
     return current_user
 
 
 @router.put("/me", response_model=UserOut,summary="Update Current User Details")
-def update_me(payload: UserUpdate, current_user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_me(payload: UserUpdate, current_user: AuthenticatedUser = Depends(get_current_user), db: Session = Depends(get_db)):
     """Updates the currently logged-in user's profile details such as first name, last name, and email."""
+    user = db.get(UserModel, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
     # If email change is requested, ensure it's not already taken
-    if payload.email_id and payload.email_id != current_user.email_id:
+    if payload.email_id and payload.email_id != user.email_id:
         existing = get_user_by_email(db, payload.email_id)
         if existing:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
 
     if payload.first_name is not None:
-        current_user.first_name = payload.first_name
+        user.first_name = payload.first_name
     if payload.last_name is not None:
-        current_user.last_name = payload.last_name
+        user.last_name = payload.last_name
     if payload.email_id is not None:
-        current_user.email_id = payload.email_id
+        user.email_id = payload.email_id
 
-    db.add(current_user)
+    db.add(user)
     db.commit()
-    db.refresh(current_user)
-    return current_user
-
-
+    db.refresh(user)
+    # Cached identities still hold the old profile
+    user_cache.invalidate(user.id)
+    return user
@@ -1,8 +1,29 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+
+load_dotenv()
 
+# bcrypt cost factor; stored hashes with a different cost are re-hashed on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads dedicated to hashing, so login bursts can't occupy the shared request thread pool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash operations queued or running before new ones are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
 
 # Use bcrypt for secure password hashing. Ensure 'bcrypt' is installed in requirements.
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 
 def hash_password(plain_password: str) -> str:
@@ -15,3 +36,81 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return password_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify a password; also return a new hash when the stored one uses another cost factor."""
+    return password_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasherBusyError(RuntimeError):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt work awaited from async routes.
+
+    bcrypt releases the GIL, so a few dedicated threads hash in parallel with the
+    rest of the app. Once max_pending operations are queued or running, new ones
+    fail fast instead of piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "max_pending": self.max_pending,
+                "rejected": self._rejected,
+            }
+
+    def _track(self, func, *args):
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def _submit(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusyError("Too many sign-in attempts in progress, please retry shortly")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._track, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, plain_password: str) -> str:
+        return await self._submit(hash_password, plain_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._submit(verify_and_update_password, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.services.lru_cache import LRUCache
+
+
+load_dotenv()
+
+AUTH_USER_CACHE_ENTRIES = int(os.getenv("AUTH_USER_CACHE_ENTRIES", "4096"))
+# Also bounds how long another worker process can serve a profile changed elsewhere
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+# Read-only routes trust the signed token's subject without looking the user up
+AUTH_STATELESS_READS = os.getenv("AUTH_STATELESS_READS", "false").lower() == "true"
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Immutable snapshot of the user behind a request; safe to share between requests and threads."""
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email_id: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, user) -> "AuthenticatedUser":
+        return cls(id=user.id, first_name=user.first_name, last_name=user.last_name, email_id=user.email_id)
+
+
+class UserCache:
+    """TTL-bounded LRU of authenticated users keyed by (user id, token).
+
+    Lookups take a generation number before reading the user and store it with
+    the entry; invalidate() records the generation at which a user changed.
+    Entries stored under an older generation are ignored, so a lookup that raced
+    with an update can't put the old profile back into the cache. Only the most
+    recent invalidations are remembered; entries older than the oldest one
+    forgotten are ignored too, and simply looked up again.
+    """
+
+    def __init__(self, max_entries: int = AUTH_USER_CACHE_ENTRIES, ttl_seconds: float = AUTH_USER_CACHE_TTL_SECONDS):
+        self._cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._max_invalidations = max_entries
+        # user id -> generation of the user's last change, oldest first
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._generation = 0
+        # Generation of the newest invalidation no longer in _invalidated
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Current generation, shared by all users; take it before reading the user for set()."""
+        with self._lock:
+            return self._generation
+
+    def get(self, user_id: int, token: str) -> AuthenticatedUser | None:
+        entry = self._cache.get((user_id, token))
+        if entry is None:
+            return None
+        generation, user = entry
+        with self._lock:
+            stale = generation < max(self._forgotten, self._invalidated.get(user_id, 0))
+        if stale:
+            self._cache.pop((user_id, token))
+            return None
+        return user
+
+    def set(self, user_id: int, token: str, user: AuthenticatedUser, generation: int) -> None:
+        self._cache.set((user_id, token), (generation, user))
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop every cached session of the user (call after changing the user row)."""
+        with self._lock:
+            self._generation += 1
+            self._invalidated[user_id] = self._generation
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self._max_invalidations:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+
+user_cache = UserCache()
@@ -1,19 +1,99 @@
+import uuid
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 SQLALCHEMY_DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+# Optional read replica; read-only routes use it so the primary only handles writes
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("SUPABASE_DB_READ_URL")
+
+# Connections kept open per engine and per process (multiply by uvicorn workers to size the server side).
+# 0 disables client-side pooling, e.g. when a transaction pooler already pools connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Reconnect before the server or a load balancer drops idle connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Connecting through PgBouncer (or Supabase's pooler) in transaction mode, where prepared statements can't be reused
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# asyncio drivers for the sync URL's backend
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    """Same database, reached through an asyncio driver (asyncpg for Postgres)."""
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername))
+    if parsed.get_backend_name() == "postgresql" and "sslmode" in parsed.query:
+        # asyncpg takes ssl=<mode> rather than libpq's sslmode=<mode>
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+
+def engine_options(url: str) -> dict:
+    """Pool and driver settings for an engine on the given URL."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # SQLite is only used for local runs and benchmarks; keep SQLAlchemy's defaults
+        return {}
+
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_SIZE <= 0:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    if DB_PGBOUNCER and parsed.get_driver_name() == "asyncpg":
+        # Each transaction may land on a different server connection: never cache prepared
+        # statements, and name them uniquely so they can't collide with another client's
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+ASYNC_DATABASE_URL = os.getenv("SUPABASE_ASYNC_DB_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
 
 
 # engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+# Used by async route handlers so queries don't block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+
+# Read-only sessions go to the replica when one is configured, otherwise to the primary
+if SQLALCHEMY_READ_DATABASE_URL:
+    read_engine = create_engine(SQLALCHEMY_READ_DATABASE_URL, **engine_options(SQLALCHEMY_READ_DATABASE_URL))
+    async_read_url = to_async_url(SQLALCHEMY_READ_DATABASE_URL)
+    async_read_engine = create_async_engine(async_read_url, **engine_options(async_read_url))
+else:
+    read_engine = engine
+    async_read_engine = async_engine
 
 # session
 SessionLocal = sessionmaker(autoflush=False,bind=engine)
+ReadSessionLocal = sessionmaker(autoflush=False, bind=read_engine)
+# Attributes stay loaded after commit: async sessions can't lazy-load them on access
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -25,4 +105,45 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency for routes that only read; may lag the primary slightly when a replica is configured
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency for async FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def has_read_replica() -> bool:
+    """True when read-only sessions go to a replica that may lag behind the primary."""
+    return read_engine is not engine
+
+
+def pool_status() -> dict:
+    """Checked-out/idle connection counts of each engine, for the health endpoint."""
+    engines = {"primary": engine, "primary_async": async_engine.sync_engine}
+    if read_engine is not engine:
+        engines.update(replica=read_engine, replica_async=async_read_engine.sync_engine)
+    return {name: eng.pool.status() for name, eng in engines.items()}
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    engine.dispose()
+    if read_engine is not engine:
+        await async_read_engine.dispose()
+        read_engine.dispose()
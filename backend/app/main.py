@@ -1,17 +1,34 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import Base, engine
+from app.database import Base, engine, dispose_engines, pool_status
 
 from app.auth.routes import router as auth_router
+from app.auth.security import password_hasher
 from app.routes.document_route import router as document_route
 from app.routes.extract_document_router import router as extract_router
 from app.routes.chat_route import router as chat_router
+from app.routes.analytics_route import router as analytics_router
+from app.services.extraction_job_service import extraction_worker_pool
+from app.services.ocr_service import ocr_engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm OCR readers and start background workers that drain the extraction job queue
+    ocr_engine.start()
+    extraction_worker_pool.start()
+    yield
+    extraction_worker_pool.stop()
+    ocr_engine.stop()
+    password_hasher.stop()
+    await dispose_engines()
 
 
 # FastAPI app instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 # Default local development origins
@@ -38,6 +55,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    # Lets browser clients read the document list's next-page cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -52,9 +71,16 @@ app.include_router(auth_router)
 app.include_router(document_route)
 app.include_router(extract_router)
 app.include_router(chat_router)
+app.include_router(analytics_router)
 
 
 # Root route
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to FastAPI!"}
\ No newline at end of file
+    return {"message": "Welcome to FastAPI!"}
+
+
+@app.get("/health")
+def health():
+    # queue_depth counts hash operations waiting for a password hashing thread
+    return {"status": "ok", "password_hashing": password_hasher.stats(), "database_pools": pool_status()}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -6,6 +6,8 @@ from datetime import datetime
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # Keyset pagination and `since` sync of one document's chat history
+    __table_args__ = (Index("ix_chat_messages_document_user_created_at_id", "document_id", "user_id", "created_at", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
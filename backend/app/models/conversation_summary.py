@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Text, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+
+class ConversationSummary(Base):
+    """Rolling summary of the chat turns that no longer fit the prompt's token budget."""
+    __tablename__ = "conversation_summaries"
+    __table_args__ = (UniqueConstraint("document_id", "user_id", name="uq_conversation_summaries_document_user"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    summary = Column(Text, nullable=False, default="")
+    # Id of the newest chat message folded into the summary
+    summarized_until_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -6,14 +6,19 @@ from datetime import datetime
 
 class Document(Base):
     __tablename__ = "documents"
+    # Keyset pagination of a user's documents, newest first
+    __table_args__ = (Index("ix_documents_user_uploaded_at_id", "user_id", "uploaded_at", "id"),)
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     filename = Column(String)
     original_filename = Column(String)
-    file_path = Column(String, unique=True)
+    # Several documents may share one content-addressed blob
+    file_path = Column(String, index=True)
     file_size = Column(Integer)
     file_type = Column(String)
+    # SHA-256 of the file bytes, used for upload dedup and extraction reuse
+    content_hash = Column(String(64), index=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     # status: active | archived
     status = Column(String, default="active")
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from app.database import Base
+from datetime import datetime
+
+
+class DocumentSearch(Base):
+    """Search row per document: filename plus the searchable fields of its extraction.
+
+    search_vector holds the weighted full-text terms, search_text the same values as
+    plain lowercase text for trigram (substring and fuzzy) matching. Both are written
+    by SearchIndexService whenever the document or its extraction changes.
+    """
+    __tablename__ = "document_search"
+    # Both GIN indexes lead with user_id (btree_gin) so a search only touches the caller's documents
+    __table_args__ = (
+        Index("ix_document_search_user_vector", "user_id", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_document_search_user_text_trgm", "user_id", "search_text",
+            postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    search_text = Column(Text, nullable=False, default="")
+    # Plain text outside Postgres so local SQLite databases can still be created
+    search_vector = Column(TSVECTOR().with_variant(Text(), "sqlite"))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+event.listen(
+    DocumentSearch.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm; CREATE EXTENSION IF NOT EXISTS btree_gin").execute_if(dialect="postgresql"),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Numeric, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -7,7 +7,8 @@ from datetime import datetime
 class ExtractedData(Base):
     __tablename__ = "extracted_data"
     id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    # One extraction per document; concurrent extractions of the same document lose on this index
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True, unique=True)
     bill_id = Column(String)
     bill_type = Column(String)
     invoice_number = Column(String)
@@ -30,6 +31,20 @@ class ExtractedData(Base):
     # Metadata
     extraction_metadata = Column(JSON)  # {source, extraction_method, confidence_score, uploaded_by, extraction_date}
     
+    # Typed copies of the fields above for SQL reporting; kept in step by BillNormalizationService
+    invoice_date_value = Column(Date, index=True)
+    order_date_value = Column(Date)
+    due_date_value = Column(Date)
+    seller_name = Column(String)
+    seller_gstin = Column(String(15), index=True)
+    subtotal = Column(Numeric(14, 2))
+    cgst_total = Column(Numeric(14, 2))
+    sgst_total = Column(Numeric(14, 2))
+    igst_total = Column(Numeric(14, 2))
+    total_tax = Column(Numeric(14, 2))
+    shipping_charges = Column(Numeric(14, 2))
+    grand_total = Column(Numeric(14, 2))
+    
     # System timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
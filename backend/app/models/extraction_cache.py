@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from app.database import Base
+from datetime import datetime
+
+
+class ExtractionCache(Base):
+    """LLM extraction results keyed by the SHA-256 of the uploaded file's bytes."""
+    __tablename__ = "extraction_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)  # raw extraction dict as returned by ExtractionService.extract_from_document
+    created_at = Column(DateTime, default=datetime.utcnow)
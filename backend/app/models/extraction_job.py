@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy.orm import relationship, backref
+from app.database import Base
+from datetime import datetime
+
+
+class ExtractionJob(Base):
+    __tablename__ = "extraction_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # status: queued | running | done | failed
+    status = Column(String, default="queued", nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text)
+    extracted_data_id = Column(Integer, ForeignKey("extracted_data.id", ondelete="SET NULL"))
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Refreshed by the worker while the job runs; a running job whose heartbeat stops is requeued
+    heartbeat_at = Column(DateTime)
+
+    # Jobs are removed by the database cascade when their document is deleted
+    document = relationship("Document", backref=backref("extraction_jobs", passive_deletes=True))
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey
+from app.database import Base
+
+
+class LineItem(Base):
+    """One item row of an extraction with numeric columns, for SQL aggregates over items.
+
+    Rewritten from ExtractedData.items by BillNormalizationService on every write;
+    the database cascade removes the rows along with the extraction.
+    """
+    __tablename__ = "line_items"
+
+    id = Column(Integer, primary_key=True)
+    extracted_data_id = Column(Integer, ForeignKey("extracted_data.id", ondelete="CASCADE"), nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Order of the item on the bill
+    position = Column(Integer, nullable=False)
+    item_name = Column(String)
+    hsn_sac = Column(String, index=True)
+    quantity = Column(Numeric(14, 3))
+    gross_amount = Column(Numeric(14, 2))
+    discount = Column(Numeric(14, 2))
+    taxable_value = Column(Numeric(14, 2))
+    cgst = Column(Numeric(14, 2))
+    sgst = Column(Numeric(14, 2))
+    igst = Column(Numeric(14, 2))
+    total_amount = Column(Numeric(14, 2))
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey
+from app.database import Base
+from datetime import datetime
+
+
+class SpendRollup(Base):
+    """Per-user spend totals for one bucket of one dashboard dimension.
+
+    dimension is 'total' (single bucket 'all'), 'seller' (GSTIN, else seller name),
+    'month' (YYYY-MM of the invoice date) or 'bill_type'. Rows are adjusted by
+    SpendRollupService in the same transaction as every extraction insert, edit
+    and delete, so dashboard reads never touch extracted_data.
+    """
+    __tablename__ = "spend_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(String(16), primary_key=True)
+    bucket = Column(String, primary_key=True)
+    # Display name for the bucket (the seller's name when bucketed by GSTIN)
+    label = Column(String)
+    bill_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(16, 2), nullable=False, default=0)
+    total_tax = Column(Numeric(16, 2), nullable=False, default=0)
+    cgst = Column(Numeric(16, 2), nullable=False, default=0)
+    sgst = Column(Numeric(16, 2), nullable=False, default=0)
+    igst = Column(Numeric(16, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,80 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_read_db
+from app.models.spend_rollup import SpendRollup
+from app.auth.routes import get_current_user_readonly
+from app.schemas.analytics_schemas import SpendBucket, SpendSummary, TaxBreakdown
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Every endpoint reads only the caller's precomputed spend_rollups rows, never extracted_data
+
+
+def tax_breakdown(row: SpendRollup) -> TaxBreakdown:
+    cgst, sgst, igst = float(row.cgst), float(row.sgst), float(row.igst)
+    return TaxBreakdown(cgst=cgst, sgst=sgst, igst=igst, other=max(float(row.total_tax) - cgst - sgst - igst, 0))
+
+
+def to_bucket(row: SpendRollup) -> SpendBucket:
+    return SpendBucket(
+        bucket=row.bucket,
+        label=row.label,
+        bill_count=row.bill_count,
+        total_amount=float(row.total_amount),
+        total_tax=float(row.total_tax),
+        tax=tax_breakdown(row),
+    )
+
+
+async def load_buckets(db: AsyncSession, user_id: int, dimension: str, *order_by, limit: Optional[int] = None) -> list[SpendBucket]:
+    query = select(SpendRollup).where(SpendRollup.user_id == user_id, SpendRollup.dimension == dimension)
+    rows = (await db.scalars(query.order_by(*order_by).limit(limit))).all()
+    return [to_bucket(row) for row in rows]
+
+
+@router.get("/summary", response_model=SpendSummary, summary="Spend Summary",
+    description="Total bills, spend and tax (split into CGST, SGST and IGST) across all of the user's extracted bills.")
+async def spend_summary(user = Depends(get_current_user_readonly), db: AsyncSession = Depends(get_async_read_db)):
+    row = await db.get(SpendRollup, (user.id, "total", "all"))
+    if not row:
+        return SpendSummary(bill_count=0, total_amount=0, total_tax=0, tax=TaxBreakdown())
+    return SpendSummary(
+        bill_count=row.bill_count,
+        total_amount=float(row.total_amount),
+        total_tax=float(row.total_tax),
+        tax=tax_breakdown(row),
+    )
+
+
+@router.get("/by-seller", response_model=list[SpendBucket], summary="Spend by Seller",
+    description="Sellers by total spend, highest first. Sellers are grouped by GSTIN, or by name when the bill has none.")
+async def spend_by_seller(
+    limit: int = Query(20, ge=1, le=200),
+    user = Depends(get_current_user_readonly),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await load_buckets(db, user.id, "seller", SpendRollup.total_amount.desc(), SpendRollup.bucket, limit=limit)
+
+
+@router.get("/by-month", response_model=list[SpendBucket], summary="Spend by Month",
+    description="Spend per invoice month (YYYY-MM), oldest first. Bills without a readable date are under 'Unknown'.")
+async def spend_by_month(
+    start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    user = Depends(get_current_user_readonly),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    buckets = await load_buckets(db, user.id, "month", SpendRollup.bucket)
+    if start or end:
+        buckets = [
+            b for b in buckets
+            if b.bucket != "Unknown" and (not start or b.bucket >= start) and (not end or b.bucket <= end)
+        ]
+    return buckets
+
+
+@router.get("/by-bill-type", response_model=list[SpendBucket], summary="Spend by Bill Type")
+async def spend_by_bill_type(user = Depends(get_current_user_readonly), db: AsyncSession = Depends(get_async_read_db)):
+    return await load_buckets(db, user.id, "bill_type", SpendRollup.total_amount.desc(), SpendRollup.bucket)
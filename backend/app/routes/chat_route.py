@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
-from app.database import get_db
+import json
+import asyncio
+import threading
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, asc, desc
+from app.database import get_async_db, get_async_read_db
 from app.models.chat_message import ChatMessage
 from app.models.document import Document
 from app.schemas.chat_schemas import ChatMessageCreate, ChatMessageResponse, ChatHistoryResponse, ChatResponse
-from app.auth.routes import get_current_user
+from app.auth.routes import get_current_user, get_current_user_readonly
 from app.services.chat_service import ChatService
+from app.services.conversation_memory_service import ConversationMemory
+from app.services.keyset_pagination import encode_cursor, keyset_filter
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -20,14 +28,14 @@ async def send_message(
     document_id: int,
     message_data: ChatMessageCreate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send a message and get AI response. Store in chat history."""
     # Verify document exists and belongs to user
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document.id).where(
         Document.id == document_id,
         Document.user_id == current_user.id
-    ).first()
+    ))
     
     if not document:
         raise HTTPException(
@@ -35,26 +43,21 @@ async def send_message(
             detail="Document not found or you don't have access to it"
         )
     
-    # Get extracted data for the document
-    extracted_data = ChatService.get_extracted_data_for_document(db, document_id)
-    
-    # Get previous conversation history (ordered chronologically, oldest first)
-    # Limit to last 20 messages to avoid token limits while maintaining context
-    # Get most recent messages first, then reverse to chronological order
-    recent_messages = db.query(ChatMessage).filter(
-        ChatMessage.document_id == document_id,
-        ChatMessage.user_id == current_user.id
-    ).order_by(desc(ChatMessage.created_at)).limit(20).all()
+    # Get the rendered extracted data for the document (memoized per extraction version)
+    context = await db.run_sync(ChatService.get_document_context, document_id)
     
-    # Reverse to get chronological order (oldest to newest)
-    conversation_history = list(reversed(recent_messages))
+    # Get previous conversation history: recent turns verbatim (oldest to newest) within the
+    # token budget, older turns as a rolling summary. Loading may call the model to refresh
+    # the summary, so it runs on a worker thread like the response itself.
+    memory = await run_in_threadpool(ConversationMemory.load_in_new_session, document_id, current_user.id)
     
     # Generate AI response with conversation context
-    ai_response = ChatService.generate_response(
+    ai_response = await run_in_threadpool(
+        ChatService.generate_response,
         user_question=message_data.message,
-        extracted_data=extracted_data,
-        conversation_history=conversation_history if conversation_history else None,
-        db=db
+        context=context,
+        conversation_history=memory.turns if memory.turns else None,
+        conversation_summary=memory.summary
     )
     
     # Store message and response in database
@@ -65,8 +68,7 @@ async def send_message(
         response=ai_response
     )
     db.add(chat_message)
-    db.commit()
-    db.refresh(chat_message)
+    await db.commit()
     
     return ChatResponse(
         response=ai_response,
@@ -74,19 +76,142 @@ async def send_message(
     )
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_in_thread(messages, cancelled: threading.Event) -> AsyncIterator[str]:
+    """Response tokens produced on a worker thread that owns the model stream.
+
+    A blocked read can't be interrupted from the event loop, so leaving this
+    generator (client disconnect, cancellation) only sets cancelled; the worker
+    sees it after the chunk in flight and closes the model stream itself.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    def send(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed: nobody is listening any more
+            cancelled.set()
+
+    def produce() -> None:
+        try:
+            for token in ChatService.stream_response(messages, cancelled):
+                send(token)
+        except Exception as e:
+            send(e)
+        finally:
+            send(end)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+    finally:
+        cancelled.set()
+
+
+@router.post("/{document_id}/message/stream", summary="Send Message and Stream AI Response",
+    description=(
+        "Streaming variant of the message endpoint. Responds with Server-Sent Events: a `token` event per chunk "
+        "as the model generates it, then a `done` event with the stored message id once the full response has been "
+        "saved to the chat history (or an `error` event). If the client disconnects, generation stops and nothing is stored."
+    ))
+async def stream_message(
+    document_id: int,
+    message_data: ChatMessageCreate,
+    request: Request,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Send a message and stream the AI response as it is generated."""
+    # Verify document exists and belongs to user
+    document = await db.scalar(select(Document.id).where(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ))
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found or you don't have access to it"
+        )
+    
+    context = await db.run_sync(ChatService.get_document_context, document_id)
+    memory = await run_in_threadpool(ConversationMemory.load_in_new_session, document_id, current_user.id)
+    
+    # Build the prompt now: the request's session is not used once streaming starts
+    messages = ChatService.build_messages(message_data.message, context, memory.turns or None, memory.summary)
+    user_id = current_user.id
+    
+    async def event_stream():
+        # Set when the client goes away mid-response; the producer thread then stops the model stream
+        cancelled = threading.Event()
+        parts = []
+        try:
+            async for token in stream_in_thread(messages, cancelled):
+                if await request.is_disconnected():
+                    return
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+            
+            response_text = "".join(parts).strip()
+            message_id = await ChatService.save_message(document_id, user_id, message_data.message, response_text)
+            yield sse_event("done", {"message_id": message_id, "response": response_text})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            cancelled.set()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{document_id}/history", response_model=ChatHistoryResponse,summary="Get Chat History",
-    description="Retrieve all chat messages and AI responses for a specific document belonging to the authenticated user.")
+    description=(
+        "Retrieve chat messages and AI responses for a specific document belonging to the authenticated user, newest first. "
+        "Page back with `before=<next_cursor>`; fetch only messages newer than a previous response with "
+        "`since=<latest_cursor>`."
+    ))
 async def get_chat_history(
     document_id: int,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user = Depends(get_current_user_readonly),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get chat history for a specific document."""
+    """Get chat history for a specific document, one keyset page at a time."""
+    if before and since:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either before or since, not both")
+    position = None
+    try:
+        if since:
+            position = keyset_filter(ChatMessage.created_at, ChatMessage.id, since, descending=False)
+        elif before:
+            position = keyset_filter(ChatMessage.created_at, ChatMessage.id, before)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Verify document exists and belongs to user
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document.id).where(
         Document.id == document_id,
         Document.user_id == current_user.id
-    ).first()
+    ))
     
     if not document:
         raise HTTPException(
@@ -94,14 +219,27 @@ async def get_chat_history(
             detail="Document not found or you don't have access to it"
         )
     
-    # Get all chat messages for this document, ordered by created_at descending
-    messages = db.query(ChatMessage).filter(
+    query = select(ChatMessage).where(
         ChatMessage.document_id == document_id,
         ChatMessage.user_id == current_user.id
-    ).order_by(desc(ChatMessage.created_at)).all()
+    )
+    if position is not None:
+        query = query.where(position)
+    if since:
+        # Oldest new messages first so a long gap is caught up page by page, then newest first like every page
+        messages = (await db.scalars(query.order_by(asc(ChatMessage.created_at), asc(ChatMessage.id)).limit(limit))).all()
+        messages = list(reversed(messages))
+    else:
+        messages = (await db.scalars(query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id)).limit(limit))).all()
+    
+    next_cursor = None
+    if not since and len(messages) == limit:
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    latest_cursor = encode_cursor(messages[0].created_at, messages[0].id) if messages else since
     
     return ChatHistoryResponse(
         messages=[ChatMessageResponse.model_validate(msg) for msg in messages],
-        total=len(messages)
+        total=len(messages),
+        next_cursor=next_cursor,
+        latest_cursor=latest_cursor
     )
-
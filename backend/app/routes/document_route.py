@@ -1,22 +1,33 @@
 import os
-import uuid
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import Optional
+import mimetypes
+from urllib.parse import quote
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
 from app.models.document import Document
-from app.auth.routes import get_current_user
-from app.database import get_db
-from sqlalchemy import text
+from app.auth.routes import get_current_user, get_current_user_readonly
+from app.database import AsyncSessionLocal, get_async_db, get_async_read_db
+from app.schemas.bulk_upload_schemas import BulkUploadResponse, BulkUploadResult
+from app.services.upload_service import UploadService
+from app.services.storage_service import storage, lock_blobs, parse_byte_range, STORAGE_ACCEL_REDIRECT_PREFIX
+from app.services.bulk_upload_service import BulkUploadService, BULK_UPLOAD_MAX_FILES
+from app.services.extraction_job_service import ExtractionJobService
+from app.services.pdf_text_service import PageTextCache
+from app.services.keyset_pagination import encode_cursor, keyset_filter
+from app.services.read_your_writes import ReadYourWrites
+from app.services.search_service import SearchIndexService
+from app.services.spend_rollup_service import SpendRollupService
+from sqlalchemy import select, text
 
 
 
 router = APIRouter(prefix="/documents",tags=["Document"])
-# Use absolute path relative to backend directory
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Browsers may reuse a downloaded file this long; content-addressed blobs never change
+DOCUMENT_CACHE_MAX_AGE = int(os.getenv("DOCUMENT_CACHE_MAX_AGE", "86400"))
 
 
 
@@ -36,8 +47,22 @@ def validate_file(file: UploadFile):
 
 
 
+def document_to_dict(d: Document) -> dict:
+    # Get name without extension
+    name_without_ext = os.path.splitext(d.original_filename)[0]
+    return {
+        "id": d.id,
+        "name": name_without_ext,
+        "filename": d.filename,
+        "size": d.file_size,
+        "file_type": d.file_type,
+        "uploaded_at": d.uploaded_at.isoformat() if d.uploaded_at else None,
+        "status": d.status,
+    }
+
+
 @router.post("/upload",summary="Upload Document")
-async def upload(file: UploadFile = File(...), user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def upload(file: UploadFile = File(...), user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Uploads a PDF or image file for the authenticated user, stores it in the server, and saves file details in the database."""
     valid, error = validate_file(file)
     if not valid:
@@ -46,38 +71,42 @@ async def upload(file: UploadFile = File(...), user = Depends(get_current_user),
             detail=error
         )
     
-    content = await file.read()
-    if len(content) > 50 * 1024 * 1024:
+    # Stream to disk in chunks; size limit, hash and content sniff are applied as bytes arrive
+    try:
+        stored = await UploadService.store_upload(file)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size exceeds 50MB limit. Please upload a smaller file."
+            detail=str(e)
         )
     
-    ext = Path(file.filename).suffix.lower()
-    filename = f"{Path(file.filename).stem}_{uuid.uuid4()}{ext}"
-    filepath = str(UPLOAD_DIR / filename)
-    
     try:
-        with open(filepath, "wb") as f:
-            f.write(content)
-        
+        # Locked until the commit: a concurrent delete can't remove the blob once put_blob reuses it
+        await db.run_sync(lock_blobs, [stored.file_path])
+        await run_in_threadpool(UploadService.put_blob, stored)
         doc = Document(
             user_id=user.id,
-            filename=filename,
+            filename=stored.filename,
             original_filename=file.filename,
-            file_path=filepath,
-            file_size=len(content),
-            file_type="pdf" if ext == ".pdf" else "image"
+            file_path=stored.file_path,
+            file_size=stored.file_size,
+            file_type="pdf" if stored.mime_type == "application/pdf" else "image",
+            content_hash=stored.content_hash
         )
         db.add(doc)
-        db.commit()
-        db.refresh(doc)
+        await db.flush()
+        # Searchable by filename straight away; the extraction adds its contents later
+        await db.run_sync(SearchIndexService.index_document, doc)
+        await db.commit()
+        await db.run_sync(ReadYourWrites.record, user.id)
         
         return {"id": doc.id, "filename": doc.filename, "size": doc.file_size}
     except Exception as e:
-        # Clean up file if database operation fails
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        await db.rollback()
+        await run_in_threadpool(UploadService.discard, stored)
+        # Remove the blob if this request created it and no other upload has committed it since
+        if stored.created:
+            await release_blobs(db, [stored.file_path])
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -85,15 +114,117 @@ async def upload(file: UploadFile = File(...), user = Depends(get_current_user),
 
 
 
+async def bulk_upload_files(request: Request) -> AsyncIterator[list[StarletteUploadFile]]:
+    """The request's `files` parts, parsed with the bulk limit instead of Starlette's default of 1000 files."""
+    async with request.form(max_files=BULK_UPLOAD_MAX_FILES) as form:
+        files = [part for part in form.getlist("files") if isinstance(part, StarletteUploadFile)]
+        if not files:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files were uploaded")
+        yield files
+
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse, summary="Bulk Upload Documents",
+    description=(
+        "Uploads many PDF or image files in one request, given as several `files` parts and/or ZIP archives "
+        "(expanded server-side; folders are flattened). Files are validated and stored concurrently and all "
+        "documents are saved in one transaction. With extract=true every stored document is queued for extraction. "
+        "Returns a per-file manifest; invalid files are reported as rejected without failing the rest. "
+        f"At most {BULK_UPLOAD_MAX_FILES} files per request."
+    ),
+    # The form is parsed by bulk_upload_files, so describe it here for the docs
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["files"],
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+    }}}}})
+async def upload_bulk(
+    files: list[StarletteUploadFile] = Depends(bulk_upload_files),
+    extract: bool = Query(False),
+    user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        entries = await run_in_threadpool(BulkUploadService.store_all, files, validate_file)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    stored = [entry for entry in entries if entry.stored]
+    docs = [
+        Document(
+            user_id=user.id,
+            filename=entry.stored.filename,
+            original_filename=entry.original_filename,
+            file_path=entry.stored.file_path,
+            file_size=entry.stored.file_size,
+            file_type="pdf" if entry.stored.mime_type == "application/pdf" else "image",
+            content_hash=entry.stored.content_hash
+        )
+        for entry in stored
+    ]
+
+    def index_all(session):
+        for doc in docs:
+            SearchIndexService.index_document(session, doc)
+
+    try:
+        if docs:
+            await db.run_sync(lock_blobs, [entry.stored.file_path for entry in stored])
+            await run_in_threadpool(BulkUploadService.put_all, stored)
+            # One flush inserts every row in a batched INSERT ... RETURNING
+            db.add_all(docs)
+            await db.flush()
+            await db.run_sync(index_all)
+            await db.commit()
+            await db.run_sync(ReadYourWrites.record, user.id)
+    except Exception as e:
+        await db.rollback()
+        await run_in_threadpool(BulkUploadService.discard_all, stored)
+        await release_blobs(db, [entry.stored.file_path for entry in stored if entry.stored.created])
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    jobs, queue_error = {}, None
+    if extract and docs:
+        try:
+            jobs = await db.run_sync(ExtractionJobService.enqueue_new, docs)
+        except Exception as e:
+            # The documents are saved either way; extraction can still be queued per document
+            queue_error = f"Stored, but extraction could not be queued: {e}"
+
+    doc_by_entry = {id(entry): doc for entry, doc in zip(stored, docs)}
+    results = []
+    for entry in entries:
+        doc = doc_by_entry.get(id(entry))
+        if doc is None:
+            results.append(BulkUploadResult(source=entry.source, status="rejected", error=entry.error))
+            continue
+        job = jobs.get(doc.id)
+        results.append(BulkUploadResult(
+            source=entry.source,
+            status="stored",
+            document_id=doc.id,
+            size=doc.file_size,
+            deduplicated=not entry.stored.created,
+            job_id=job.id if job else None,
+            job_status=job.status if job else None,
+            error=queue_error if extract else None,
+        ))
+    return BulkUploadResponse(results=results, stored=len(docs), rejected=len(entries) - len(docs))
+
+
 @router.get("/list", summary="List User Documents")
 async def list_docs(
+    response: Response,
     q: Optional[str] = None,
     file_type: Optional[str] = None,
     status_filter: Optional[str] = None,
+    cursor: Optional[str] = None,
     offset: int = 0,
-    limit: int = 100,
-    user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    user = Depends(get_current_user_readonly),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """Get documents for the authenticated user with optional search and filters.
 
@@ -101,32 +232,41 @@ async def list_docs(
     - q: search term against original filename
     - file_type: 'pdf' or 'image'
     - status: 'active' or 'archived'
-    - offset, limit: pagination
+    - cursor, limit: keyset pagination, newest first. When the page is full the
+      X-Next-Cursor response header holds the cursor of the next page.
+    - offset: legacy pagination, ignored when a cursor is given
     """
+    if cursor:
+        try:
+            after_cursor = keyset_filter(Document.uploaded_at, Document.id, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     try:
-        query = db.query(Document).filter(Document.user_id == user.id)
+        query = select(Document).where(Document.user_id == user.id)
         if q:
             like = f"%{q.lower()}%"
-            query = query.filter(Document.original_filename.ilike(like))
+            query = query.where(Document.original_filename.ilike(like))
         if file_type:
-            query = query.filter(Document.file_type == file_type)
+            query = query.where(Document.file_type == file_type)
         if status_filter:
-            query = query.filter(Document.status == status_filter)
-        docs = query.order_by(Document.uploaded_at.desc()).offset(offset).limit(limit).all()
-
-        def to_dict(d: Document):
-            # Get name without extension
-            name_without_ext = os.path.splitext(d.original_filename)[0]
-            return {
-                "id": d.id,
-                "name": name_without_ext,
-                "filename": d.filename,
-                "size": d.file_size,
-                "file_type": d.file_type,
-                "uploaded_at": d.uploaded_at.isoformat() if d.uploaded_at else None,
-                "status": d.status,
-            }
-        return [to_dict(d) for d in docs]
+            query = query.where(Document.status == status_filter)
+        if cursor:
+            query = query.where(after_cursor)
+        elif offset:
+            query = query.offset(offset)
+        # (uploaded_at, id) is unique, so pages never skip or repeat rows that share a timestamp
+        query = query.order_by(Document.uploaded_at.desc(), Document.id.desc()).limit(limit)
+        if not cursor and not offset and await db.run_sync(ReadYourWrites.replica_behind, user.id):
+            # The first page would miss (or still show) documents the user just uploaded (or deleted)
+            async with AsyncSessionLocal() as primary:
+                docs = (await primary.scalars(query)).all()
+        else:
+            docs = (await db.scalars(query)).all()
+        if len(docs) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(docs[-1].uploaded_at, docs[-1].id)
+
+        return [document_to_dict(d) for d in docs]
     except Exception as e:
         # Log full traceback to help debugging in development
         import traceback
@@ -137,96 +277,196 @@ async def list_docs(
             detail=f"Failed to retrieve documents: {str(e)}"
         )
 
-@router.get("/{doc_id}",summary="Download Document")
-async def get_doc(doc_id: int, user = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/search", summary="Search Documents",
+    description=(
+        "Ranked search over the user's documents by filename, seller and customer names, GSTIN, "
+        "invoice number and item names. Supports quoted phrases and -exclusions; tolerates typos."
+    ))
+async def search_docs(
+    q: str = Query(..., min_length=1, max_length=200),
+    status_filter: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user = Depends(get_current_user_readonly),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    results = await db.run_sync(SearchIndexService.search, user.id, q, limit, status_filter)
+    return [{**document_to_dict(doc), "rank": round(rank, 4)} for doc, rank in results]
+
+
+def content_disposition(filename: str) -> str:
+    # Same form FileResponse uses: RFC 5987 encoding only when the name needs it
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def release_blobs(db: AsyncSession, keys: list[str]) -> set[str]:
+    """Delete blobs that no committed document uses, in a transaction of their own; returns the deleted keys.
+
+    The blob locks make an upload reusing one of them wait until the check and
+    deletion are done, after which it stores the bytes again.
+    """
+    if not keys:
+        return set()
+    try:
+        await db.run_sync(lock_blobs, keys)
+        used = set((await db.scalars(select(Document.file_path).where(Document.file_path.in_(keys)))).all())
+        unused = set(keys) - used
+        for key in unused:
+            await run_in_threadpool(storage.delete, key)
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    return unused
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as If-None-Match requires
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+@router.get("/{doc_id}",summary="Download Document",
+    description=(
+        "Download a specific document by ID. Supports single byte ranges (Range, If-Range) so PDF viewers can "
+        "load large files page by page, and ETag / If-None-Match revalidation (304)."
+    ))
+async def get_doc(doc_id: int, request: Request, user = Depends(get_current_user_readonly), db: AsyncSession = Depends(get_async_db)):
     """Download a specific document by ID."""
-    doc = db.query(Document).filter(Document.id == doc_id, Document.user_id == user.id).first()
+    doc = await db.scalar(select(Document).where(Document.id == doc_id, Document.user_id == user.id))
     if not doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found or you don't have permission to access it."
         )
     
-    if not os.path.exists(doc.file_path):
+    stat = await run_in_threadpool(storage.stat, doc.file_path)
+    if stat is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document file not found on server. It may have been deleted."
         )
     
-    return FileResponse(doc.file_path, filename=doc.original_filename)
+    # The content hash is a strong validator: a blob's bytes never change under its key
+    etag = f'"{doc.content_hash}"' if doc.content_hash else stat.etag or f'"{stat.size:x}-{int(stat.modified.timestamp()):x}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={DOCUMENT_CACHE_MAX_AGE}", "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    media_type = mimetypes.guess_type(doc.original_filename or doc.file_path)[0] or "application/octet-stream"
+    local_file = storage.local_file(doc.file_path)
+    if local_file and STORAGE_ACCEL_REDIRECT_PREFIX and not os.path.isabs(doc.file_path):
+        # nginx serves the bytes (sendfile, ranges) from its internal location
+        return Response(media_type=media_type, headers={
+            **headers,
+            "Content-Disposition": content_disposition(doc.original_filename),
+            "X-Accel-Redirect": f"{STORAGE_ACCEL_REDIRECT_PREFIX}{doc.file_path}",
+        })
+    if local_file:
+        # Handles Range/If-Range itself and uses the server's pathsend extension when offered
+        return FileResponse(local_file, media_type=media_type, filename=doc.original_filename, headers=headers)
+    
+    # Remote storage: fetch only the requested bytes
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), stat.size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{stat.size}"}
+        )
+    if byte_range and request.headers.get("if-range") not in (None, etag):
+        byte_range = None
+    start, end = byte_range or (0, stat.size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Disposition"] = content_disposition(doc.original_filename)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+    return StreamingResponse(
+        storage.iter_range(doc.file_path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 
 @router.delete("/{doc_id}")
-async def delete_doc(doc_id: int, user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def delete_doc(doc_id: int, user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Delete a document and its associated chat messages."""
     
     # First check if document exists and belongs to user
-    doc = db.query(Document).filter(Document.id == doc_id, Document.user_id == user.id).first()
+    doc = await db.scalar(select(Document).where(Document.id == doc_id, Document.user_id == user.id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
     try:
         # Delete associated chat messages first
-        db.execute(
+        await db.execute(
             text("DELETE FROM chat_messages WHERE document_id = :doc_id"), 
             {"doc_id": doc_id}
         )
         
-        # Delete the document from database
-        db.delete(doc)
-        
-        # Try to delete the physical file
-        if os.path.exists(doc.file_path):
-            try:
-                os.remove(doc.file_path)
-            except Exception as e:
-                # Log file deletion error but continue with DB commit
-                print(f"Error deleting file {doc.file_path}: {str(e)}")
+        # Take its bills out of the spend analytics, then delete the document from database
+        await db.run_sync(SpendRollupService.remove_document, doc)
+        await db.delete(doc)
         
         # Commit all changes
-        db.commit()
-        
-        return {"message": "Document and associated data deleted successfully"}
+        await db.commit()
+        await db.run_sync(ReadYourWrites.record, user.id)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to delete document: {str(e)}"
         )
+    
+    # Only now that the row is gone: delete the physical file unless other documents share the blob
+    try:
+        if doc.file_path in await release_blobs(db, [doc.file_path]) and doc.content_hash:
+            # No document has these bytes any more, so their cached page text is dead weight
+            await run_in_threadpool(PageTextCache.remove, doc.content_hash)
+    except Exception as e:
+        # The document is deleted either way; an orphaned blob is reused by the next identical upload
+        print(f"Error deleting file {doc.file_path}: {str(e)}")
+    
+    return {"message": "Document and associated data deleted successfully"}
 
 
 @router.post("/archive/{doc_id}",summary="Archive Document",
     description="Archive a document by setting its status to 'archived'. Only works if the document belongs to the authenticated user.")
-async def archive_doc(doc_id: int, user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def archive_doc(doc_id: int, user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     
-    doc = db.query(Document).filter(Document.id == doc_id, Document.user_id == user.id).first()
+    doc = await db.scalar(select(Document).where(Document.id == doc_id, Document.user_id == user.id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     try:
         doc.status = "archived"
         db.add(doc)
-        db.commit()
-        db.refresh(doc)
+        await db.commit()
+        await db.run_sync(ReadYourWrites.record, user.id)
         return {"message": "Archived", "id": doc.id}
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to archive document")
 
 
 @router.post("/unarchive/{doc_id}")
-async def unarchive_doc(doc_id: int, user = Depends(get_current_user), db: Session = Depends(get_db),summary="Unarchive Document",
+async def unarchive_doc(doc_id: int, user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db),summary="Unarchive Document",
     description="Restore an archived document by setting its status back to 'active'. Only accessible to its owner."):
-    doc = db.query(Document).filter(Document.id == doc_id, Document.user_id == user.id).first()
+    doc = await db.scalar(select(Document).where(Document.id == doc_id, Document.user_id == user.id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     try:
         doc.status = "active"
         db.add(doc)
-        db.commit()
-        db.refresh(doc)
+        await db.commit()
+        await db.run_sync(ReadYourWrites.record, user.id)
         return {"message": "Unarchived", "id": doc.id}
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to unarchive document")
\ No newline at end of file
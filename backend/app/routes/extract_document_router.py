@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import json
-from datetime import datetime
-from app.database import get_db
+from datetime import date, datetime
+from typing import Optional
+from app.database import SessionLocal, get_db, get_read_db, has_read_replica
 from app.models.document import Document
 from app.models.extracted_data import ExtractedData
 from app.schemas.extracted_data_schemas import ExtractedDataOut, ExtractedDataBase
-from app.services.extract_data_service import ExtractionService
-from app.auth.routes import get_current_user
+from app.schemas.extraction_job_schemas import ExtractionJobOut
+from app.schemas.batch_extraction_schemas import BatchExtractionRequest, BatchExtractionResponse
+from app.services.extraction_job_service import ExtractionJobService
+from app.services.batch_extraction_service import EXTRACTION_BATCH_MAX_REQUEST_DOCS
+from app.services.chat_service import ChatService
+from app.services.read_your_writes import ReadYourWrites
+from app.services.search_service import SearchIndexService
+from app.services.bill_normalization_service import BillNormalizationService
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.export_service import ExportService, EXPORT_MEDIA_TYPES
+from app.auth.routes import get_current_user, get_current_user_readonly
 
 router = APIRouter(
     prefix="/document/extract",
@@ -15,13 +26,67 @@ router = APIRouter(
     responses={405: {"description": "Method not allowed"}},
 )
 
-@router.post("/{doc_id}", response_model=ExtractedDataOut,summary="Extract Data from Document",description=(
-        "Extracts data from a document by ID. "
-        "If extraction is already available, it returns the existing result. "
+@router.post("/batch", response_model=BatchExtractionResponse, status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue Data Extraction for Many Documents",
+    description=(
+        "Queues extraction for a list of document IDs and returns a per-document result (202): the queued job, "
+        "or the existing extraction. Workers pack short documents of the same user several to an LLM call. "
+        "Poll each job's status endpoint until it is done. "
+        f"At most {EXTRACTION_BATCH_MAX_REQUEST_DOCS} documents per request. Only the user's own documents are processed."
+    ))
+def extract_batch(
+    request: BatchExtractionRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    if len(request.document_ids) > EXTRACTION_BATCH_MAX_REQUEST_DOCS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {EXTRACTION_BATCH_MAX_REQUEST_DOCS} documents can be extracted per request"
+        )
+    try:
+        results = ExtractionJobService.enqueue_batch(db, request.document_ids, current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return BatchExtractionResponse(results=results)
+
+@router.get("/export", summary="Export Extracted Data",
+    description=(
+        "Streams every extracted bill of the user as CSV, JSONL or Parquet, one row per line item "
+        "(bills without items get a single row). date_from/date_to filter on the invoice date. "
+        "Rows are read through a server-side cursor, so the download starts at once and any size can be exported."
+    ))
+def export_extracted(
+    format: str = Query("csv", pattern="^(csv|jsonl|parquet)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    bill_type: Optional[str] = None,
+    current_user = Depends(get_current_user_readonly)
+):
+    try:
+        chunks = ExportService.stream(
+            current_user.id, format, date_from=date_from, date_to=date_to, bill_type=bill_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    filename = f"bills_{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/{doc_id}", response_model=ExtractionJobOut, status_code=status.HTTP_202_ACCEPTED,summary="Queue Data Extraction for Document",description=(
+        "Queues extraction for a document by ID and returns the extraction job (202). "
+        "If extraction is already available, the finished job is returned with 200. "
+        "Poll the job status endpoint until it is done, then fetch the extracted data. "
         "Only the document owner can access it."
     ))
-def extract_sync(
+def queue_extraction(
     doc_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
@@ -31,31 +96,48 @@ def extract_sync(
     ).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    # 2. Existing extraction
-    existing = db.query(ExtractedData).filter(ExtractedData.document_id == doc_id).first()
-    if existing:
-        return existing
-    # 3. Process extraction
+    # 2. Queue extraction (or reuse an active / finished job)
     try:
-        data = ExtractionService.process_extraction(doc, db)
-        return data
+        job = ExtractionJobService.enqueue(doc, db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    ReadYourWrites.record(db, current_user.id)
+    if job.status == "done":
+        response.status_code = status.HTTP_200_OK
+    return job
+
+@router.get("/jobs/{job_id}", response_model=ExtractionJobOut, summary="Get Extraction Job Status",
+    description="Retrieve the status (queued, running, done or failed) of an extraction job belonging to the authenticated user.")
+def get_extraction_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user_readonly)
+):
+    job = ExtractionJobService.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return job
+
+def load_extraction(db: Session, doc_id: int, user_id: int) -> tuple[Document | None, ExtractedData | None]:
+    doc = db.query(Document).filter(Document.id == doc_id, Document.user_id == user_id).first()
+    if not doc:
+        return None, None
+    return doc, db.query(ExtractedData).filter(ExtractedData.document_id == doc_id).first()
 
 @router.get("/{doc_id}", response_model=ExtractedDataOut,summary="Get Extracted Data",
     description="Retrieve extracted information for a specific document. Returns 404 if the document or extraction data is not found.")
 def get_extracted(
     doc_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_user_readonly)
 ):
-    doc = db.query(Document).filter(
-        Document.id == doc_id, Document.user_id == current_user.id
-    ).first()
+    doc, data = load_extraction(db, doc_id, current_user.id)
+    if (not doc or not data) and has_read_replica():
+        # Fresh upload or extraction the replica hasn't replayed yet (e.g. just after its job reported done)
+        with SessionLocal() as primary:
+            doc, data = load_extraction(primary, doc_id, current_user.id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    data = db.query(ExtractedData).filter(ExtractedData.document_id == doc_id).first()
     if not data:
         raise HTTPException(status_code=404, detail="Extraction not found")
     
@@ -92,6 +174,8 @@ def update_extracted(
     data = db.query(ExtractedData).filter(ExtractedData.document_id == doc_id).first()
     if not data:
         raise HTTPException(status_code=404, detail="Extraction not found")
+    # Spend rollup contribution of the extraction as it was before this edit
+    previous_spend = SpendRollupService.deltas(doc.user_id, data, sign=-1)
     
     # 3. Update fields that are provided (not None)
     update_dict = updated_data.model_dump(exclude_unset=True)
@@ -118,9 +202,16 @@ def update_extracted(
     # Update timestamp
     data.updated_at = datetime.utcnow()
     
+    # Keep typed reporting columns, line items, spend rollups and search in step with the edit
+    BillNormalizationService.refresh(db, data)
+    SpendRollupService.apply(db, previous_spend + SpendRollupService.deltas(doc.user_id, data))
+    SearchIndexService.index_document(db, doc, data)
+    
     # Save changes
     db.commit()
+    ReadYourWrites.record(db, current_user.id)
     db.refresh(data)
+    ChatService.invalidate_document_context(doc_id)
     
     # Parse JSON fields for response
     for field in json_fields:
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class TaxBreakdown(BaseModel):
+    cgst: float = 0
+    sgst: float = 0
+    igst: float = 0
+    # Tax reported in bill summaries but not split into CGST/SGST/IGST
+    other: float = 0
+
+
+class SpendBucket(BaseModel):
+    bucket: str
+    label: Optional[str] = None
+    bill_count: int
+    total_amount: float
+    total_tax: float
+    tax: TaxBreakdown
+
+
+class SpendSummary(BaseModel):
+    bill_count: int
+    total_amount: float
+    total_tax: float
+    tax: TaxBreakdown
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+
+class BatchExtractionRequest(BaseModel):
+    document_ids: List[int] = Field(..., min_length=1)
+
+
+class BatchExtractionResult(BaseModel):
+    document_id: int
+    # queued | exists | not_found
+    status: str
+    extracted_data_id: Optional[int] = None
+    job_id: Optional[int] = None
+
+
+class BatchExtractionResponse(BaseModel):
+    results: List[BatchExtractionResult]
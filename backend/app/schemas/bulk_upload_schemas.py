@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class BulkUploadResult(BaseModel):
+    # Part filename, or "<archive>.zip/<path inside the archive>"
+    source: str
+    # stored | rejected
+    status: str
+    document_id: Optional[int] = None
+    size: Optional[int] = None
+    # True when identical bytes were already on the server and the stored file is shared
+    deduplicated: bool = False
+    # Set when extraction was requested: queued | done
+    job_id: Optional[int] = None
+    job_status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    results: List[BulkUploadResult]
+    stored: int
+    rejected: int
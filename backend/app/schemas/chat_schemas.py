@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 
 class ChatMessageCreate(BaseModel):
@@ -21,6 +22,10 @@ class ChatMessageResponse(BaseModel):
 class ChatHistoryResponse(BaseModel):
     messages: list[ChatMessageResponse]
     total: int
+    # Pass as `before` for the next (older) page; null on the last page
+    next_cursor: Optional[str] = None
+    # Pass as `since` to fetch only messages newer than this page
+    latest_cursor: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
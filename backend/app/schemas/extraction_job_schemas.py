@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class ExtractionJobOut(BaseModel):
+    id: int
+    document_id: int
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    extracted_data_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,253 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from langchain_core.messages import HumanMessage
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.services.extract_data_service import ExtractionService, EXTRACTION_SCHEMA, llm
+from app.services.llm_service import estimate_tokens
+from app.services.template_extraction_service import TemplateExtractionService
+from app.services.chat_service import ChatService
+from app.services.search_service import SearchIndexService
+from app.services.bill_normalization_service import BillNormalizationService
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.storage_service import storage
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Documents whose text is longer than this are never packed with others
+EXTRACTION_BATCH_MAX_DOC_TOKENS = int(os.getenv("EXTRACTION_BATCH_MAX_DOC_TOKENS", "1500"))
+# Upper bound on the document text packed into one prompt
+EXTRACTION_BATCH_MAX_PROMPT_TOKENS = int(os.getenv("EXTRACTION_BATCH_MAX_PROMPT_TOKENS", "6000"))
+# More documents per prompt means a longer response, which is slower to generate and easier to truncate
+EXTRACTION_BATCH_MAX_DOCS = int(os.getenv("EXTRACTION_BATCH_MAX_DOCS", "8"))
+# Text extraction and LLM calls in flight at once for one batch
+EXTRACTION_BATCH_CONCURRENCY = int(os.getenv("EXTRACTION_BATCH_CONCURRENCY", "4"))
+# Documents the batch endpoint queues per request
+EXTRACTION_BATCH_MAX_REQUEST_DOCS = int(os.getenv("EXTRACTION_BATCH_MAX_REQUEST_DOCS", "200"))
+
+
+class BatchExtractionService:
+    @staticmethod
+    def pack(entries: List[tuple[Document, str]]) -> tuple[List[List[tuple[Document, str]]], List[tuple[Document, str]]]:
+        """Group short documents into multi-document prompts; return (groups, singles).
+
+        Groups are filled in order until the next document would exceed the token or
+        document limit. A group that ends up with one document is sent on its own.
+        """
+        groups, singles = [], []
+        current, current_tokens = [], 0
+        for doc, text in entries:
+            tokens = estimate_tokens(text)
+            if tokens > EXTRACTION_BATCH_MAX_DOC_TOKENS:
+                singles.append((doc, text))
+                continue
+            if current and (len(current) >= EXTRACTION_BATCH_MAX_DOCS or current_tokens + tokens > EXTRACTION_BATCH_MAX_PROMPT_TOKENS):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append((doc, text))
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+
+        packed = []
+        for group in groups:
+            if len(group) == 1:
+                singles.extend(group)
+            else:
+                packed.append(group)
+        return packed, singles
+
+    @staticmethod
+    def build_batch_prompt(group: List[tuple[Document, str]]) -> str:
+        documents = "\n\n".join(f"=== DOCUMENT {doc.id} ===\n'''{text}'''" for doc, text in group)
+        return (
+            "Extract ALL information from each of the following bills or receipts (plain text content). "
+            "Return ONLY a valid JSON array with one object per document. Every object must contain a "
+            '"document_key" field set to the key from the document\'s "=== DOCUMENT <key> ===" header, '
+            "plus the following structure:\n"
+            + EXTRACTION_SCHEMA +
+            "Return ONLY the JSON array with all fields as shown above. NO markdown, NO extra text. "
+            "Parse from these documents:\n"
+            f"{documents}"
+        )
+
+    @staticmethod
+    def extract_group(group: List[tuple[Document, str]]) -> dict[int, dict]:
+        """One LLM call for several documents; returns the results that came back keyed and well-formed."""
+        messages = [HumanMessage(content=BatchExtractionService.build_batch_prompt(group))]
+        text = llm.invoke(messages).strip()
+        try:
+            parsed = ExtractionService.parse_llm_json(text)
+            if not isinstance(parsed, list):
+                raise ValueError(f"Expected a JSON array for {len(group)} documents; got {type(parsed)}")
+        except Exception:
+            # Keep the unusable reply out of the response cache, so a retry asks the model again
+            llm.forget(messages)
+            raise
+
+        docs = {str(doc.id): doc for doc, _ in group}
+        results = {}
+        for entry in parsed:
+            if not isinstance(entry, dict):
+                continue
+            doc = docs.get(str(entry.pop("document_key", "")))
+            if doc is not None and doc.id not in results:
+                results[doc.id] = ExtractionService.normalize_extraction(entry, doc)
+        return results
+
+    @staticmethod
+    def extract_pages(doc: Document) -> list[str]:
+        with storage.local_path(doc.file_path) as path:
+            return ExtractionService.extract_pages_from_file(path, cache_key=doc.content_hash)
+
+    @classmethod
+    def extract(cls, docs: List[Document]) -> tuple[dict[int, dict | Exception], dict]:
+        """Extract many documents with as few LLM calls as possible.
+
+        Returns (results by document id, stats). A result is the raw extraction or
+        the exception that stopped it. Known layouts are read by the template rules
+        and never reach the LLM; the rest is compacted before it is packed. Documents missing from a multi-document
+        response, or from a response that does not parse, are retried one by one.
+        """
+        results: dict[int, dict | Exception] = {}
+        stats = {
+            "batched_calls": 0,
+            "single_calls": 0,
+            "fallbacks": 0,
+            "templated": 0,
+            "prompt_tokens_before": 0,
+            "prompt_tokens_after": 0,
+        }
+
+        with ThreadPoolExecutor(max_workers=EXTRACTION_BATCH_CONCURRENCY) as pool:
+            entries = []
+            extracted_pages = pool.map(lambda doc: _capture(cls.extract_pages, doc), docs)
+            for doc, pages in zip(docs, extracted_pages):
+                if isinstance(pages, Exception):
+                    results[doc.id] = RuntimeError(f"Error during extraction: {str(pages)}")
+                    continue
+                text = "\n".join(pages).strip()
+                if not text:
+                    results[doc.id] = ValueError("No text could be extracted from the document")
+                    continue
+                templated = TemplateExtractionService.extract(text)
+                if templated is not None:
+                    results[doc.id] = ExtractionService.normalize_extraction(templated, doc)
+                    stats["templated"] += 1
+                    continue
+                prompt_text, compaction = ExtractionService.compact_for_prompt(doc, pages)
+                stats["prompt_tokens_before"] += compaction["tokens_before"]
+                stats["prompt_tokens_after"] += compaction["tokens_after"]
+                entries.append((doc, prompt_text))
+
+            groups, singles = cls.pack(entries)
+            stats["batched_calls"] = len(groups)
+            for group, outcome in zip(groups, pool.map(lambda group: _capture(cls.extract_group, group), groups)):
+                if isinstance(outcome, Exception):
+                    logger.warning("Batch of %d documents failed, retrying singly: %s", len(group), outcome)
+                    outcome = {}
+                missing = [(doc, text) for doc, text in group if doc.id not in outcome]
+                stats["fallbacks"] += len(missing)
+                singles.extend(missing)
+                results.update(outcome)
+
+            stats["single_calls"] = len(singles)
+            outcomes = pool.map(lambda entry: _capture(ExtractionService.extract_from_text, *entry), singles)
+            for (doc, _), outcome in zip(singles, outcomes):
+                results[doc.id] = outcome
+        return results, stats
+
+    @staticmethod
+    def _insert_rows(db: Session, docs: dict[int, Document], rows: List[dict], raw_results: dict, cached_ids: set) -> dict[int, int]:
+        """Insert extractions with one statement; returns extracted_data ids by document id.
+
+        A document extracted meanwhile by someone else keeps that extraction, whose id is returned instead.
+        """
+        now = datetime.utcnow()
+        for row in rows:
+            row["created_at"] = now
+            row["updated_at"] = now
+        stmt = (pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert)(ExtractedData)
+        inserted = dict(
+            (document_id, data_id) for data_id, document_id in db.execute(
+                stmt.on_conflict_do_nothing(index_elements=[ExtractedData.document_id])
+                .returning(ExtractedData.id, ExtractedData.document_id),
+                rows
+            )
+        )
+        new_rows = [row for row in rows if row["document_id"] in inserted]
+        BillNormalizationService.insert_line_items(
+            db, [(inserted[row["document_id"]], row["document_id"], row["items"]) for row in new_rows]
+        )
+        SpendRollupService.apply(db, [
+            delta for row in new_rows
+            for delta in SpendRollupService.deltas(docs[row["document_id"]].user_id, row)
+        ])
+        for row in new_rows:
+            doc = docs[row["document_id"]]
+            SearchIndexService.index_document(db, doc, row)
+            if doc.id not in cached_ids:
+                ExtractionService.store_cached_extraction(db, doc.content_hash, raw_results[doc.id])
+
+        skipped = [row["document_id"] for row in rows if row["document_id"] not in inserted]
+        if skipped:
+            return {**inserted, **dict(db.query(ExtractedData.document_id, ExtractedData.id).filter(
+                ExtractedData.document_id.in_(skipped)
+            ).all())}
+        return inserted
+
+    @classmethod
+    def save_results(cls, db: Session, docs: dict[int, Document], raw_results: dict[int, dict | Exception], cached_ids: set = frozenset()) -> tuple[dict[int, int], dict[int, Exception]]:
+        """Store extraction results with one bulk insert and commit.
+
+        When the bulk insert fails, the rows are inserted one by one so a single bad
+        row can't lose the rest. Returns (extracted_data ids, errors), both keyed by
+        document id; results that were already exceptions are passed through as errors.
+        """
+        errors = {doc_id: raw for doc_id, raw in raw_results.items() if isinstance(raw, Exception)}
+        rows = []
+        for doc_id, raw in raw_results.items():
+            if isinstance(raw, Exception):
+                continue
+            row = _capture(ExtractionService.build_extraction_row, docs[doc_id], raw)
+            if isinstance(row, Exception):
+                errors[doc_id] = ValueError(f"Failed to save extracted data: {str(row)}")
+            else:
+                rows.append(row)
+        if not rows:
+            return {}, errors
+
+        try:
+            with db.begin_nested():
+                inserted = cls._insert_rows(db, docs, rows, raw_results, cached_ids)
+        except Exception as e:
+            logger.warning("Bulk insert of %d extractions failed, inserting one by one: %s", len(rows), e)
+            inserted = {}
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        inserted.update(cls._insert_rows(db, docs, [row], raw_results, cached_ids))
+                except Exception as e:
+                    errors[row["document_id"]] = ValueError(f"Failed to save extracted data: {str(e)}")
+        db.commit()
+        for doc_id in inserted:
+            ChatService.invalidate_document_context(doc_id)
+        return inserted, errors
+
+
+def _capture(func, *args):
+    """Run func, returning its exception instead of raising so one document can't sink the batch."""
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
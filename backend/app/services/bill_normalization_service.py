@@ -0,0 +1,145 @@
+import re
+import json
+import logging
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.extracted_data import ExtractedData
+from app.models.line_item import LineItem
+from app.services.template_extraction_service import parse_date
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ("subtotal", "cgst_total", "sgst_total", "igst_total", "total_tax", "shipping_charges", "grand_total")
+ITEM_AMOUNT_FIELDS = ("quantity", "gross_amount", "discount", "taxable_value", "cgst", "sgst", "igst", "total_amount")
+DATE_FIELDS = ("invoice_date", "order_date", "due_date")
+NUMBER_NOISE = re.compile(r"[₹,\s]|Rs\.?|INR", re.IGNORECASE)
+
+
+def load_json_field(value):
+    """JSON column value as Python data; edited extractions may hold it as a serialized string."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def parse_number(value, column) -> Decimal | None:
+    """Amount or quantity as a Decimal for a Numeric column, accepting numbers and strings like '₹1,180.00'.
+
+    Rounded to the column's scale the way the database would; None when it doesn't
+    fit the column's precision (Numeric(14, 3) holds 11 integer digits, Numeric(14, 2) 12).
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(str(value)) if isinstance(value, (int, float, Decimal)) else Decimal(NUMBER_NOISE.sub("", str(value)))
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    precision, scale = column.type.precision, column.type.scale
+    if number.adjusted() >= precision - scale:
+        return None
+    number = number.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+    # Rounding can carry into one more digit (99.995 -> 100.00)
+    if abs(number) >= Decimal(10) ** (precision - scale):
+        return None
+    return number
+
+
+def parse_bill_date(value) -> date | None:
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return None
+    normalized = parse_date(value) or parse_date(value.strip()[:10])
+    return datetime.strptime(normalized, "%Y-%m-%d").date() if normalized else None
+
+
+class BillNormalizationService:
+    @staticmethod
+    def typed_columns(extracted: ExtractedData | dict) -> dict:
+        """Typed date, seller and summary columns derived from an extraction's string and JSON fields."""
+        def get(name):
+            return extracted.get(name) if isinstance(extracted, dict) else getattr(extracted, name, None)
+
+        seller = load_json_field(get("seller"))
+        seller = seller if isinstance(seller, dict) else {}
+        summary = load_json_field(get("summary"))
+        summary = summary if isinstance(summary, dict) else {}
+
+        columns = {f"{field}_value": parse_bill_date(get(field)) for field in DATE_FIELDS}
+        columns["seller_name"] = (str(seller.get("name")).strip() or None) if seller.get("name") else None
+        gstin = re.sub(r"\s+", "", str(seller.get("gstin") or "")).upper()
+        columns["seller_gstin"] = gstin if len(gstin) == 15 else None
+        columns.update({
+            field: parse_number(summary.get(field), getattr(ExtractedData, field)) for field in SUMMARY_FIELDS
+        })
+        return columns
+
+    @staticmethod
+    def line_item_rows(extracted_data_id: int, document_id: int, items) -> list[dict]:
+        items = load_json_field(items)
+        rows = []
+        for position, item in enumerate(items if isinstance(items, list) else []):
+            if not isinstance(item, dict):
+                continue
+            row = {
+                "extracted_data_id": extracted_data_id,
+                "document_id": document_id,
+                "position": position,
+                "item_name": item.get("item_name"),
+                "hsn_sac": str(item["hsn_sac"]) if item.get("hsn_sac") is not None else None,
+            }
+            row.update({field: parse_number(item.get(field), getattr(LineItem, field)) for field in ITEM_AMOUNT_FIELDS})
+            rows.append(row)
+        return rows
+
+    @classmethod
+    def insert_line_items(cls, db: Session, extracted_rows: list[tuple[int, int, object]]) -> None:
+        """Bulk insert line items for (extracted_data_id, document_id, items) triples, in the caller's transaction."""
+        rows = [row for data_id, doc_id, items in extracted_rows for row in cls.line_item_rows(data_id, doc_id, items)]
+        if rows:
+            db.execute(insert(LineItem), rows)
+
+    @classmethod
+    def refresh(cls, db: Session, data: ExtractedData) -> None:
+        """Recompute an existing extraction's typed columns and line items after its fields changed."""
+        for column, value in cls.typed_columns(data).items():
+            setattr(data, column, value)
+        db.execute(delete(LineItem).where(LineItem.extracted_data_id == data.id))
+        cls.insert_line_items(db, [(data.id, data.document_id, data.items)])
+
+    @classmethod
+    def backfill(cls, db: Session, batch_size: int = 500) -> int:
+        """Populate typed columns and line items for every extraction; returns the number processed."""
+        processed, last_id = 0, 0
+        while True:
+            rows = db.scalars(
+                select(ExtractedData).where(ExtractedData.id > last_id).order_by(ExtractedData.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return processed
+            for data in rows:
+                cls.refresh(db, data)
+            last_id = rows[-1].id
+            db.commit()
+            db.expunge_all()
+            processed += len(rows)
+            logger.info("Normalized %d extractions", processed)
+
+
+if __name__ == "__main__":
+    # Backfill typed columns and line items for existing extractions: python -m app.services.bill_normalization_service
+    from app.database import SessionLocal
+    from app.models import document, user  # noqa: F401 (registers the tables extracted_data references)
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        print(f"Normalized {BillNormalizationService.backfill(session)} extractions")
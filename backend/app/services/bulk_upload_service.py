@@ -0,0 +1,138 @@
+import os
+import logging
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Callable, BinaryIO
+
+from fastapi import UploadFile
+
+from app.services.upload_service import UploadService, StoredUpload, EXTENSION_MIME, MAX_UPLOAD_SIZE, MAX_UPLOAD_SIZE_MB
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Files (multipart parts plus ZIP entries) accepted per bulk request
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "2000"))
+# Threads copying, hashing and sniffing files concurrently
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", "4"))
+
+
+@dataclass
+class BulkEntry:
+    # Name shown in the manifest: the part's filename, or "archive.zip/path/in/zip.pdf"
+    source: str
+    original_filename: str
+    stored: StoredUpload | None = None
+    error: str | None = None
+
+
+def is_zip(file: UploadFile) -> bool:
+    return Path(file.filename or "").suffix.lower() == ".zip"
+
+
+class BulkUploadService:
+    @staticmethod
+    def _zip_entries(archive: zipfile.ZipFile, archive_name: str) -> list[tuple[BulkEntry, Callable[[], BinaryIO] | None]]:
+        """(entry, opener) for every file in the archive; entries rejected up front get no opener."""
+        entries = []
+        for info in archive.infolist():
+            path = PurePosixPath(info.filename)
+            # Folders and OS metadata (__MACOSX/, .DS_Store) aren't receipts
+            if info.is_dir() or path.name.startswith(".") or "__MACOSX" in path.parts:
+                continue
+            entry = BulkEntry(source=f"{archive_name}/{info.filename}", original_filename=path.name)
+            if path.suffix.lower() not in EXTENSION_MIME:
+                entry.error = "Invalid file type"
+                entries.append((entry, None))
+            elif info.file_size > MAX_UPLOAD_SIZE:
+                # Declared size; the copy enforces the limit again on the actual bytes
+                entry.error = f"File size exceeds {MAX_UPLOAD_SIZE_MB}MB limit. Please upload a smaller file."
+                entries.append((entry, None))
+            else:
+                entries.append((entry, lambda info=info: archive.open(info)))
+        return entries
+
+    @classmethod
+    def collect(cls, files: list[UploadFile], validate: Callable[[UploadFile], tuple[bool, str | None]]) -> tuple[list, list[zipfile.ZipFile]]:
+        """Expand the request's parts into (entry, opener) pairs; plain files are checked with validate.
+
+        Only ZIP central directories are read here; entry bytes are decompressed later,
+        while being stored. Raises ValueError when the request holds too many files.
+        """
+        entries, archives = [], []
+        try:
+            for file in files:
+                if is_zip(file):
+                    try:
+                        archive = zipfile.ZipFile(file.file)
+                    except zipfile.BadZipFile:
+                        entries.append((BulkEntry(source=file.filename, original_filename=file.filename, error="Invalid ZIP archive"), None))
+                        continue
+                    archives.append(archive)
+                    entries.extend(cls._zip_entries(archive, file.filename))
+                else:
+                    entry = BulkEntry(source=file.filename or "", original_filename=file.filename or "")
+                    valid, error = validate(file)
+                    if valid:
+                        file.file.seek(0)
+                        entries.append((entry, lambda file=file: file.file))
+                    else:
+                        entry.error = error
+                        entries.append((entry, None))
+                if len(entries) > BULK_UPLOAD_MAX_FILES:
+                    raise ValueError(f"At most {BULK_UPLOAD_MAX_FILES} files can be uploaded per request")
+        except BaseException:
+            for archive in archives:
+                archive.close()
+            raise
+        return entries, archives
+
+    @staticmethod
+    def _store(entry: BulkEntry, opener: Callable[[], BinaryIO]) -> None:
+        try:
+            source = opener()
+            try:
+                entry.stored = UploadService.store_fileobj(source, entry.original_filename)
+            finally:
+                # Uploaded parts are closed by the framework; ZIP entry streams are ours
+                if isinstance(source, zipfile.ZipExtFile):
+                    source.close()
+        except (ValueError, zipfile.BadZipFile, RuntimeError, OSError) as e:
+            # RuntimeError: encrypted entry; OSError/BadZipFile: corrupt entry data
+            entry.error = str(e)
+
+    @classmethod
+    def store_all(cls, files: list[UploadFile], validate) -> list[BulkEntry]:
+        """Validate and stage every file of a bulk request concurrently; returns entries in request order.
+
+        Blocking: call from a worker thread. Each entry ends up with either stored or error;
+        staged files are moved into storage by put_all.
+        """
+        entries, archives = cls.collect(files, validate)
+        try:
+            with ThreadPoolExecutor(max_workers=BULK_UPLOAD_WORKERS, thread_name_prefix="bulk-upload") as pool:
+                for future in [pool.submit(cls._store, entry, opener) for entry, opener in entries if opener]:
+                    future.result()
+        finally:
+            for archive in archives:
+                archive.close()
+        stored = sum(1 for entry, _ in entries if entry.stored)
+        logger.info("Bulk upload stored %d of %d files", stored, len(entries))
+        return [entry for entry, _ in entries]
+
+    @staticmethod
+    def put_all(entries: list[BulkEntry]) -> None:
+        """Move every staged file into storage concurrently (see UploadService.put_blob). Blocking."""
+        with ThreadPoolExecutor(max_workers=BULK_UPLOAD_WORKERS, thread_name_prefix="bulk-upload") as pool:
+            list(pool.map(UploadService.put_blob, [entry.stored for entry in entries if entry.stored]))
+
+    @staticmethod
+    def discard_all(entries: list[BulkEntry]) -> None:
+        for entry in entries:
+            if entry.stored:
+                UploadService.discard(entry.stored)
@@ -1,17 +1,24 @@
-import json
 import os
-from typing import List, Optional
+import json
+import threading
+from typing import Iterator, List, Optional
 from sqlalchemy.orm import Session
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from app.database import AsyncSessionLocal
 from app.models.extracted_data import ExtractedData
 from app.models.chat_message import ChatMessage
+from app.services.llm_service import get_llm, LLM_CACHE_CHAT
+from app.services.lru_cache import LRUCache
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", api_key=GEMINI_API_KEY, temperature=0.7)
+llm = get_llm(temperature=0.7, cached=LLM_CACHE_CHAT)
+
+CHAT_CONTEXT_CACHE_ENTRIES = int(os.getenv("CHAT_CONTEXT_CACHE_ENTRIES", "1024"))
+# document_id -> ((extracted_data.id, updated_at), rendered context)
+document_context_cache = LRUCache(max_entries=CHAT_CONTEXT_CACHE_ENTRIES)
 
 
 class ChatService:
@@ -20,6 +27,34 @@ class ChatService:
         """Retrieve extracted data for a document."""
         return db.query(ExtractedData).filter(ExtractedData.document_id == document_id).first()
     
+    @staticmethod
+    def get_document_context(db: Session, document_id: int) -> str:
+        """Rendered extraction context for a document, memoized per extraction version.
+
+        Only the row id and updated_at are read on a hit. Because the version comes
+        from the database, a worker never serves context for an edit it did not see,
+        even when another worker made the edit.
+        """
+        version_row = db.query(ExtractedData.id, ExtractedData.updated_at).filter(
+            ExtractedData.document_id == document_id
+        ).first()
+        if version_row is None:
+            return ChatService.format_extracted_data_for_context(None)
+        
+        version = (version_row.id, version_row.updated_at)
+        cached = document_context_cache.get(document_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        context = ChatService.format_extracted_data_for_context(db.get(ExtractedData, version_row.id))
+        document_context_cache.set(document_id, (version, context))
+        return context
+    
+    @staticmethod
+    def invalidate_document_context(document_id: int) -> None:
+        """Drop the memoized context after the document's extraction is created or edited."""
+        document_context_cache.pop(document_id)
+    
     @staticmethod
     def format_extracted_data_for_context(extracted_data: ExtractedData | None) -> str:
         """Format extracted data as a readable context string for the AI."""
@@ -144,15 +179,13 @@ class ChatService:
         return "\n".join(context_parts)
     
     @staticmethod
-    def generate_response(
-        user_question: str, 
-        extracted_data: ExtractedData | None, 
+    def build_messages(
+        user_question: str,
+        context: str,
         conversation_history: Optional[List[ChatMessage]] = None,
-        db: Session | None = None
-    ) -> str:
-        """Generate AI response to user question based on extracted data and conversation history."""
-        context = ChatService.format_extracted_data_for_context(extracted_data)
-        
+        conversation_summary: Optional[str] = None
+    ) -> List[BaseMessage]:
+        """Build the prompt: system instructions, summary of older turns, recent turns, document context and the question."""
         system_prompt = (
             "You are a helpful assistant that answers questions about utility bills and receipts. "
             "You have access to extracted data from a document. Answer questions accurately based on this data. "
@@ -165,6 +198,10 @@ class ChatService:
         # Build message history
         messages = [SystemMessage(content=system_prompt)]
         
+        # Turns that no longer fit the history budget are carried as a rolling summary
+        if conversation_summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{conversation_summary}"))
+        
         # Add conversation history if available
         if conversation_history:
             for chat_msg in conversation_history:
@@ -182,10 +219,50 @@ class ChatService:
         
         # Add current user question
         messages.append(HumanMessage(content=user_question))
+        return messages
+    
+    @staticmethod
+    def generate_response(
+        user_question: str, 
+        context: str, 
+        conversation_history: Optional[List[ChatMessage]] = None,
+        db: Session | None = None,
+        conversation_summary: Optional[str] = None
+    ) -> str:
+        """Generate AI response to user question based on the document context and conversation history."""
+        messages = ChatService.build_messages(user_question, context, conversation_history, conversation_summary)
         
         try:
             response = llm.invoke(messages)
-            return response.content.strip()
+            return response.strip()
         except Exception as e:
             return f"I apologize, but I encountered an error while processing your question: {str(e)}. Please try again."
+    
+    @staticmethod
+    def stream_response(messages: List[BaseMessage], cancelled: threading.Event | None = None) -> Iterator[str]:
+        """Yield response tokens from the model's streaming API as they arrive.
 
+        Stops once cancelled is set, closing the model stream from the thread iterating it.
+        """
+        tokens = llm.stream(messages)
+        try:
+            for token in tokens:
+                if cancelled is not None and cancelled.is_set():
+                    return
+                yield token
+        finally:
+            tokens.close()
+    
+    @staticmethod
+    async def save_message(document_id: int, user_id: int, message: str, response: str) -> int:
+        """Persist a finished turn in its own session (streams outlive the request's session)."""
+        async with AsyncSessionLocal() as db:
+            chat_message = ChatMessage(
+                document_id=document_id,
+                user_id=user_id,
+                message=message,
+                response=response
+            )
+            db.add(chat_message)
+            await db.commit()
+            return chat_message.id
@@ -0,0 +1,185 @@
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import List
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.database import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.models.conversation_summary import ConversationSummary
+from app.services.llm_service import get_llm, estimate_tokens, CHARS_PER_TOKEN
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tokens of prior turns sent verbatim; older turns are folded into the rolling summary
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+# After a fold the verbatim window shrinks to this share of the budget, so summaries refresh in batches
+CHAT_HISTORY_LOW_WATERMARK = float(os.getenv("CHAT_HISTORY_LOW_WATERMARK", "0.5"))
+CHAT_MIN_RECENT_TURNS = int(os.getenv("CHAT_MIN_RECENT_TURNS", "1"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+# Unsummarized turns read at a time; a longer backlog (e.g. history from before summaries existed) is folded in chunks this size
+CHAT_MEMORY_MAX_PENDING_TURNS = int(os.getenv("CHAT_MEMORY_MAX_PENDING_TURNS", "100"))
+
+# Role markers and separators added around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+summary_llm = get_llm(temperature=0)
+
+
+def turn_tokens(turn: ChatMessage) -> int:
+    return estimate_tokens(turn.message) + estimate_tokens(turn.response) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass
+class ConversationWindow:
+    summary: str | None
+    turns: List[ChatMessage] = field(default_factory=list)
+    # Estimated prompt tokens spent on the summary and the verbatim turns
+    tokens: int = 0
+
+
+class ConversationMemory:
+    @staticmethod
+    def split_turns(turns: List[ChatMessage], budget: int) -> tuple[List[ChatMessage], List[ChatMessage]]:
+        """Split chronological turns into (older, recent) so the recent ones fit the token budget."""
+        kept, used = 0, 0
+        for turn in reversed(turns):
+            cost = turn_tokens(turn)
+            if kept >= CHAT_MIN_RECENT_TURNS and used + cost > budget:
+                break
+            kept += 1
+            used += cost
+        split_at = len(turns) - kept
+        return turns[:split_at], turns[split_at:]
+
+    @staticmethod
+    def summarize(previous_summary: str | None, turns: List[ChatMessage]) -> str:
+        """Fold turns into the running summary with one model call."""
+        transcript = "\n".join(f"User: {turn.message}\nAssistant: {turn.response}" for turn in turns)
+        max_words = int(CHAT_SUMMARY_MAX_TOKENS * 0.75)
+        messages = [
+            SystemMessage(content=(
+                "You maintain a running summary of a conversation between a user and an assistant about a bill "
+                "or receipt. Merge the new turns into the existing summary. Keep facts, figures, names and open "
+                "questions the user may refer back to; drop greetings and repetition. "
+                f"Reply with the updated summary only, in at most {max_words} words."
+            )),
+            HumanMessage(content=(
+                f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+            )),
+        ]
+        summary = summary_llm.invoke(messages).strip()
+        # Hard cap in case the model ignores the word limit
+        return summary[:CHAT_SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN]
+
+    @staticmethod
+    def save_summary(db: Session, row: ConversationSummary | None, document_id: int, user_id: int, summary: str, until_id: int) -> ConversationSummary | None:
+        """Store the summary; returns the conversation's row for later folds to update."""
+        if row is not None:
+            row.summary = summary
+            row.summarized_until_id = until_id
+            db.commit()
+            return row
+        row = ConversationSummary(
+            document_id=document_id,
+            user_id=user_id,
+            summary=summary,
+            summarized_until_id=until_id
+        )
+        try:
+            # Savepoint so a concurrent first fold for the same conversation doesn't fail the request
+            with db.begin_nested():
+                db.add(row)
+            db.commit()
+            return row
+        except IntegrityError:
+            db.rollback()
+            return db.query(ConversationSummary).filter(
+                ConversationSummary.document_id == document_id,
+                ConversationSummary.user_id == user_id
+            ).first()
+
+    @staticmethod
+    def read_turns(db: Session, document_id: int, user_id: int, after_id: int, limit: int, newest: bool = False) -> List[ChatMessage]:
+        """Up to limit turns after after_id in chronological order: the earliest ones, or the latest with newest."""
+        turns = db.query(ChatMessage).filter(
+            ChatMessage.document_id == document_id,
+            ChatMessage.user_id == user_id,
+            ChatMessage.id > after_id
+        ).order_by(ChatMessage.id.desc() if newest else ChatMessage.id).limit(limit).all()
+        if newest:
+            turns.reverse()
+        # Read-only here; detached so committing a new summary doesn't expire them
+        for turn in turns:
+            db.expunge(turn)
+        return turns
+
+    @classmethod
+    def load(cls, db: Session, document_id: int, user_id: int, budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> ConversationWindow:
+        """Prompt-ready history: the rolling summary plus the most recent turns verbatim.
+
+        Only turns newer than the summary are read. When they outgrow the budget, the
+        oldest ones are folded into the summary until the verbatim window is back under
+        the low watermark, so the summary is refreshed once per batch of turns rather
+        than on every message and prompt size stays flat however long the chat gets.
+        A backlog of more than CHAT_MEMORY_MAX_PENDING_TURNS turns is first folded
+        a chunk at a time, oldest first, until only that many are left.
+        """
+        row = db.query(ConversationSummary).filter(
+            ConversationSummary.document_id == document_id,
+            ConversationSummary.user_id == user_id
+        ).first()
+        summary = row.summary if row and row.summary else None
+        summarized_until = row.summarized_until_id if row else 0
+
+        pending = cls.read_turns(db, document_id, user_id, summarized_until, CHAT_MEMORY_MAX_PENDING_TURNS + 1)
+        caught_up = True
+        if len(pending) > CHAT_MEMORY_MAX_PENDING_TURNS:
+            # Everything but the newest CHAT_MEMORY_MAX_PENDING_TURNS belongs in the summary
+            backlog = db.query(func.count(ChatMessage.id)).filter(
+                ChatMessage.document_id == document_id,
+                ChatMessage.user_id == user_id,
+                ChatMessage.id > summarized_until
+            ).scalar() - CHAT_MEMORY_MAX_PENDING_TURNS
+            while backlog > 0:
+                chunk = cls.read_turns(db, document_id, user_id, summarized_until, min(backlog, CHAT_MEMORY_MAX_PENDING_TURNS))
+                if not chunk:
+                    break
+                try:
+                    folded = cls.summarize(summary, chunk)
+                    row = cls.save_summary(db, row, document_id, user_id, folded, chunk[-1].id)
+                except Exception:
+                    # Answer from the latest turns; the rest of the backlog is folded on the next message
+                    logger.exception("Conversation backlog fold failed for document %s", document_id)
+                    caught_up = False
+                    break
+                summary, summarized_until = folded, chunk[-1].id
+                backlog -= len(chunk)
+            pending = cls.read_turns(db, document_id, user_id, summarized_until, CHAT_MEMORY_MAX_PENDING_TURNS, newest=True)
+
+        older, recent = cls.split_turns(pending, budget)
+        if older and caught_up:
+            older, recent = cls.split_turns(pending, int(budget * CHAT_HISTORY_LOW_WATERMARK))
+            try:
+                folded = cls.summarize(summary, older)
+                cls.save_summary(db, row, document_id, user_id, folded, older[-1].id)
+                summary = folded
+            except Exception:
+                # Keep answering with the stale summary; the fold is retried on the next message
+                logger.exception("Conversation summary refresh failed for document %s", document_id)
+                _, recent = cls.split_turns(pending, budget)
+
+        tokens = estimate_tokens(summary) + sum(turn_tokens(turn) for turn in recent)
+        return ConversationWindow(summary=summary, turns=recent, tokens=tokens)
+
+    @classmethod
+    def load_in_new_session(cls, document_id: int, user_id: int, budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> ConversationWindow:
+        """load() with its own session, for async routes to run on a worker thread (a fold calls the model)."""
+        with SessionLocal() as db:
+            return cls.load(db, document_id, user_id, budget)
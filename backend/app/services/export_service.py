@@ -0,0 +1,218 @@
+import io
+import os
+import csv
+import json
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import ReadSessionLocal
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.line_item import LineItem
+from app.services.bill_normalization_service import load_json_field
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per server-side cursor round trip, and rows per CSV/JSONL chunk or Parquet row group
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Output column -> (selected expression, Parquet type name); one row per line item, bill columns repeated
+EXPORT_COLUMNS = {
+    "document_id": (ExtractedData.document_id, "int"),
+    "original_filename": (Document.original_filename, "string"),
+    "bill_id": (ExtractedData.bill_id, "string"),
+    "bill_type": (ExtractedData.bill_type, "string"),
+    "invoice_number": (ExtractedData.invoice_number, "string"),
+    "order_id": (ExtractedData.order_id, "string"),
+    "invoice_date": (ExtractedData.invoice_date_value, "date"),
+    "order_date": (ExtractedData.order_date_value, "date"),
+    "due_date": (ExtractedData.due_date_value, "date"),
+    "payment_status": (ExtractedData.payment_status, "string"),
+    "seller_name": (ExtractedData.seller_name, "string"),
+    "seller_gstin": (ExtractedData.seller_gstin, "string"),
+    "customer_name": (ExtractedData.customer, "string"),
+    "subtotal": (ExtractedData.subtotal, "amount"),
+    "cgst_total": (ExtractedData.cgst_total, "amount"),
+    "sgst_total": (ExtractedData.sgst_total, "amount"),
+    "igst_total": (ExtractedData.igst_total, "amount"),
+    "total_tax": (ExtractedData.total_tax, "amount"),
+    "shipping_charges": (ExtractedData.shipping_charges, "amount"),
+    "grand_total": (ExtractedData.grand_total, "amount"),
+    "item_position": (LineItem.position, "int"),
+    "item_name": (LineItem.item_name, "string"),
+    "hsn_sac": (LineItem.hsn_sac, "string"),
+    "quantity": (LineItem.quantity, "quantity"),
+    "gross_amount": (LineItem.gross_amount, "amount"),
+    "discount": (LineItem.discount, "amount"),
+    "taxable_value": (LineItem.taxable_value, "amount"),
+    "item_cgst": (LineItem.cgst, "amount"),
+    "item_sgst": (LineItem.sgst, "amount"),
+    "item_igst": (LineItem.igst, "amount"),
+    "item_total_amount": (LineItem.total_amount, "amount"),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+# Leading characters that make spreadsheet apps evaluate a cell as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    # Text from bills is untrusted: "=HYPERLINK(...)" must open as text, not run. Numbers are left alone.
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class ExportService:
+    @staticmethod
+    def query(user_id: int, date_from: date | None = None, date_to: date | None = None, bill_type: str | None = None):
+        """The user's extractions joined to their line items, in a stable order; date filters apply to the invoice date."""
+        query = (
+            select(*[column.label(name) for name, (column, _) in EXPORT_COLUMNS.items()])
+            .select_from(ExtractedData)
+            .join(Document, Document.id == ExtractedData.document_id)
+            .outerjoin(LineItem, LineItem.extracted_data_id == ExtractedData.id)
+            .where(Document.user_id == user_id)
+        )
+        if date_from:
+            query = query.where(ExtractedData.invoice_date_value >= date_from)
+        if date_to:
+            query = query.where(ExtractedData.invoice_date_value <= date_to)
+        if bill_type:
+            query = query.where(ExtractedData.bill_type == bill_type)
+        return query.order_by(ExtractedData.id, LineItem.position)
+
+    @staticmethod
+    def iter_rows(db: Session, query) -> Iterator[dict]:
+        """Flattened export rows read through a server-side cursor, EXPORT_BATCH_ROWS at a time."""
+        result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS))
+        for row in result.mappings():
+            row = dict(row)
+            customer = load_json_field(row["customer_name"])
+            row["customer_name"] = customer.get("name") if isinstance(customer, dict) else None
+            yield row
+
+    @staticmethod
+    def csv_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        # Send the header straight away so the download starts before the first batch is read
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        for count, row in enumerate(rows, 1):
+            writer.writerow([_csv_value(value) for value in row.values()])
+            if count % EXPORT_BATCH_ROWS == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    @staticmethod
+    def jsonl_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps({key: _json_value(value) for key, value in row.items()}, ensure_ascii=False))
+            if len(lines) == EXPORT_BATCH_ROWS:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+    @staticmethod
+    def parquet_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+        """One Parquet row group per EXPORT_BATCH_ROWS rows, each sent as soon as it is written."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "int": pa.int64(),
+            "string": pa.string(),
+            "date": pa.date32(),
+            "amount": pa.decimal128(14, 2),
+            "quantity": pa.decimal128(14, 3),
+        }
+        schema = pa.schema([(name, types[kind]) for name, (_, kind) in EXPORT_COLUMNS.items()])
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == EXPORT_BATCH_ROWS:
+                    writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                    batch = []
+                    yield sink.drain()
+            if batch:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+        yield sink.drain()
+
+    @classmethod
+    def stream(cls, user_id: int, export_format: str, **filters) -> Iterator[bytes]:
+        """Encoded export for a StreamingResponse.
+
+        Checks the format up front (raising ValueError or RuntimeError) so errors are
+        reported before the response starts; the returned generator opens its own
+        read session, because it runs after the request's dependencies have closed.
+        """
+        if export_format not in EXPORT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported export format '{export_format}'; use one of {', '.join(EXPORT_MEDIA_TYPES)}")
+        if export_format == "parquet":
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet export requires pyarrow to be installed")
+        encode = getattr(cls, f"{export_format}_chunks")
+        query = cls.query(user_id, **filters)
+
+        def generate():
+            with ReadSessionLocal() as db:
+                yield from encode(cls.iter_rows(db, query))
+
+        return generate()
@@ -1,167 +1,228 @@
-import os
 import json
-import warnings
+import time
+import logging
 from datetime import datetime
 from pathlib import Path
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
 from app.models.document import Document
 from app.models.extracted_data import ExtractedData
+from app.models.extraction_cache import ExtractionCache
+from app.services.pdf_text_service import PdfTextService
+from app.services.ocr_service import ocr_engine
+from app.services.image_preprocess_service import ImagePreprocessService
+from app.services.llm_service import get_llm
+from app.services.template_extraction_service import TemplateExtractionService
+from app.services.text_compaction_service import TextCompactionService
+from app.services.chat_service import ChatService
+from app.services.search_service import SearchIndexService
+from app.services.bill_normalization_service import BillNormalizationService
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.storage_service import storage
 
-import easyocr
-import pdfplumber
 import re
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", api_key=GEMINI_API_KEY, temperature=0)
+logger = logging.getLogger(__name__)
 
+# Deterministic extraction prompts are served from the response cache when repeated
+llm = get_llm(temperature=0)
+
+# JSON structure the model is asked to fill, shared by the single and multi-document prompts
+EXTRACTION_SCHEMA = (
+    "{\n"
+    '  "bill_id": "string (unique identifier for bill)",\n'
+    '  "bill_type": "string (e.g., Product Invoice, Service Invoice)",\n'
+    '  "invoice_number": "string",\n'
+    '  "order_id": "string (if applicable)",\n'
+    '  "order_date": "YYYY-MM-DD",\n'
+    '  "invoice_date": "YYYY-MM-DD",\n'
+    '  "due_date": "YYYY-MM-DD or null",\n'
+    '  "payment_status": "string",\n'
+    '  "customer": {"name": "string", "address": "string"},\n'
+    '  "seller": {"name": "string", "gstin": "string (if available)", "address": "string"},\n'
+    '  "items": [{\n'
+    '    "item_name": "string",\n'
+    '    "hsn_sac": "string",\n'
+    '    "quantity": number,\n'
+    '    "gross_amount": number,\n'
+    '    "discount": number,\n'
+    '    "taxable_value": number,\n'
+    '    "cgst": number,\n'
+    '    "sgst": number,\n'
+    '    "igst": number,\n'
+    '    "total_amount": number\n'
+    '  }],\n'
+    '  "summary": {\n'
+    '    "subtotal": number,\n'
+    '    "cgst_total": number,\n'
+    '    "sgst_total": number,\n'
+    '    "igst_total": number,\n'
+    '    "total_tax": number,\n'
+    '    "shipping_charges": number,\n'
+    '    "grand_total": number\n'
+    '  },\n'
+    '  "extraction_metadata": {\n'
+    '    "source": "string (e.g., Flipkart Invoice PDF)",\n'
+    '    "extraction_method": "string",\n'
+    '    "confidence_score": number (0 to 1),\n'
+    '    "uploaded_by": "string",\n'
+    '    "extraction_date": "YYYY-MM-DD"\n'
+    '  }\n'
+    "}\n\n"
+)
 
 
 class ExtractionService:
-    # Lazy initialization of EasyOCR reader to avoid slow startup
-    _easyocr_reader = None
-    
-    @classmethod
-    def _get_easyocr_reader(cls):
-        """Lazy-load EasyOCR reader only when needed."""
-        if cls._easyocr_reader is None:
-            # Suppress pin_memory warning during initialization
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", category=UserWarning, message=".*pin_memory.*")
-                cls._easyocr_reader = easyocr.Reader(["en"], gpu=False)
-        return cls._easyocr_reader
-    
     @staticmethod
-    def extract_text_from_file(file_path: str) -> str:
+    def extract_pages_from_file(file_path: str, cache_key: str | None = None) -> list[str]:
         ext = Path(file_path).suffix.lower()
         if ext in [".pdf"]:
-            return ExtractionService._extract_text_pdf(file_path)
+            return ExtractionService._extract_pages_pdf(file_path, cache_key)
         elif ext in [".jpg", ".jpeg", ".png"]:
-            return ExtractionService._extract_text_image(file_path)
+            return [ExtractionService._extract_text_image(file_path)]
         else:
             raise ValueError("Unsupported file type for extraction")
 
     @staticmethod
-    def _extract_text_pdf(file_path: str) -> str:
-        text = ""
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n"
-        return text.strip()
+    def extract_text_from_file(file_path: str, cache_key: str | None = None) -> str:
+        return "\n".join(ExtractionService.extract_pages_from_file(file_path, cache_key)).strip()
+
+    @staticmethod
+    def _extract_pages_pdf(file_path: str, cache_key: str | None = None) -> list[str]:
+        # Text-layer pages take the fast path (sharded across a process pool for long PDFs),
+        # scanned pages are rasterized and OCRed; finished pages are cached per content hash
+        return PdfTextService.extract_pages(file_path, cache_key=cache_key)
 
     @staticmethod
     def _extract_text_image(file_path: str) -> str:
-        # Lazy-load reader when actually needed
-        reader = ExtractionService._get_easyocr_reader()
-        results = reader.readtext(file_path, detail=0, paragraph=True)
-        return "\n".join([r.strip() for r in results if isinstance(r, str) and r.strip()])
+        # Rotate, crop, deskew and downscale before OCR; EasyOCR time grows with pixel count
+        image, stats = ImagePreprocessService.preprocess_file(file_path)
+        started = time.perf_counter()
+        # OCR runs in the dedicated worker pool, whose readers are warmed at startup; concurrent
+        # uploads' images are sent to it together
+        text = ocr_engine.recognize_one(image)
+        logger.info(
+            "OCR %s: %.0f ms (preprocess %.0f ms, %.0f%% of original pixels, skew %.1f deg)",
+            Path(file_path).name,
+            (time.perf_counter() - started) * 1000,
+            stats["preprocess_ms"],
+            stats["pixel_ratio"] * 100,
+            stats["skew_angle"],
+        )
+        return text
 
     @staticmethod
     def extract_from_document(doc: Document) -> dict:
         try:
-            extracted_text = ExtractionService.extract_text_from_file(doc.file_path)
+            with storage.local_path(doc.file_path) as path:
+                pages = ExtractionService.extract_pages_from_file(path, cache_key=doc.content_hash)
+        except Exception as e:
+            raise RuntimeError(f"Error during extraction: {str(e)}")
+        return ExtractionService.extract_from_pages(doc, pages)
+
+    @staticmethod
+    def extract_from_pages(doc: Document, pages: list[str]) -> dict:
+        # Known layouts are read by rules; the LLM only sees what they can't reconcile
+        templated = TemplateExtractionService.extract("\n".join(pages).strip())
+        if templated is not None:
+            return ExtractionService.normalize_extraction(templated, doc)
+        prompt_text, _ = ExtractionService.compact_for_prompt(doc, pages)
+        return ExtractionService.extract_from_text(doc, prompt_text)
+
+    @staticmethod
+    def compact_for_prompt(doc: Document, pages: list[str]) -> tuple[str, dict]:
+        """Strip repeated headers/footers, boilerplate and layout whitespace before the text is billed as tokens."""
+        text, stats = TextCompactionService.compact_pages(pages)
+        saved = 1 - stats["tokens_after"] / stats["tokens_before"] if stats["tokens_before"] else 0
+        logger.info(
+            "Prompt text for document %s: %d -> %d tokens (%.0f%% saved, %.1f ms)",
+            doc.id,
+            stats["tokens_before"],
+            stats["tokens_after"],
+            saved * 100,
+            stats["compaction_ms"],
+        )
+        return text, stats
+
+    @staticmethod
+    def parse_llm_json(text: str):
+        """Parse the JSON object or array in a model response, tolerating code fences and extra text."""
+        # Clean up the response: strip common codeblock markers
+        if text.startswith("```json"):
+            text = text[7:]
+        elif text.startswith("```"):
+            text = text[3:]
+        if text.endswith("```"):
+            text = text[:-3]
+
+        # Try to extract first JSON object/array from the response (robust against extra text)
+        json_text = text.strip()
+        match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', json_text)
+        if match:
+            json_text = match.group(1)
+
+        try:
+            return json.loads(json_text)
+        except json.JSONDecodeError as e:
+            # Raise including raw response so caller/logs can inspect cause
+            raise RuntimeError(f"Failed to parse LLM response as JSON: {str(e)}; raw_response={text}")
+
+    @staticmethod
+    def normalize_extraction(extracted_data: dict, doc: Document) -> dict:
+        """Ensure required fields exist with proper types."""
+        extracted_data.setdefault('items', [])
+        extracted_data.setdefault('customer', {})
+        extracted_data.setdefault('seller', {})
+        extracted_data.setdefault('summary', {})
+        extracted_data.setdefault('extraction_metadata', {
+            'source': f"{doc.file_type.upper()} Document",
+            'extraction_method': "OCR + LLM",
+            'confidence_score': 0.8,
+            'uploaded_by': "System",
+            'extraction_date': datetime.utcnow().strftime('%Y-%m-%d')
+        })
+        
+        # Ensure items is a list
+        if not isinstance(extracted_data['items'], list):
+            extracted_data['items'] = []
+        return extracted_data
+
+    @staticmethod
+    def extract_from_text(doc: Document, extracted_text: str) -> dict:
+        try:
+            if not extracted_text.strip():
+                # Don't spend an LLM call on a document with no readable text
+                raise ValueError("No text could be extracted from the document")
             
             prompt = (
                 "Extract ALL information from the following bill or receipt (plain text content) and return ONLY valid JSON with the following structure:\n"
-                "{\n"
-                '  "bill_id": "string (unique identifier for bill)",\n'
-                '  "bill_type": "string (e.g., Product Invoice, Service Invoice)",\n'
-                '  "invoice_number": "string",\n'
-                '  "order_id": "string (if applicable)",\n'
-                '  "order_date": "YYYY-MM-DD",\n'
-                '  "invoice_date": "YYYY-MM-DD",\n'
-                '  "due_date": "YYYY-MM-DD or null",\n'
-                '  "payment_status": "string",\n'
-                '  "customer": {"name": "string", "address": "string"},\n'
-                '  "seller": {"name": "string", "gstin": "string (if available)", "address": "string"},\n'
-                '  "items": [{\n'
-                '    "item_name": "string",\n'
-                '    "hsn_sac": "string",\n'
-                '    "quantity": number,\n'
-                '    "gross_amount": number,\n'
-                '    "discount": number,\n'
-                '    "taxable_value": number,\n'
-                '    "cgst": number,\n'
-                '    "sgst": number,\n'
-                '    "igst": number,\n'
-                '    "total_amount": number\n'
-                '  }],\n'
-                '  "summary": {\n'
-                '    "subtotal": number,\n'
-                '    "cgst_total": number,\n'
-                '    "sgst_total": number,\n'
-                '    "igst_total": number,\n'
-                '    "total_tax": number,\n'
-                '    "shipping_charges": number,\n'
-                '    "grand_total": number\n'
-                '  },\n'
-                '  "extraction_metadata": {\n'
-                '    "source": "string (e.g., Flipkart Invoice PDF)",\n'
-                '    "extraction_method": "string",\n'
-                '    "confidence_score": number (0 to 1),\n'
-                '    "uploaded_by": "string",\n'
-                '    "extraction_date": "YYYY-MM-DD"\n'
-                '  }\n'
-                "}\n\n"
+                + EXTRACTION_SCHEMA +
                 "Return ONLY valid JSON with all fields as shown above. NO markdown, NO extra text. Parse from TEXT:\n"
                 f"'''{extracted_text}'''"
             )
             
             message = HumanMessage(content=prompt)
-            response = llm.invoke([message])
-            text = response.content.strip()
-            
-            # Clean up the response: strip common codeblock markers
-            if text.startswith("```json"):
-                text = text[7:]
-            elif text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-
-            # Try to extract first JSON object/array from the response (robust against extra text)
-            json_text = text.strip()
-            match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', json_text)
-            if match:
-                json_text = match.group(1)
-
+            text = llm.invoke([message]).strip()
             try:
-                extracted_data = json.loads(json_text)
-            except json.JSONDecodeError as e:
-                # Raise including raw response so caller/logs can inspect cause
-                raise RuntimeError(f"Failed to parse LLM response as JSON: {str(e)}; raw_response={text}")
-
-            # Accept a list with a single dict as fallback (some LLMs return arrays)
-            if not isinstance(extracted_data, dict):
-                if isinstance(extracted_data, list) and len(extracted_data) > 0 and isinstance(extracted_data[0], dict):
-                    extracted_data = extracted_data[0]
-                else:
-                    raise ValueError(f"Extracted data must be a dictionary; got {type(extracted_data)}; raw_response={text}")
-            
-            # Ensure required fields exist with proper types
-            extracted_data.setdefault('items', [])
-            extracted_data.setdefault('customer', {})
-            extracted_data.setdefault('seller', {})
-            extracted_data.setdefault('summary', {})
-            extracted_data.setdefault('extraction_metadata', {
-                'source': f"{doc.file_type.upper()} Document",
-                'extraction_method': "OCR + LLM",
-                'confidence_score': 0.8,
-                'uploaded_by': "System",
-                'extraction_date': datetime.utcnow().strftime('%Y-%m-%d')
-            })
+                extracted_data = ExtractionService.parse_llm_json(text)
+
+                # Accept a list with a single dict as fallback (some LLMs return arrays)
+                if not isinstance(extracted_data, dict):
+                    if isinstance(extracted_data, list) and len(extracted_data) > 0 and isinstance(extracted_data[0], dict):
+                        extracted_data = extracted_data[0]
+                    else:
+                        raise ValueError(f"Extracted data must be a dictionary; got {type(extracted_data)}; raw_response={text}")
+            except Exception:
+                # Otherwise a retry would be served the same bad reply from the response cache
+                llm.forget([message])
+                raise
             
-            # Ensure items is a list
-            if not isinstance(extracted_data['items'], list):
-                extracted_data['items'] = []
-                
-            return extracted_data
+            return ExtractionService.normalize_extraction(extracted_data, doc)
             
         except json.JSONDecodeError as e:
             # Already handled above, but keep a safe fallback
@@ -170,15 +231,33 @@ class ExtractionService:
             # Raise with message so caller gets context
             raise RuntimeError(f"Error during extraction: {str(e)}")
 
-    @classmethod
-    def process_extraction(cls, doc: Document, db: Session) -> ExtractedData:
-        # Extract data from document
-        raw_extracted = cls.extract_from_document(doc)
-        
-        # Ensure raw_extracted is a dictionary
-        if not isinstance(raw_extracted, dict):
-            raise ValueError(f"Expected dictionary from extraction, got {type(raw_extracted)}")
-        
+    @staticmethod
+    def get_cached_extraction(db: Session, content_hash: str | None) -> dict | None:
+        """Return a previous extraction result for identical file bytes, if any."""
+        if not content_hash:
+            return None
+        cached = db.get(ExtractionCache, content_hash)
+        if cached is None or not isinstance(cached.result, dict):
+            return None
+        return cached.result
+
+    @staticmethod
+    def store_cached_extraction(db: Session, content_hash: str | None, raw_extracted: dict) -> None:
+        """Remember an extraction result for its file hash (first writer wins)."""
+        if not content_hash:
+            return
+        if db.get(ExtractionCache, content_hash) is not None:
+            return
+        try:
+            # Savepoint so a concurrent insert for the same hash doesn't undo the caller's work
+            with db.begin_nested():
+                db.add(ExtractionCache(content_hash=content_hash, result=raw_extracted))
+        except IntegrityError:
+            pass
+
+    @staticmethod
+    def build_extraction_row(doc: Document, raw_extracted: dict) -> dict:
+        """Column values for an extracted_data row built from a raw extraction result."""
         # Prepare the data for database
         extracted = {
             'document_id': doc.id,
@@ -211,13 +290,45 @@ class ExtractionService:
         if not isinstance(extracted['extraction_metadata'], dict):
             extracted['extraction_metadata'] = {}
         
+        # Typed dates, seller and totals for SQL reporting
+        extracted.update(BillNormalizationService.typed_columns(extracted))
+        return extracted
+
+    @classmethod
+    def process_extraction(cls, doc: Document, db: Session) -> ExtractedData:
+        # Reuse the result for identical bytes; otherwise run OCR + LLM
+        raw_extracted = cls.get_cached_extraction(db, doc.content_hash)
+        from_cache = raw_extracted is not None
+        if not from_cache:
+            raw_extracted = cls.extract_from_document(doc)
+        
+        # Ensure raw_extracted is a dictionary
+        if not isinstance(raw_extracted, dict):
+            raise ValueError(f"Expected dictionary from extraction, got {type(raw_extracted)}")
+        
+        extracted = cls.build_extraction_row(doc, raw_extracted)
+        
         # Create and save the object
         try:
             data_obj = ExtractedData(**extracted)
             db.add(data_obj)
+            db.flush()
+            BillNormalizationService.insert_line_items(db, [(data_obj.id, doc.id, extracted['items'])])
+            SpendRollupService.apply(db, SpendRollupService.deltas(doc.user_id, extracted))
+            SearchIndexService.index_document(db, doc, extracted)
+            if not from_cache:
+                cls.store_cached_extraction(db, doc.content_hash, raw_extracted)
             db.commit()
             db.refresh(data_obj)
+            ChatService.invalidate_document_context(doc.id)
             return data_obj
+        except IntegrityError as e:
+            db.rollback()
+            # Another worker stored this document's extraction first
+            existing = db.query(ExtractedData).filter(ExtractedData.document_id == doc.id).first()
+            if existing is not None:
+                return existing
+            raise ValueError(f"Failed to save extracted data: {str(e)}")
         except Exception as e:
             db.rollback()
             raise ValueError(f"Failed to save extracted data: {str(e)}")
@@ -0,0 +1,432 @@
+import os
+import time
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.extraction_job import ExtractionJob
+from app.models.extraction_cache import ExtractionCache
+from app.services.extract_data_service import ExtractionService
+from app.services.read_your_writes import ReadYourWrites
+from app.services.batch_extraction_service import BatchExtractionService, EXTRACTION_BATCH_MAX_DOCS
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_POLL_INTERVAL = float(os.getenv("EXTRACTION_POLL_INTERVAL", "2"))
+EXTRACTION_MAX_ATTEMPTS = int(os.getenv("EXTRACTION_MAX_ATTEMPTS", "3"))
+# A running job's lease: without a heartbeat for this long (e.g. its worker process died) it is picked up again
+EXTRACTION_JOB_TIMEOUT_SECONDS = int(os.getenv("EXTRACTION_JOB_TIMEOUT_SECONDS", "120"))
+# How often workers refresh the heartbeat of the jobs they are running
+EXTRACTION_HEARTBEAT_INTERVAL = float(os.getenv("EXTRACTION_HEARTBEAT_INTERVAL", "30"))
+# How often each process looks for running jobs whose lease has expired
+EXTRACTION_STALE_SWEEP_INTERVAL = float(os.getenv("EXTRACTION_STALE_SWEEP_INTERVAL", "60"))
+# Queued jobs of one user a worker claims together, so short documents can share an LLM prompt
+EXTRACTION_WORKER_BATCH_SIZE = int(os.getenv("EXTRACTION_WORKER_BATCH_SIZE", str(EXTRACTION_BATCH_MAX_DOCS)))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class ExtractionJobService:
+    @staticmethod
+    def enqueue(doc: Document, db: Session) -> ExtractionJob:
+        """Queue an extraction for a document.
+
+        Reuses an active or finished job when there is one, and finishes immediately
+        when identical bytes have already been extracted.
+        """
+        active = db.query(ExtractionJob).filter(
+            ExtractionJob.document_id == doc.id,
+            ExtractionJob.status.in_(ACTIVE_STATUSES)
+        ).order_by(ExtractionJob.id.desc()).first()
+        if active:
+            return active
+
+        existing = db.query(ExtractedData).filter(ExtractedData.document_id == doc.id).first()
+        if existing:
+            done = db.query(ExtractionJob).filter(
+                ExtractionJob.document_id == doc.id,
+                ExtractionJob.status == "done"
+            ).order_by(ExtractionJob.id.desc()).first()
+            if done:
+                return done
+            # Extracted before jobs existed: record a finished job so callers get a job id either way
+            now = datetime.utcnow()
+            job = ExtractionJob(
+                document_id=doc.id,
+                user_id=doc.user_id,
+                status="done",
+                extracted_data_id=existing.id,
+                started_at=now,
+                finished_at=now
+            )
+        elif ExtractionService.get_cached_extraction(db, doc.content_hash) is not None:
+            # Same bytes were extracted before: clone the result now instead of queueing OCR + LLM
+            started = datetime.utcnow()
+            data = ExtractionService.process_extraction(doc, db)
+            job = ExtractionJob(
+                document_id=doc.id,
+                user_id=doc.user_id,
+                status="done",
+                extracted_data_id=data.id,
+                started_at=started,
+                finished_at=datetime.utcnow()
+            )
+        else:
+            job = ExtractionJob(document_id=doc.id, user_id=doc.user_id, status="queued")
+
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        if job.status == "queued":
+            extraction_worker_pool.notify()
+        return job
+
+    @staticmethod
+    def enqueue_new(db: Session, docs: list[Document]) -> dict[int, ExtractionJob]:
+        """Queue extraction for just-created documents with one commit, keyed by document id.
+
+        New documents have no jobs or extraction yet, so only the cached-result check
+        of enqueue applies; it is done for all of them in one query.
+        """
+        hashes = {doc.content_hash for doc in docs if doc.content_hash}
+        cached = set(db.scalars(
+            select(ExtractionCache.content_hash).where(ExtractionCache.content_hash.in_(hashes))
+        )) if hashes else set()
+
+        jobs = {}
+        for doc in docs:
+            job = None
+            if doc.content_hash in cached:
+                started = datetime.utcnow()
+                try:
+                    data = ExtractionService.process_extraction(doc, db)
+                    job = ExtractionJob(
+                        document_id=doc.id,
+                        user_id=doc.user_id,
+                        status="done",
+                        extracted_data_id=data.id,
+                        started_at=started,
+                        finished_at=datetime.utcnow()
+                    )
+                except ValueError:
+                    # Leave it to a worker, which retries and records the error
+                    pass
+            jobs[doc.id] = job or ExtractionJob(document_id=doc.id, user_id=doc.user_id, status="queued")
+        db.add_all(jobs.values())
+        db.commit()
+        if any(job.status == "queued" for job in jobs.values()):
+            extraction_worker_pool.notify()
+        return jobs
+
+    @staticmethod
+    def enqueue_batch(db: Session, document_ids: list[int], user_id: int) -> list[dict]:
+        """Queue extraction for many of the user's documents with one commit; returns a result per document.
+
+        Documents that are already extracted or have an active job are reported and
+        not queued again. Workers claim a user's queued jobs together and pack short
+        documents into shared LLM prompts.
+        """
+        document_ids = list(dict.fromkeys(document_ids))
+        owned = set(db.scalars(select(Document.id).where(
+            Document.id.in_(document_ids),
+            Document.user_id == user_id
+        )))
+        existing = dict(db.query(ExtractedData.document_id, ExtractedData.id).filter(
+            ExtractedData.document_id.in_(owned)
+        ).all())
+        active = dict(db.query(ExtractionJob.document_id, ExtractionJob.id).filter(
+            ExtractionJob.document_id.in_(owned),
+            ExtractionJob.status.in_(ACTIVE_STATUSES)
+        ).all())
+
+        jobs = {
+            doc_id: ExtractionJob(document_id=doc_id, user_id=user_id, status="queued")
+            for doc_id in document_ids if doc_id in owned and doc_id not in existing and doc_id not in active
+        }
+        if jobs:
+            db.add_all(jobs.values())
+            db.commit()
+            extraction_worker_pool.notify()
+
+        results = []
+        for doc_id in document_ids:
+            if doc_id not in owned:
+                results.append({"document_id": doc_id, "status": "not_found"})
+            elif doc_id in existing:
+                results.append({"document_id": doc_id, "status": "exists", "extracted_data_id": existing[doc_id]})
+            else:
+                job_id = jobs[doc_id].id if doc_id in jobs else active[doc_id]
+                results.append({"document_id": doc_id, "status": "queued", "job_id": job_id})
+        return results
+
+    @staticmethod
+    def get_job(db: Session, job_id: int, user_id: int) -> ExtractionJob | None:
+        """Retrieve a job owned by the given user."""
+        return db.query(ExtractionJob).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.user_id == user_id
+        ).first()
+
+    @staticmethod
+    def claim_next(db: Session, limit: int = 1) -> list[ExtractionJob]:
+        """Atomically move the oldest queued job, and up to limit - 1 more of the same user's, to running.
+
+        SKIP LOCKED lets several workers (and several uvicorn processes) drain the
+        same table without handing out a job twice. Jobs are only grouped per user,
+        so one prompt never mixes different users' bills.
+        """
+        first = db.query(ExtractionJob).filter(
+            ExtractionJob.status == "queued"
+        ).order_by(ExtractionJob.id).with_for_update(skip_locked=True).first()
+        if not first:
+            db.rollback()
+            return []
+
+        jobs = [first]
+        if limit > 1:
+            jobs += db.query(ExtractionJob).filter(
+                ExtractionJob.status == "queued",
+                ExtractionJob.user_id == first.user_id,
+                ExtractionJob.id != first.id
+            ).order_by(ExtractionJob.id).limit(limit - 1).with_for_update(skip_locked=True).all()
+        now = datetime.utcnow()
+        for job in jobs:
+            job.status = "running"
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.error = None
+        db.commit()
+        for job in jobs:
+            db.refresh(job)
+        return jobs
+
+    @staticmethod
+    def heartbeat(db: Session, job_ids: list[int]) -> None:
+        """Renew the lease of jobs this process is still running."""
+        db.execute(update(ExtractionJob).where(
+            ExtractionJob.id.in_(job_ids),
+            ExtractionJob.status == "running"
+        ).values(heartbeat_at=datetime.utcnow()))
+        db.commit()
+
+    @staticmethod
+    def requeue_stale(db: Session) -> int:
+        """Return running jobs whose lease expired to the queue (or fail them if out of attempts).
+
+        Only the heartbeat counts, so jobs that another live process is still
+        working on are left alone however long they take.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=EXTRACTION_JOB_TIMEOUT_SECONDS)
+        stale = db.query(ExtractionJob).filter(
+            ExtractionJob.status == "running",
+            func.coalesce(ExtractionJob.heartbeat_at, ExtractionJob.started_at) < cutoff
+        ).with_for_update(skip_locked=True).all()
+        for job in stale:
+            if job.attempts >= EXTRACTION_MAX_ATTEMPTS:
+                job.status = "failed"
+                job.error = "Extraction timed out"
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = "queued"
+        db.commit()
+        return len(stale)
+
+    @staticmethod
+    def record_failure(db: Session, job_id: int, error: Exception) -> None:
+        """Send a failed job back to the queue, or fail it for good once out of attempts."""
+        job = db.get(ExtractionJob, job_id)
+        if job is None:
+            # Document (and with it the job) was deleted while extracting
+            return
+        job.error = str(error)
+        if job.attempts < EXTRACTION_MAX_ATTEMPTS:
+            job.status = "queued"
+        else:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+
+    @staticmethod
+    def run_job(db: Session, job: ExtractionJob) -> None:
+        """Run a claimed job to completion and record the outcome."""
+        try:
+            data = db.query(ExtractedData).filter(ExtractedData.document_id == job.document_id).first()
+            if not data:
+                doc = db.get(Document, job.document_id)
+                if not doc:
+                    raise ValueError("Document not found")
+                data = ExtractionService.process_extraction(doc, db)
+            job.status = "done"
+            job.extracted_data_id = data.id
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            ReadYourWrites.record(db, job.user_id)
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            ExtractionJobService.record_failure(db, job.id, e)
+            db.commit()
+
+    @staticmethod
+    def run_jobs(db: Session, jobs: list[ExtractionJob]) -> None:
+        """Run several claimed jobs of one user, packing their documents into as few LLM calls as possible."""
+        job_ids = {job.id: job.document_id for job in jobs}
+        user_id = jobs[0].user_id
+        try:
+            docs = {doc.id: doc for doc in db.query(Document).filter(Document.id.in_(job_ids.values())).all()}
+            existing = dict(db.query(ExtractedData.document_id, ExtractedData.id).filter(
+                ExtractedData.document_id.in_(docs)
+            ).all())
+            # Identical bytes extracted before need no LLM call
+            raw_results: dict[int, dict | Exception] = {}
+            to_extract = []
+            for doc_id, doc in docs.items():
+                if doc_id in existing:
+                    continue
+                cached = ExtractionService.get_cached_extraction(db, doc.content_hash)
+                if cached is not None:
+                    raw_results[doc_id] = cached
+                else:
+                    to_extract.append(doc)
+            cached_ids = set(raw_results)
+
+            extracted, stats = BatchExtractionService.extract(to_extract)
+            raw_results.update(extracted)
+            logger.info("Extracted %d documents (%d cached): %s", len(raw_results), len(cached_ids), stats)
+            inserted, errors = BatchExtractionService.save_results(db, docs, raw_results, cached_ids)
+            existing.update(inserted)
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            existing, errors = {}, {doc_id: e for doc_id in job_ids.values()}
+
+        now = datetime.utcnow()
+        for job_id, doc_id in job_ids.items():
+            if doc_id in existing:
+                job = db.get(ExtractionJob, job_id)
+                if job is not None:
+                    job.status = "done"
+                    job.extracted_data_id = existing[doc_id]
+                    job.finished_at = now
+            else:
+                ExtractionJobService.record_failure(db, job_id, errors.get(doc_id) or ValueError("Document not found"))
+        db.commit()
+        if existing:
+            ReadYourWrites.record(db, user_id)
+
+
+class ExtractionWorkerPool:
+    """Fixed-size pool of threads that drain the extraction_jobs table.
+
+    Enqueueing in this process wakes a worker immediately; jobs queued by other
+    processes are picked up on the next poll. A heartbeat thread renews the lease
+    of every job the workers are running, and the workers take turns sweeping
+    jobs whose lease expired back into the queue.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        poll_interval: float = EXTRACTION_POLL_INTERVAL,
+        heartbeat_interval: float = EXTRACTION_HEARTBEAT_INTERVAL,
+        sweep_interval: float = EXTRACTION_STALE_SWEEP_INTERVAL,
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.sweep_interval = sweep_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._running: set[int] = set()
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        # Sweep as soon as the first worker is up
+        self._next_sweep = 0.0
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"extraction-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self._threads:
+            thread = threading.Thread(target=self._heartbeat, name="extraction-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def _sweep_due(self) -> bool:
+        """True for the one worker that should run the stale sweep now."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sweep:
+                return False
+            self._next_sweep = now + self.sweep_interval
+            return True
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                with SessionLocal() as db:
+                    ExtractionJobService.heartbeat(db, job_ids)
+            except Exception:
+                traceback.print_exc()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            job_found = False
+            try:
+                with SessionLocal() as db:
+                    if self._sweep_due():
+                        ExtractionJobService.requeue_stale(db)
+                    jobs = ExtractionJobService.claim_next(db, EXTRACTION_WORKER_BATCH_SIZE)
+                    if jobs:
+                        job_found = True
+                        job_ids = {job.id for job in jobs}
+                        with self._lock:
+                            self._running |= job_ids
+                        try:
+                            if len(jobs) == 1:
+                                ExtractionJobService.run_job(db, jobs[0])
+                            else:
+                                ExtractionJobService.run_jobs(db, jobs)
+                        finally:
+                            with self._lock:
+                                self._running -= job_ids
+            except Exception:
+                traceback.print_exc()
+
+            if job_found:
+                # Keep draining while there is work
+                continue
+            self._wakeup.wait(timeout=self.poll_interval)
+            self._wakeup.clear()
+
+
+extraction_worker_pool = ExtractionWorkerPool()
@@ -0,0 +1,127 @@
+"""Known bill layouts read by the template fast path (see template_extraction_service).
+
+Patterns are written against pdfplumber's text output for each layout. Anchors
+must all match for a layout to be picked; anything the rules cannot reconcile
+falls back to the LLM, so a rule that drifts costs an API call, not a wrong bill.
+"""
+from app.services.template_extraction_service import InvoiceTemplate, Pattern, After, AMOUNT
+
+NUM = r"-?[\d,]+\.\d{2}"
+GSTIN = r"(\d{2}[A-Z]{5}\d{4}[A-Z][A-Z\d]Z[A-Z\d])"
+
+FLIPKART_TAX_INVOICE = InvoiceTemplate(
+    name="flipkart_tax_invoice",
+    source="Flipkart Invoice PDF",
+    bill_type="Product Invoice",
+    anchors=[r"^Tax Invoice\b", r"Order I[Dd]:?\s*OD\d+", r"Invoice (?:Number|No\.?)\s*#?"],
+    fields={
+        "invoice_number": [Pattern(r"Invoice (?:Number|No\.?)\s*#?\s*:?\s*([A-Z0-9]+)")],
+        "order_id": [Pattern(r"Order I[Dd]:?\s*(OD\d+)")],
+        "order_date": [Pattern(r"Order Date:?\s*([\d]{2}[-/.][\d]{2}[-/.][\d]{4})")],
+        "invoice_date": [Pattern(r"Invoice Date:?\s*([\d]{2}[-/.][\d]{2}[-/.][\d]{4})")],
+        "seller.name": [Pattern(r"Sold By:?\s*([^,\n]+?)\s*(?:,|$)")],
+        "seller.gstin": [Pattern(r"GSTIN\s*[-:]?\s*" + GSTIN)],
+        "seller.address": [Pattern(r"Ship-from Address:?\s*(.+)$")],
+        "customer.name": [After(r"^Bill(?:ing)? To\b", 1, r"^([^,]+)")],
+        "customer.address": [After(r"^Bill(?:ing)? To\b", 2)],
+        "summary.shipping_charges": [Pattern(r"^Shipping And Handling Charges\b.*?(" + NUM + r")\s*$")],
+        "summary.grand_total": [Pattern(r"^Grand Total\s+" + AMOUNT + r"\s*$")],
+    },
+    required=["invoice_number", "invoice_date", "seller.name", "summary.grand_total"],
+    items_start=r"^Product\b.*\bQty\b",
+    items_end=r"^(?:Total\b|Grand Total\b)",
+    item_patterns=[
+        # Intra-state: CGST and SGST columns
+        rf"^(?!Shipping\b)(?P<item_name>.+?)\s+(?P<quantity>\d+)\s+(?P<gross_amount>{NUM})\s+(?P<discount>{NUM})\s+"
+        rf"(?P<taxable_value>{NUM})\s+(?P<cgst>{NUM})\s+(?P<sgst>{NUM})\s+(?P<total_amount>{NUM})$",
+        # Inter-state: one IGST column
+        rf"^(?!Shipping\b)(?P<item_name>.+?)\s+(?P<quantity>\d+)\s+(?P<gross_amount>{NUM})\s+(?P<discount>{NUM})\s+"
+        rf"(?P<taxable_value>{NUM})\s+(?P<igst>{NUM})\s+(?P<total_amount>{NUM})$",
+    ],
+    item_detail_patterns=[r"HSN/SAC:\s*(?P<hsn_sac>\d+)"],
+)
+
+AMAZON_TAX_INVOICE = InvoiceTemplate(
+    name="amazon_tax_invoice",
+    source="Amazon Invoice PDF",
+    bill_type="Product Invoice",
+    anchors=[r"Tax Invoice/Bill of Supply/Cash Memo", r"Order Number:?\s*\d{3}-\d{7}-\d{7}"],
+    fields={
+        "invoice_number": [Pattern(r"Invoice Number\s*:?\s*([A-Z0-9-]+)")],
+        "order_id": [Pattern(r"Order Number:?\s*(\d{3}-\d{7}-\d{7})")],
+        "order_date": [Pattern(r"Order Date:?\s*(\d{2}\.\d{2}\.\d{4})")],
+        "invoice_date": [Pattern(r"Invoice Date\s*:?\s*(\d{2}\.\d{2}\.\d{4})")],
+        "seller.name": [After(r"^Sold By\s*:", 1, r"^(.+?)\s*(?:Billing Address\s*:.*)?$")],
+        "seller.gstin": [Pattern(r"GST Registration No:?\s*" + GSTIN)],
+        "customer.name": [After(r"Billing Address\s*:", 1, r"(?:^.*?\s{2,})?([^,]+?)\s*$")],
+        "summary.grand_total": [Pattern(r"^TOTAL:.*?₹\s*(" + NUM + r")\s*$")],
+        "summary.total_tax": [Pattern(r"^TOTAL:\s*₹\s*(" + NUM + r")\s+₹")],
+        "summary.shipping_charges": [Pattern(r"^Shipping Charges\b.*?₹\s*(" + NUM + r")\s*$")],
+    },
+    required=["invoice_number", "invoice_date", "order_id", "summary.grand_total"],
+    items_start=r"^Sl\.?\s*No\b.*\bDescription\b",
+    items_end=r"^TOTAL:",
+    item_patterns=[
+        rf"^\d+\s+(?P<item_name>.+?)\s*(?:\|\s*\S+\s*)?\(\s*HSN:\s*(?P<hsn_sac>\d+)\s*\)\s+₹\s*(?P<gross_amount>{NUM})\s+"
+        rf"(?P<quantity>\d+)\s+₹\s*(?P<taxable_value>{NUM})\s+[\d.]+%\s+(?P<tax_type>CGST|SGST|IGST)\s+"
+        rf"₹\s*(?P<tax>{NUM})\s+₹\s*(?P<total_amount>{NUM})$",
+    ],
+    item_detail_patterns=[rf"^[\d.]+%\s+(?P<tax_type>CGST|SGST|IGST)\s+₹\s*(?P<tax>{NUM})$"],
+)
+
+TATA_POWER_DDL_BILL = InvoiceTemplate(
+    name="tata_power_ddl_bill",
+    source="Tata Power-DDL Electricity Bill",
+    bill_type="Utility Bill",
+    anchors=[r"Tata Power[- ]DDL", r"\bCA No\.?\b"],
+    fields={
+        "invoice_number": [Pattern(r"Bill No\.?\s*:?\s*(\d+)")],
+        "bill_id": [Pattern(r"\bCA No\.?\s*:?\s*(\d+)")],
+        "invoice_date": [Pattern(r"Bill Date\s*:?\s*(\d{2}[-./]\w{2,3}[-./]\d{2,4})")],
+        "due_date": [Pattern(r"Due Date\s*:?\s*(\d{2}[-./]\w{2,3}[-./]\d{2,4})")],
+        "seller.name": [Pattern(r"(Tata Power[- ]Delhi Distribution Limited|Tata Power[- ]DDL)")],
+        "seller.gstin": [Pattern(r"GSTIN\s*:?\s*" + GSTIN)],
+        "customer.name": [Pattern(r"^Name\s*:?\s*(.+)$")],
+        "customer.address": [Pattern(r"^Address\s*:?\s*(.+)$")],
+        "summary.grand_total": [Pattern(
+            r"Amount Payable(?: by Due Date)?(?:\s*\(?\d{2}[-./]\w{2,3}[-./]\d{2,4}\)?)?\s*:?\s*" + AMOUNT
+        )],
+    },
+    required=["invoice_number", "invoice_date", "summary.grand_total"],
+    default_item_name="Electricity charges",
+    total_parts={
+        "current_charges": [Pattern(r"Current (?:Month )?(?:Bill Amount|Charges|Demand)\s*:?\s*" + AMOUNT)],
+        "arrears": [Pattern(r"Arrears?\s*:?\s*" + AMOUNT)],
+    },
+)
+
+BESCOM_BILL = InvoiceTemplate(
+    name="bescom_bill",
+    source="BESCOM Electricity Bill",
+    bill_type="Utility Bill",
+    anchors=[r"\bBESCOM\b|Bangalore Electricity Supply Company", r"Account ID"],
+    fields={
+        "invoice_number": [Pattern(r"Bill No\.?\s*:?\s*(\w+)")],
+        "bill_id": [Pattern(r"Account ID\s*:?\s*(\d+)")],
+        "invoice_date": [Pattern(r"Bill Date\s*:?\s*(\d{2}[-./]\w{2,3}[-./]\d{2,4})")],
+        "due_date": [Pattern(r"Due Date\s*:?\s*(\d{2}[-./]\w{2,3}[-./]\d{2,4})")],
+        "seller.name": [Pattern(r"(Bangalore Electricity Supply Company Limited|BESCOM)")],
+        "customer.name": [Pattern(r"^Name\s*:?\s*(.+)$")],
+        "customer.address": [Pattern(r"^Address\s*:?\s*(.+)$")],
+        "summary.grand_total": [Pattern(r"Net Amount (?:Due|Payable)\s*:?\s*" + AMOUNT)],
+    },
+    required=["invoice_number", "invoice_date", "summary.grand_total"],
+    default_item_name="Electricity charges",
+    total_parts={
+        "current_charges": [Pattern(r"Current (?:Bill Amount|Charges|Demand)\s*:?\s*" + AMOUNT)],
+        "arrears": [Pattern(r"Arrears?\s*:?\s*" + AMOUNT)],
+    },
+)
+
+# Checked in order; the first layout whose anchors all match is used
+INVOICE_TEMPLATES = [
+    FLIPKART_TAX_INVOICE,
+    AMAZON_TAX_INVOICE,
+    TATA_POWER_DDL_BILL,
+    BESCOM_BILL,
+]
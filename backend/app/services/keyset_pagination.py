@@ -0,0 +1,33 @@
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for a row's (timestamp, id) position."""
+    raw = json.dumps([timestamp.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(timestamp_column, id_column, cursor: str, descending: bool = True):
+    """Rows strictly past the cursor in (timestamp, id) order.
+
+    Compared as a row value so a composite index on (..., timestamp, id) seeks
+    straight to the position: a page costs the same at any depth, unlike OFFSET.
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    if descending:
+        return tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id)
+    return tuple_(timestamp_column, id_column) > tuple_(timestamp, row_id)
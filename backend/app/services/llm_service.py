@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from app.services.lru_cache import LRUCache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# gemini | fake (deterministic local stand-in for offline runs and load tests)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+# Chat runs at a non-zero temperature, so its answers are only cached when asked for
+LLM_CACHE_CHAT = os.getenv("LLM_CACHE_CHAT", "false").lower() == "true"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_DISK_MAX_MB = int(os.getenv("LLM_CACHE_DISK_MAX_MB", "256"))
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", str(BASE_DIR / "cache" / "llm")))
+
+# Rough chars-per-token for English/Latin text; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str | None) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def prompt_key(namespace: str, messages: list[BaseMessage]) -> str:
+    """Stable hash of the provider configuration and the full prompt."""
+    payload = json.dumps([namespace, [(m.type, m.content) for m in messages]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMProvider:
+    """A chat model that turns a list of messages into response text."""
+
+    name = "base"
+
+    def __init__(self, model: str, temperature: float):
+        self.model = model
+        self.temperature = temperature
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.model}:{self.temperature}"
+
+    def invoke(self, messages: list[BaseMessage]) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: list[BaseMessage]) -> Iterator[str]:
+        # Providers without native streaming yield the whole response at once
+        yield self.invoke(messages)
+
+    def forget(self, messages: list[BaseMessage]) -> None:
+        """Drop any cached response to these messages, e.g. one the caller couldn't parse."""
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model: str, temperature: float):
+        super().__init__(model, temperature)
+        self._llm = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # Built on first use so importing a service never needs credentials or network
+        with self._lock:
+            if self._llm is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                self._llm = ChatGoogleGenerativeAI(model=self.model, api_key=GEMINI_API_KEY, temperature=self.temperature)
+            return self._llm
+
+    def invoke(self, messages: list[BaseMessage]) -> str:
+        return self._client().invoke(messages).content
+
+    def stream(self, messages: list[BaseMessage]) -> Iterator[str]:
+        for chunk in self._client().stream(messages):
+            if chunk.content:
+                yield chunk.content
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic offline stand-in: same prompt, same answer, configurable latency."""
+
+    name = "fake"
+
+    def __init__(self, model: str = "fake", temperature: float = 0, latency_ms: float = LLM_FAKE_LATENCY_MS):
+        super().__init__(model, temperature)
+        self.latency_ms = latency_ms
+
+    def invoke(self, messages: list[BaseMessage]) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        digest = prompt_key(self.cache_namespace, messages)
+        prompt = str(messages[-1].content) if messages else ""
+        batch_keys = re.findall(r"^=== DOCUMENT (\S+) ===$", prompt, re.MULTILINE)
+        if batch_keys:
+            return json.dumps([
+                {"document_key": key, **self._fake_extraction(prompt_key(digest, [HumanMessage(content=key)]))}
+                for key in batch_keys
+            ])
+        if "valid JSON" in prompt:
+            return json.dumps(self._fake_extraction(digest))
+        return f"(fake response {digest[:8]}) You asked: {prompt[:200]}"
+
+    @staticmethod
+    def _fake_extraction(digest: str) -> dict:
+        amount = int(digest[:6], 16) % 100000 / 100
+        tax = round(amount * 0.09, 2)
+        return {
+            "bill_id": f"FAKE-{digest[:10]}",
+            "bill_type": "Product Invoice",
+            "invoice_number": f"INV-{digest[10:18]}",
+            "order_id": None,
+            "order_date": None,
+            "invoice_date": "2025-01-01",
+            "due_date": None,
+            "payment_status": "Paid",
+            "customer": {"name": "Test Customer", "address": "Test Address"},
+            "seller": {"name": "Test Seller", "gstin": None, "address": "Test Address"},
+            "items": [{
+                "item_name": "Test Item",
+                "hsn_sac": None,
+                "quantity": 1,
+                "gross_amount": amount,
+                "discount": 0,
+                "taxable_value": amount,
+                "cgst": tax,
+                "sgst": tax,
+                "igst": 0,
+                "total_amount": round(amount + 2 * tax, 2),
+            }],
+            "summary": {
+                "subtotal": amount,
+                "cgst_total": tax,
+                "sgst_total": tax,
+                "igst_total": 0,
+                "total_tax": round(2 * tax, 2),
+                "shipping_charges": 0,
+                "grand_total": round(amount + 2 * tax, 2),
+            },
+            "extraction_metadata": {
+                "source": "Fake LLM provider",
+                "extraction_method": "fake",
+                "confidence_score": 1.0,
+                "uploaded_by": "System",
+                "extraction_date": "2025-01-01",
+            },
+        }
+
+
+class ResponseCache:
+    """Two-tier prompt-hash cache: an in-memory LRU in front of a size-bounded directory on disk.
+
+    Entries older than the TTL are ignored and removed on read; the disk tier drops
+    the least recently written files once it grows past its size budget.
+    """
+
+    # Disk usage is re-checked every this many writes rather than on each one
+    EVICTION_INTERVAL = 50
+
+    def __init__(
+        self,
+        directory: Path | None = LLM_CACHE_DIR,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        disk_max_bytes: int = LLM_CACHE_DISK_MAX_MB * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_bytes = disk_max_bytes
+        # Values are (created, response); the TTL runs from creation, which disk hits carry over
+        self._memory = LRUCache(max_entries=memory_entries)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def delete(self, key: str) -> None:
+        self._memory.pop(key)
+        if self.directory is not None:
+            self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now - entry[0] <= self.ttl_seconds:
+                return entry[1]
+            self._memory.pop(key)
+
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            created, response = float(stored["created"]), stored["response"]
+            if not isinstance(response, str):
+                raise TypeError("cached response is not a string")
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            # Truncated or foreign file: a miss, and out of the way of the next write
+            logger.warning("Discarding malformed LLM cache entry %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        except OSError:
+            return None
+        if now - created > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        self._memory.set(key, (created, response))
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        created = time.time()
+        self._memory.set(key, (created, response))
+        if self.directory is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"created": created, "response": response}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICTION_INTERVAL == 0
+        if evict:
+            self.evict_disk()
+
+    def evict_disk(self) -> None:
+        """Drop expired files, then the oldest ones until the directory fits its size budget."""
+        if self.directory is None or not self.directory.is_dir():
+            return
+        now = time.time()
+        files = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class CachedProvider(LLMProvider):
+    """Serves repeated prompts from the response cache instead of calling the wrapped provider."""
+
+    def __init__(self, provider: LLMProvider, cache: ResponseCache):
+        super().__init__(provider.model, provider.temperature)
+        self.provider = provider
+        self.cache = cache
+        self.name = provider.name
+
+    def invoke(self, messages: list[BaseMessage]) -> str:
+        key = prompt_key(self.provider.cache_namespace, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        response = self.provider.invoke(messages)
+        self.cache.set(key, response)
+        return response
+
+    def stream(self, messages: list[BaseMessage]) -> Iterator[str]:
+        key = prompt_key(self.provider.cache_namespace, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for part in self.provider.stream(messages):
+            parts.append(part)
+            yield part
+        self.cache.set(key, "".join(parts))
+
+    def forget(self, messages: list[BaseMessage]) -> None:
+        self.cache.delete(prompt_key(self.provider.cache_namespace, messages))
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+_response_cache = ResponseCache()
+
+
+def get_llm(temperature: float, cached: bool = LLM_CACHE_ENABLED) -> LLMProvider:
+    """Build the configured provider, wrapped in the shared response cache when enabled."""
+    provider_cls = PROVIDERS.get(LLM_PROVIDER)
+    if provider_cls is None:
+        raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'; expected one of {', '.join(PROVIDERS)}")
+    provider = provider_cls(model=GEMINI_MODEL if provider_cls is GeminiProvider else "fake", temperature=temperature)
+    if cached:
+        return CachedProvider(provider, _response_cache)
+    return provider
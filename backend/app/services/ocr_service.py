@@ -0,0 +1,192 @@
+import os
+import atexit
+import threading
+import warnings
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+from PIL import Image
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker processes holding a warm EasyOCR reader (0 runs OCR in the calling process)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+# torch intra-op threads per worker, so N workers don't oversubscribe the cores
+OCR_TORCH_THREADS = int(os.getenv("OCR_TORCH_THREADS", "1"))
+# Batches allowed in flight before callers are pushed back
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", str(max(1, OCR_WORKERS) * 2)))
+OCR_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OCR_QUEUE_TIMEOUT_SECONDS", "30"))
+OCR_JOB_TIMEOUT_SECONDS = float(os.getenv("OCR_JOB_TIMEOUT_SECONDS", "120"))
+# Single images (uploaded photos) arriving within this window share one worker round trip
+OCR_BATCH_WINDOW_MS = float(os.getenv("OCR_BATCH_WINDOW_MS", "25"))
+OCR_BATCH_MAX_IMAGES = int(os.getenv("OCR_BATCH_MAX_IMAGES", "4"))
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv("OCR_LANGUAGES", "en").split(",") if lang.strip()]
+
+
+class OcrBusyError(RuntimeError):
+    """Raised when the OCR queue stays full for longer than the queue timeout."""
+
+
+class OcrTimeoutError(RuntimeError):
+    """Raised when a batch does not finish within the job timeout."""
+
+
+# Per-process reader: created once by the pool initializer, or lazily when running in-process
+_reader = None
+
+
+def _load_reader():
+    global _reader
+    if _reader is None:
+        import easyocr
+
+        # Suppress pin_memory warning during initialization
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=UserWarning, message=".*pin_memory.*")
+            _reader = easyocr.Reader(OCR_LANGUAGES, gpu=False)
+    return _reader
+
+
+def _init_worker(torch_threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _load_reader()
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def recognize_batch(images: list[np.ndarray]) -> list[str]:
+    """Run OCR over a batch of decoded images; one text block per image."""
+    reader = _load_reader()
+    texts = []
+    for image in images:
+        results = reader.readtext(image, detail=0, paragraph=True)
+        texts.append("\n".join([r.strip() for r in results if isinstance(r, str) and r.strip()]))
+    return texts
+
+
+def decode_image(file_path: str) -> np.ndarray:
+    """Decode an image file into a BGR array (the channel order EasyOCR expects from cv2)."""
+    with Image.open(file_path) as image:
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+
+
+class OcrEngine:
+    """Pool of OCR worker processes, each holding an EasyOCR reader warmed at startup."""
+
+    def __init__(
+        self,
+        workers: int = OCR_WORKERS,
+        max_pending: int = OCR_MAX_PENDING,
+        queue_timeout: float = OCR_QUEUE_TIMEOUT_SECONDS,
+        job_timeout: float = OCR_JOB_TIMEOUT_SECONDS,
+        batch_window_ms: float = OCR_BATCH_WINDOW_MS,
+        batch_max_images: int = OCR_BATCH_MAX_IMAGES,
+    ):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.job_timeout = job_timeout
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_images = batch_max_images
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # Images waiting for the current collection window, with the future each caller waits on
+        self._batch: list[tuple[np.ndarray, Future]] = []
+        self._batch_full = threading.Event()
+        self._batch_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(OCR_TORCH_THREADS,),
+                )
+                atexit.register(self.stop)
+            return self._pool
+
+    def start(self) -> None:
+        """Spawn the workers and load their readers in the background."""
+        if self.workers <= 0:
+            return
+        pool = self._get_pool()
+        # One task per worker so every process is spawned (and its reader loaded) up front
+        for _ in range(self.workers):
+            pool.submit(_warmup)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def recognize(self, images: list[np.ndarray]) -> list[str]:
+        """OCR a batch of decoded images in one worker round trip.
+
+        Blocks for up to the queue timeout when too many batches are in flight,
+        then raises OcrBusyError; raises OcrTimeoutError if the batch overruns.
+        """
+        if not images:
+            return []
+        if self.workers <= 0:
+            return recognize_batch(images)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise OcrBusyError("OCR workers are busy, please retry shortly")
+        try:
+            future = self._get_pool().submit(recognize_batch, images)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A batch that overruns keeps its worker busy, so its slot is only freed once it really ends
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.job_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise OcrTimeoutError(f"OCR did not finish within {self.job_timeout:.0f}s")
+
+    def recognize_one(self, image: np.ndarray) -> str:
+        """OCR one image, batched with other callers' images that arrive within the batch window.
+
+        The first caller of a window waits it out (or until the batch is full), sends
+        the batch through recognize() and hands each caller its text or the error.
+        """
+        if self.workers <= 0 or self.batch_window <= 0 or self.batch_max_images <= 1:
+            return self.recognize([image])[0]
+
+        result = Future()
+        with self._batch_lock:
+            self._batch.append((image, result))
+            leader = len(self._batch) == 1
+            if len(self._batch) >= self.batch_max_images:
+                self._batch_full.set()
+        if leader:
+            self._batch_full.wait(self.batch_window)
+            with self._batch_lock:
+                batch, self._batch = self._batch, []
+                self._batch_full.clear()
+            try:
+                texts = self.recognize([queued for queued, _ in batch])
+            except BaseException as e:
+                for _, waiter in batch:
+                    waiter.set_exception(e)
+            else:
+                for (_, waiter), text in zip(batch, texts):
+                    waiter.set_result(text)
+        return result.result()
+
+    def recognize_files(self, file_paths: list[str]) -> list[str]:
+        return self.recognize([decode_image(path) for path in file_paths])
+
+
+ocr_engine = OcrEngine()
@@ -0,0 +1,283 @@
+import os
+import re
+import atexit
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pdfplumber
+
+from app.services.ocr_service import ocr_engine
+from app.services.image_preprocess_service import ImagePreprocessService
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker processes for page-parallel extraction (1 disables the pool)
+PDF_EXTRACTION_PROCESSES = int(os.getenv("PDF_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Documents shorter than this are extracted in-process; the pool only pays off on long statements
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "8"))
+# Stop reading once the pages holding the bill summary have been seen
+PDF_EARLY_EXIT = os.getenv("PDF_EARLY_EXIT", "false").lower() == "true"
+
+# A page with less text than this and at least one embedded image is treated as scanned
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "20"))
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", "200"))
+# Scanned pages sent to the OCR engine per round trip
+PDF_OCR_BATCH_PAGES = int(os.getenv("PDF_OCR_BATCH_PAGES", "4"))
+# Rendered pages have no EXIF orientation; the rest of the active image profile applies
+PDF_PAGE_PREPROCESS_PROFILE = {**ImagePreprocessService.get_profile(), "exif_transpose": False}
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+PAGE_TEXT_CACHE_DIR = Path(os.getenv("PAGE_TEXT_CACHE_DIR", str(BASE_DIR / "cache" / "pages")))
+PAGE_TEXT_CACHE_MAX_MB = int(os.getenv("PAGE_TEXT_CACHE_MAX_MB", "512"))
+
+# Lines that mark the end of a bill: once a page contains one, later pages are usually T&C or annexures
+SUMMARY_MARKERS = re.compile(
+    r"\b(grand\s+total|total\s+amount\s+(?:payable|due)|amount\s+payable|net\s+payable|total\s+due|invoice\s+total)\b",
+    re.IGNORECASE,
+)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    # Extraction worker threads get here concurrently; only one may create the pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the pool is created from extraction worker threads
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def is_image_only(page, page_text: str) -> bool:
+    """A page with (almost) no text layer but an embedded image needs OCR."""
+    return len(page_text.strip()) < PDF_MIN_TEXT_CHARS and bool(page.images)
+
+
+def extract_page_range(file_path: str, page_indices: list[int]) -> list[tuple[int, str, bool]]:
+    """Extract (index, text, image_only) for the given 0-based pages.
+
+    Runs inside pool workers, so it opens its own handle.
+    """
+    results = []
+    with pdfplumber.open(file_path, pages=[i + 1 for i in page_indices]) as pdf:
+        for index, page in zip(page_indices, pdf.pages):
+            page_text = page.extract_text() or ""
+            results.append((index, page_text, is_image_only(page, page_text)))
+    return results
+
+
+def has_summary(page_text: str) -> bool:
+    return SUMMARY_MARKERS.search(page_text) is not None
+
+
+class PageTextCache:
+    """Per-page text for one file, stored on disk so re-runs skip pages already done.
+
+    Each file's pages share a directory; once the cache grows past its size budget
+    the least recently used directories are dropped.
+    """
+
+    # Disk usage is re-checked every this many writes rather than on each one
+    EVICTION_INTERVAL = 50
+    _writes = 0
+    _writes_lock = threading.Lock()
+
+    def __init__(self, cache_key: str, cache_dir: Path = PAGE_TEXT_CACHE_DIR, max_bytes: int = PAGE_TEXT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.directory = cache_dir / cache_key
+        self.max_bytes = max_bytes
+
+    def load(self) -> dict[int, str]:
+        pages = {}
+        if not self.directory.is_dir():
+            return pages
+        for entry in self.directory.glob("*.txt"):
+            if entry.stem.isdigit():
+                pages[int(entry.stem)] = entry.read_text(encoding="utf-8")
+        try:
+            # The directory's mtime is its last use, which eviction goes by
+            os.utime(self.directory)
+        except OSError:
+            pass
+        return pages
+
+    def store(self, index: int, page_text: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(page_text)
+        os.replace(tmp_path, self.directory / f"{index}.txt")
+
+        with PageTextCache._writes_lock:
+            PageTextCache._writes += 1
+            evict = PageTextCache._writes % self.EVICTION_INTERVAL == 0
+        if evict:
+            self.evict(self.cache_dir, self.max_bytes)
+
+    @staticmethod
+    def evict(cache_dir: Path = PAGE_TEXT_CACHE_DIR, max_bytes: int = PAGE_TEXT_CACHE_MAX_MB * 1024 * 1024) -> None:
+        """Drop the least recently used files' pages until the cache fits max_bytes."""
+        if not cache_dir.is_dir():
+            return
+        entries = []
+        for directory in cache_dir.iterdir():
+            try:
+                used = directory.stat().st_mtime
+                size = sum(entry.stat().st_size for entry in directory.iterdir())
+            except OSError:
+                continue
+            entries.append((used, size, directory))
+        total = sum(size for _, size, _ in entries)
+        for _, size, directory in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def remove(cache_key: str, cache_dir: Path = PAGE_TEXT_CACHE_DIR) -> None:
+        """Forget a file's pages, e.g. once its blob is deleted."""
+        shutil.rmtree(cache_dir / cache_key, ignore_errors=True)
+
+
+class PdfTextService:
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    @staticmethod
+    def shard_pages(page_indices: list[int], pages_per_shard: int = PDF_PAGES_PER_SHARD) -> list[list[int]]:
+        """Split page indices into consecutive shards of at most pages_per_shard pages."""
+        size = max(1, pages_per_shard)
+        return [page_indices[start:start + size] for start in range(0, len(page_indices), size)]
+
+    @staticmethod
+    def extract_layer_sequential(
+        file_path: str,
+        page_indices: list[int],
+        early_exit: bool = PDF_EARLY_EXIT,
+    ) -> list[tuple[int, str, bool]]:
+        results = []
+        with pdfplumber.open(file_path, pages=[i + 1 for i in page_indices]) as pdf:
+            for index, page in zip(page_indices, pdf.pages):
+                page_text = page.extract_text() or ""
+                results.append((index, page_text, is_image_only(page, page_text)))
+                if early_exit and has_summary(page_text):
+                    break
+        return results
+
+    @staticmethod
+    def extract_layer_parallel(
+        file_path: str,
+        page_indices: list[int],
+        early_exit: bool = PDF_EARLY_EXIT,
+        pages_per_shard: int = PDF_PAGES_PER_SHARD,
+    ) -> list[tuple[int, str, bool]]:
+        """Extract the text layer with page shards spread over the process pool.
+
+        With early exit, shards are submitted one wave (one shard per worker) at a
+        time and extraction stops at the first page that contains the bill summary.
+        """
+        pool = _get_pool()
+        shards = PdfTextService.shard_pages(page_indices, pages_per_shard)
+        wave_size = len(shards) if not early_exit else max(1, PDF_EXTRACTION_PROCESSES)
+
+        results = []
+        for wave_start in range(0, len(shards), wave_size):
+            wave = shards[wave_start:wave_start + wave_size]
+            futures = [pool.submit(extract_page_range, file_path, shard) for shard in wave]
+            for future in futures:
+                shard_results = future.result()
+                if early_exit:
+                    for result in shard_results:
+                        results.append(result)
+                        if has_summary(result[1]):
+                            for pending in futures:
+                                pending.cancel()
+                            return results
+                else:
+                    results.extend(shard_results)
+        return results
+
+    @staticmethod
+    def extract_text_layer(
+        file_path: str,
+        page_indices: list[int],
+        early_exit: bool = PDF_EARLY_EXIT,
+    ) -> list[tuple[int, str, bool]]:
+        """Extract the text layer, using the process pool for long documents."""
+        if PDF_EXTRACTION_PROCESSES > 1 and len(page_indices) >= PDF_PARALLEL_MIN_PAGES:
+            return PdfTextService.extract_layer_parallel(file_path, page_indices, early_exit=early_exit)
+        return PdfTextService.extract_layer_sequential(file_path, page_indices, early_exit=early_exit)
+
+    @staticmethod
+    def ocr_pages(file_path: str, page_indices: list[int], dpi: int = PDF_OCR_DPI) -> dict[int, str]:
+        """Rasterize scanned pages at the given DPI and OCR them in batches."""
+        texts = {}
+        if not page_indices:
+            return texts
+        with pdfplumber.open(file_path, pages=[i + 1 for i in page_indices]) as pdf:
+            batch_indices, batch_images = [], []
+            for index, page in zip(page_indices, pdf.pages):
+                rendered = page.to_image(resolution=dpi).original
+                image, _ = ImagePreprocessService.preprocess(rendered, PDF_PAGE_PREPROCESS_PROFILE)
+                batch_images.append(image)
+                batch_indices.append(index)
+                if len(batch_images) >= PDF_OCR_BATCH_PAGES:
+                    texts.update(zip(batch_indices, ocr_engine.recognize(batch_images)))
+                    batch_indices, batch_images = [], []
+            if batch_images:
+                texts.update(zip(batch_indices, ocr_engine.recognize(batch_images)))
+        return texts
+
+    @staticmethod
+    def extract_pages(file_path: str, early_exit: bool = PDF_EARLY_EXIT, cache_key: str | None = None) -> list[str]:
+        """Extract per-page text: text-layer pages on the fast path, scanned pages through OCR.
+
+        With a cache key (the file's content hash), every finished page is cached
+        and later runs only process the pages that are still missing.
+        """
+        cache = PageTextCache(cache_key) if cache_key else None
+        page_count = PdfTextService.page_count(file_path)
+        texts = cache.load() if cache else {}
+
+        missing = [i for i in range(page_count) if i not in texts]
+        if early_exit:
+            # Nothing after a summary page that is already cached will be used
+            summary_at = next((i for i in sorted(texts) if has_summary(texts[i])), None)
+            if summary_at is not None:
+                missing = [i for i in missing if i < summary_at]
+
+        if missing:
+            layer = PdfTextService.extract_text_layer(file_path, missing, early_exit=early_exit)
+            scanned = [index for index, _, image_only in layer if image_only]
+            ocr_texts = PdfTextService.ocr_pages(file_path, scanned)
+            for index, page_text, image_only in layer:
+                texts[index] = ocr_texts.get(index, page_text) if image_only else page_text
+                if cache:
+                    cache.store(index, texts[index])
+
+        pages = []
+        for index in sorted(texts):
+            pages.append(texts[index])
+            if early_exit and has_summary(texts[index]):
+                break
+        return pages
+
+    @staticmethod
+    def extract_text(file_path: str, early_exit: bool = PDF_EARLY_EXIT, cache_key: str | None = None) -> str:
+        return "\n".join(PdfTextService.extract_pages(file_path, early_exit=early_exit, cache_key=cache_key)).strip()
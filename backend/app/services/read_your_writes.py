@@ -0,0 +1,54 @@
+import os
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import has_read_replica
+from app.services.lru_cache import LRUCache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long after a user's write their reads check whether the replica has replayed it
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "30"))
+READ_YOUR_WRITES_USERS = int(os.getenv("READ_YOUR_WRITES_USERS", "10000"))
+
+# user id -> primary WAL position after the user's last write (None off Postgres); per process
+_last_writes = LRUCache(max_entries=READ_YOUR_WRITES_USERS, ttl_seconds=READ_YOUR_WRITES_SECONDS)
+_NO_WRITE = object()
+
+
+class ReadYourWrites:
+    """Sends a user's reads to the primary only while the replica hasn't replayed their own recent writes.
+
+    Everyone else's reads, and the user's once the replica has caught up, stay on
+    the replica; checking costs one replica-side query and nothing on the primary.
+    """
+
+    @staticmethod
+    def record(db: Session, user_id: int) -> None:
+        """Remember the user's write; call with the primary session right after committing it."""
+        if not has_read_replica():
+            return
+        position = None
+        if db.get_bind().dialect.name == "postgresql":
+            position = db.execute(text("SELECT CAST(pg_current_wal_lsn() AS text)")).scalar()
+        _last_writes.set(user_id, position)
+
+    @staticmethod
+    def replica_behind(db: Session, user_id: int) -> bool:
+        """Whether the replica session db may not show the user's recent writes yet."""
+        if not has_read_replica():
+            return False
+        position = _last_writes.get(user_id, _NO_WRITE)
+        if position is _NO_WRITE:
+            return False
+        if position is None:
+            # Nothing to compare against: use the primary for the rest of the window
+            return True
+        caught_up = db.execute(
+            text("SELECT pg_last_wal_replay_lsn() >= CAST(:position AS pg_lsn)"), {"position": position}
+        ).scalar()
+        # NULL when db isn't a streaming replica after all
+        return not caught_up
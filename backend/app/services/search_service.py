@@ -0,0 +1,162 @@
+import os
+import re
+import logging
+from datetime import datetime
+from functools import reduce
+
+from sqlalchemy import Text, cast, func, literal, or_, and_, select
+from sqlalchemy.dialects.postgresql import REGCONFIG, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+from app.models.document_search import DocumentSearch
+from app.models.extracted_data import ExtractedData
+from app.services.bill_normalization_service import load_json_field
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration; 'simple' keeps names, GSTINs and invoice numbers unstemmed
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "simple")
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+
+LIKE_SPECIAL = re.compile(r"([\\%_])")
+
+
+def _like_pattern(term: str) -> str:
+    escaped = LIKE_SPECIAL.sub(r"\\\1", term)
+    return f"%{escaped}%"
+
+
+class SearchIndexService:
+    @staticmethod
+    def weighted_fields(doc: Document, extracted: ExtractedData | dict | None = None) -> dict[str, list[str]]:
+        """Searchable values by full-text weight: identifiers (A), names (B), item names (C)."""
+        def get(name):
+            if extracted is None:
+                return None
+            if isinstance(extracted, dict):
+                return extracted.get(name)
+            return getattr(extracted, name, None)
+
+        seller = load_json_field(get("seller"))
+        seller = seller if isinstance(seller, dict) else {}
+        customer = load_json_field(get("customer"))
+        customer = customer if isinstance(customer, dict) else {}
+        items = load_json_field(get("items"))
+        items = items if isinstance(items, list) else []
+
+        fields = {
+            "A": [get("invoice_number"), seller.get("gstin")],
+            "B": [os.path.splitext(doc.original_filename or "")[0], seller.get("name"), customer.get("name")],
+            "C": [item.get("item_name") for item in items if isinstance(item, dict)],
+        }
+        return {weight: [str(v).strip() for v in values if v and str(v).strip()] for weight, values in fields.items()}
+
+    @classmethod
+    def index_document(cls, db: Session, doc: Document, extracted: ExtractedData | dict | None = None) -> None:
+        """Upsert the document's search row in the caller's transaction (the caller commits)."""
+        fields = cls.weighted_fields(doc, extracted)
+        search_text = "\n".join(value for values in fields.values() for value in values).lower()
+        values = {
+            "document_id": doc.id,
+            "user_id": doc.user_id,
+            "search_text": search_text,
+            "updated_at": datetime.utcnow(),
+        }
+
+        if db.get_bind().dialect.name == "postgresql":
+            config = cast(SEARCH_TEXT_CONFIG, REGCONFIG)
+            values["search_vector"] = reduce(
+                lambda left, right: left.op("||")(right),
+                [
+                    func.setweight(func.to_tsvector(config, cast(" ".join(parts), Text)), weight)
+                    for weight, parts in fields.items()
+                ],
+            )
+            stmt = pg_insert(DocumentSearch).values(**values)
+        else:
+            values["search_vector"] = search_text
+            stmt = sqlite_insert(DocumentSearch).values(**values)
+
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[DocumentSearch.document_id],
+            set_={key: stmt.excluded[key] for key in ("user_id", "search_text", "search_vector", "updated_at")},
+        ))
+
+    @staticmethod
+    def search(db: Session, user_id: int, q: str, limit: int = 20, status_filter: str | None = None) -> list[tuple[Document, float]]:
+        """The user's documents matching q, best first.
+
+        On Postgres a document matches when the full-text query hits its weighted
+        vector, q appears as a substring, or q is a close fuzzy match of a word in it
+        (so typos in seller names still match). Rank adds the full-text score to the
+        trigram word similarity. Every predicate is served by a user_id-led GIN index.
+        """
+        q = q.strip()
+        query = select(Document).join(DocumentSearch, DocumentSearch.document_id == Document.id).where(
+            DocumentSearch.user_id == user_id
+        )
+        if status_filter:
+            query = query.where(Document.status == status_filter)
+
+        if db.get_bind().dialect.name == "postgresql":
+            q_lower = q.lower()
+            tsquery = func.websearch_to_tsquery(cast(SEARCH_TEXT_CONFIG, REGCONFIG), cast(q, Text))
+            rank = (
+                func.ts_rank_cd(DocumentSearch.search_vector, tsquery)
+                + func.word_similarity(cast(q_lower, Text), DocumentSearch.search_text)
+            ).label("rank")
+            query = query.add_columns(rank).where(or_(
+                DocumentSearch.search_vector.op("@@")(tsquery),
+                DocumentSearch.search_text.like(_like_pattern(q_lower), escape="\\"),
+                literal(q_lower, Text).op("<%")(DocumentSearch.search_text),
+            ))
+            order = [rank.desc()]
+        else:
+            # Local SQLite databases: every term must appear somewhere, newest first
+            terms = q.lower().split()
+            query = query.add_columns(literal(1.0).label("rank")).where(and_(
+                *[DocumentSearch.search_text.like(_like_pattern(term), escape="\\") for term in terms]
+            ))
+            order = []
+
+        rows = db.execute(
+            query.order_by(*order, Document.uploaded_at.desc(), Document.id.desc()).limit(min(limit, SEARCH_MAX_RESULTS))
+        ).all()
+        return [(doc, float(rank)) for doc, rank in rows]
+
+    @classmethod
+    def rebuild(cls, db: Session, batch_size: int = 500) -> int:
+        """Re-index every document from its current extraction; returns the number of documents indexed."""
+        indexed, last_id = 0, 0
+        while True:
+            rows = db.execute(
+                select(Document, ExtractedData)
+                .outerjoin(ExtractedData, ExtractedData.document_id == Document.id)
+                .where(Document.id > last_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return indexed
+            for doc, extracted in rows:
+                cls.index_document(db, doc, extracted)
+            last_id = rows[-1][0].id
+            db.commit()
+            db.expunge_all()
+            indexed += len(rows)
+            logger.info("Search index rebuilt for %d documents", indexed)
+
+
+if __name__ == "__main__":
+    # Backfill or repair the search index: python -m app.services.search_service
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        print(f"Indexed {SearchIndexService.rebuild(session)} documents")
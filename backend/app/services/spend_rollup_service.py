@@ -0,0 +1,189 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.spend_rollup import SpendRollup
+
+logger = logging.getLogger(__name__)
+
+# Rollup amount column -> typed extracted_data column it sums
+AMOUNT_COLUMNS = {
+    "total_amount": "grand_total",
+    "total_tax": "total_tax",
+    "cgst": "cgst_total",
+    "sgst": "sgst_total",
+    "igst": "igst_total",
+}
+UNKNOWN = "Unknown"
+
+
+def _get(extracted: ExtractedData | dict, name: str):
+    return extracted.get(name) if isinstance(extracted, dict) else getattr(extracted, name, None)
+
+
+class SpendRollupService:
+    @staticmethod
+    def buckets(extracted: ExtractedData | dict) -> list[tuple[str, str, str | None]]:
+        """(dimension, bucket, label) of every rollup row an extraction counts towards."""
+        seller_name = _get(extracted, "seller_name")
+        bill_day = _get(extracted, "invoice_date_value") or _get(extracted, "order_date_value")
+        return [
+            ("total", "all", None),
+            ("seller", _get(extracted, "seller_gstin") or seller_name or UNKNOWN, seller_name),
+            ("month", bill_day.strftime("%Y-%m") if bill_day else UNKNOWN, None),
+            ("bill_type", (_get(extracted, "bill_type") or "").strip() or UNKNOWN, None),
+        ]
+
+    @classmethod
+    def deltas(cls, user_id: int, extracted: ExtractedData | dict, sign: int = 1) -> list[dict]:
+        """Rollup changes for adding (sign=1) or removing (sign=-1) one extraction.
+
+        Reads the typed columns, so call it after they are set for an insert and
+        before they are recomputed for an edit.
+        """
+        amounts = {
+            column: (_get(extracted, source) or Decimal(0)) * sign
+            for column, source in AMOUNT_COLUMNS.items()
+        }
+        return [
+            {
+                "user_id": user_id,
+                "dimension": dimension,
+                "bucket": bucket,
+                # Removals keep whatever label the bucket already has
+                "label": label if sign > 0 else None,
+                "bill_count": sign,
+                **amounts,
+            }
+            for dimension, bucket, label in cls.buckets(extracted)
+        ]
+
+    @staticmethod
+    def apply(db: Session, deltas: list[dict]) -> None:
+        """Add the deltas to the rollups in the caller's transaction (the caller commits)."""
+        merged: dict[tuple, dict] = {}
+        for delta in deltas:
+            key = (delta["user_id"], delta["dimension"], delta["bucket"])
+            if key not in merged:
+                merged[key] = dict(delta)
+                continue
+            row = merged[key]
+            row["bill_count"] += delta["bill_count"]
+            for column in AMOUNT_COLUMNS:
+                row[column] += delta[column]
+            row["label"] = delta["label"] or row["label"]
+        # An edit that leaves a bucket unchanged nets out to nothing
+        rows = [
+            row for row in merged.values()
+            if row["bill_count"] or any(row[column] for column in AMOUNT_COLUMNS) or row["label"]
+        ]
+        if not rows:
+            return
+
+        # Same lock order in every transaction, so concurrent writers can't deadlock on rollup rows
+        rows.sort(key=lambda row: (row["user_id"], row["dimension"], row["bucket"]))
+        now = datetime.utcnow()
+        for row in rows:
+            row["updated_at"] = now
+
+        stmt = (pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert)(SpendRollup)
+        increments = {
+            column: getattr(SpendRollup, column) + getattr(stmt.excluded, column)
+            for column in ("bill_count", *AMOUNT_COLUMNS)
+        }
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SpendRollup.user_id, SpendRollup.dimension, SpendRollup.bucket],
+                set_={
+                    **increments,
+                    "label": func.coalesce(stmt.excluded.label, SpendRollup.label),
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ),
+            rows,
+        )
+        if any(row["bill_count"] < 0 for row in rows):
+            db.execute(delete(SpendRollup).where(
+                SpendRollup.user_id.in_({row["user_id"] for row in rows}),
+                SpendRollup.bill_count <= 0,
+            ))
+
+    @classmethod
+    def remove_document(cls, db: Session, doc: Document) -> None:
+        """Take a document's extractions out of the rollups before it is deleted."""
+        extractions = db.scalars(select(ExtractedData).where(ExtractedData.document_id == doc.id)).all()
+        cls.apply(db, [delta for data in extractions for delta in cls.deltas(doc.user_id, data, sign=-1)])
+
+    @staticmethod
+    def rebuild(db: Session, user_id: int | None = None) -> int:
+        """Recompute the rollups from extracted_data with one GROUP BY per dimension; returns rows written."""
+        clear = delete(SpendRollup)
+        if user_id is not None:
+            clear = clear.where(SpendRollup.user_id == user_id)
+        db.execute(clear)
+
+        unknown = literal_column(f"'{UNKNOWN}'")
+        bill_day = func.coalesce(ExtractedData.invoice_date_value, ExtractedData.order_date_value)
+        if db.get_bind().dialect.name == "postgresql":
+            month = func.to_char(bill_day, literal_column("'YYYY-MM'"))
+        else:
+            month = func.strftime(literal_column("'%Y-%m'"), bill_day)
+        # Postgres rejects a constant in GROUP BY, so the single "total" bucket groups by user alone
+        dimensions = {
+            "total": (literal_column("'all'"), literal(None)),
+            "seller": (
+                func.coalesce(ExtractedData.seller_gstin, ExtractedData.seller_name, unknown),
+                func.max(ExtractedData.seller_name),
+            ),
+            "month": (func.coalesce(month, unknown), literal(None)),
+            "bill_type": (
+                func.coalesce(func.nullif(func.trim(ExtractedData.bill_type), literal_column("''")), unknown),
+                literal(None),
+            ),
+        }
+
+        now = datetime.utcnow()
+        written = 0
+        for dimension, (bucket, label) in dimensions.items():
+            query = (
+                select(
+                    Document.user_id,
+                    literal(dimension),
+                    bucket,
+                    label,
+                    func.count(ExtractedData.id),
+                    *[func.coalesce(func.sum(getattr(ExtractedData, source)), 0) for source in AMOUNT_COLUMNS.values()],
+                    literal(now),
+                )
+                .select_from(ExtractedData)
+                .join(Document, Document.id == ExtractedData.document_id)
+                .group_by(Document.user_id, *([] if dimension == "total" else [bucket]))
+            )
+            if user_id is not None:
+                query = query.where(Document.user_id == user_id)
+            result = db.execute(insert(SpendRollup).from_select(
+                ["user_id", "dimension", "bucket", "label", "bill_count", *AMOUNT_COLUMNS, "updated_at"],
+                query,
+            ))
+            written += result.rowcount or 0
+        db.commit()
+        return written
+
+
+if __name__ == "__main__":
+    # Repair the dashboard rollups: python -m app.services.spend_rollup_service [user_id]
+    import sys
+    from app.database import SessionLocal
+    from app.models import user  # noqa: F401 (registers the users table the rollups reference)
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        target = int(sys.argv[1]) if len(sys.argv) > 1 else None
+        print(f"Wrote {SpendRollupService.rebuild(session, target)} rollup rows")
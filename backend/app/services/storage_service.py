@@ -0,0 +1,337 @@
+import os
+import re
+import logging
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# local | s3
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_DIR = Path(os.getenv("STORAGE_LOCAL_DIR") or BASE_DIR / "uploads")
+# Directory levels of two hex characters each taken from the content hash; 2 levels = 65,536 leaf directories
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))
+# When set (e.g. "/protected-uploads/"), local files are handed to nginx with X-Accel-Redirect instead of read by Python
+STORAGE_ACCEL_REDIRECT_PREFIX = os.getenv("STORAGE_ACCEL_REDIRECT_PREFIX")
+STORAGE_READ_CHUNK_SIZE = 1024 * 1024
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# S3 or any S3-compatible service (MinIO, Ceph, moto); credentials come from the usual AWS_* variables
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_REGION = os.getenv("S3_REGION")
+
+
+@dataclass
+class StoredObject:
+    size: int
+    modified: datetime | None
+    # Backend's own entity tag (S3), already quoted
+    etag: str | None = None
+
+
+def blob_key(content_hash: str, ext: str) -> str:
+    """Storage key of a content-addressed blob: 'ab/cd/abcd…<ext>' with STORAGE_SHARD_DEPTH levels."""
+    shards = [content_hash[2 * level:2 * level + 2] for level in range(STORAGE_SHARD_DEPTH)]
+    return "/".join([*shards, f"{content_hash}{ext}"])
+
+
+def parse_byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """(start, end) inclusive for a single-range 'bytes=' header, or None to send the whole file.
+
+    Multi-range and malformed headers are ignored, which HTTP allows. Raises ValueError
+    when the range lies entirely past the end of the file (416).
+    """
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        # Suffix range: the last N bytes
+        length = int(match[2])
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - length, 0), size - 1
+    first = int(match[1])
+    last = min(int(match[2]), size - 1) if match[2] else size - 1
+    if first >= size:
+        raise ValueError("Range not satisfiable")
+    if last < first:
+        return None
+    return first, last
+
+
+class StorageBackend:
+    """Where uploaded files live. Keys are '/'-separated relative paths, normally from blob_key."""
+
+    def temp_dir(self) -> str:
+        """Directory for in-progress uploads; put() must be able to take files from it."""
+        raise NotImplementedError
+
+    def put(self, tmp_path: str, key: str, content_type: str | None = None) -> bool:
+        """Move a finished temp file to key; returns False when key already held the (identical) blob.
+
+        Never overwrites: of concurrent puts of one key exactly one returns True.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def stat(self, key: str) -> StoredObject | None:
+        raise NotImplementedError
+
+    def local_file(self, key: str) -> str | None:
+        """Filesystem path of the stored file when the backend has one, for zero-copy serving."""
+        return None
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        """A readable local path for the duration of the block (OCR and PDF parsing need one)."""
+        raise NotImplementedError
+        yield
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Bytes start..end (inclusive) of the stored file, in chunks."""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Files under a root directory, fanned out into hash-prefix subdirectories."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        os.makedirs(self.root / ".tmp", exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        # Documents stored before sharding hold an absolute path in file_path
+        return Path(key) if os.path.isabs(key) else self.root / key
+
+    def temp_dir(self) -> str:
+        # Same filesystem as the blobs, so put() is an atomic rename
+        return str(self.root / ".tmp")
+
+    def put(self, tmp_path: str, key: str, content_type: str | None = None) -> bool:
+        destination = self.path(key)
+        os.makedirs(destination.parent, exist_ok=True)
+        try:
+            # Unlike a rename, a link fails when the key exists, so exactly one concurrent writer creates it
+            os.link(tmp_path, destination)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # Filesystem without hard links
+            if destination.exists():
+                return False
+            os.replace(tmp_path, destination)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def stat(self, key: str) -> StoredObject | None:
+        try:
+            result = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(size=result.st_size, modified=datetime.utcfromtimestamp(result.st_mtime))
+
+    def local_file(self, key: str) -> str | None:
+        return str(self.path(key))
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        yield str(self.path(key))
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(STORAGE_READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket; S3_ENDPOINT_URL points it at MinIO or a local stand-in."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None, region: str | None = None):
+        import boto3
+
+        if not bucket:
+            raise RuntimeError("S3_BUCKET must be set when STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def temp_dir(self) -> str:
+        return tempfile.gettempdir()
+
+    def put(self, tmp_path: str, key: str, content_type: str | None = None) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            # Skips sending the bytes again in the common case
+            if self.stat(key) is not None:
+                return False
+            extra = {"ContentType": content_type} if content_type else {}
+            with open(tmp_path, "rb") as body:
+                # Conditional write: of concurrent uploads of the same key, only one succeeds
+                self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=body, IfNoneMatch="*", **extra)
+            return True
+        except ClientError as e:
+            # 412: already stored; 409: a concurrent conditional write of the same key is in progress
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        finally:
+            os.remove(tmp_path)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def stat(self, key: str) -> StoredObject | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(size=head["ContentLength"], modified=head.get("LastModified"), etag=head.get("ETag"))
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        fd, path = tempfile.mkstemp(prefix=".download-", suffix=Path(key).suffix)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(key), path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        if end < start:
+            return
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{end}")["Body"]
+        try:
+            yield from body.iter_chunks(STORAGE_READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+
+def create_storage() -> StorageBackend:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION)
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'; use 'local' or 's3'")
+    return LocalStorage(STORAGE_LOCAL_DIR)
+
+
+storage = create_storage()
+
+
+def lock_blobs(db, keys) -> None:
+    """Hold the blobs' locks until db's transaction ends (a no-op outside Postgres).
+
+    Uploads hold them from put() until their documents are committed, and
+    deletions while checking that no document still uses a blob, so a blob is
+    never removed after a concurrent upload decided to reuse it.
+    """
+    from sqlalchemy import text
+
+    keys = sorted(set(keys))
+    if not keys or db.get_bind().dialect.name != "postgresql":
+        return
+    # Always acquired in the same order, so two transactions can't deadlock on each other's blobs
+    db.execute(text(
+        "SELECT pg_advisory_xact_lock(h) FROM "
+        "(SELECT DISTINCT hashtext(k) AS h FROM unnest(CAST(:keys AS text[])) AS k ORDER BY h) AS blob_locks"
+    ), {"keys": keys})
+
+
+def migrate_legacy_files(db, batch_size: int = 200) -> int:
+    """Move files stored before sharding (absolute paths in file_path) into the configured backend.
+
+    Documents sharing a file are repointed together, and an original is only removed
+    once the new key is committed. Returns the number of files moved.
+    """
+    import hashlib
+    import shutil
+    from sqlalchemy import select, update
+    from app.models.document import Document
+    from app.services.upload_service import sniff_mime_type, SNIFF_BYTES
+
+    moved, last_path = 0, ""
+    while True:
+        paths = db.scalars(
+            select(Document.file_path).distinct()
+            .where(Document.file_path.like("/%"), Document.file_path > last_path)
+            .order_by(Document.file_path)
+            .limit(batch_size)
+        ).all()
+        if not paths:
+            return moved
+        done = []
+        for path in paths:
+            if not os.path.exists(path):
+                logger.warning("Missing legacy file %s; its documents are left unchanged", path)
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+                digest.update(head)
+                for chunk in iter(lambda: f.read(STORAGE_READ_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+            key = blob_key(content_hash, Path(path).suffix.lower())
+            tmp_path = os.path.join(storage.temp_dir(), f".migrate-{content_hash}")
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            storage.put(tmp_path, key, sniff_mime_type(head))
+            db.execute(update(Document).where(Document.file_path == path).values(
+                file_path=key, filename=Path(key).name, content_hash=content_hash
+            ))
+            done.append(path)
+        last_path = paths[-1]
+        db.commit()
+        for path in done:
+            os.remove(path)
+        moved += len(done)
+        logger.info("Moved %d legacy files into %s storage", moved, STORAGE_BACKEND)
+
+
+if __name__ == "__main__":
+    # Move pre-sharding uploads into the configured backend: python -m app.services.storage_service
+    from app.database import SessionLocal
+    from app.models import user  # noqa: F401 (registers the users table documents reference)
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        print(f"Moved {migrate_legacy_files(session)} files")
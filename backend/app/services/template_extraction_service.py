@@ -0,0 +1,306 @@
+import os
+import re
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTRACTION_ENABLED = os.getenv("TEMPLATE_EXTRACTION_ENABLED", "true").lower() == "true"
+# Below this the document goes to the LLM instead
+TEMPLATE_MIN_CONFIDENCE = float(os.getenv("TEMPLATE_MIN_CONFIDENCE", "0.9"))
+# Rounding slack when reconciling item totals with the bill total (rupees)
+TOTALS_TOLERANCE = 1.0
+
+# A money value must carry a currency sign or paise, so a bare date or account number is never read as one
+AMOUNT = r"(?:(?:₹|Rs\.?|INR)\s*(?=-?\d)|(?=-?[\d,]+\.\d{2}\b))(-?[\d,]+(?:\.\d{1,2})?)"
+DATE_FORMATS = ("%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%y", "%d/%m/%y", "%d %b %Y", "%d-%b-%Y", "%d-%b-%y", "%d %B %Y", "%Y-%m-%d")
+ITEM_NUMBER_FIELDS = ("quantity", "gross_amount", "discount", "taxable_value", "cgst", "sgst", "igst", "total_amount")
+
+
+def parse_amount(value: str | None) -> float | None:
+    if value is None:
+        return None
+    cleaned = re.sub(r"[₹,\s]|Rs\.?|INR", "", value)
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_date(value: str | None) -> str | None:
+    """Normalize the date formats seen on Indian bills to YYYY-MM-DD."""
+    if not value:
+        return None
+    value = re.sub(r"\s+", " ", value.strip().rstrip(",."))
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass(frozen=True)
+class Pattern:
+    """Value of the first capture group of the first match anywhere in the text."""
+    regex: str
+
+    def __post_init__(self):
+        object.__setattr__(self, "compiled", re.compile(self.regex, re.IGNORECASE | re.MULTILINE))
+
+    def apply(self, text: str, lines: list[str]) -> str | None:
+        match = self.compiled.search(text)
+        return match.group(1).strip() if match else None
+
+
+@dataclass(frozen=True)
+class After:
+    """Positional rule: value on the line `offset` lines below the first line matching `label`."""
+    label: str
+    offset: int = 1
+    value: str = r"(.+)"
+
+    def __post_init__(self):
+        object.__setattr__(self, "compiled_label", re.compile(self.label, re.IGNORECASE))
+        object.__setattr__(self, "compiled_value", re.compile(self.value, re.IGNORECASE))
+
+    def apply(self, text: str, lines: list[str]) -> str | None:
+        for index, line in enumerate(lines):
+            if self.compiled_label.search(line):
+                target = index + self.offset
+                if target < len(lines):
+                    match = self.compiled_value.search(lines[target])
+                    return match.group(1).strip() if match else None
+                return None
+        return None
+
+
+@dataclass
+class InvoiceTemplate:
+    """Rules that read one known layout into the extraction schema."""
+    name: str
+    source: str
+    bill_type: str
+    # Every anchor must match for the layout to be recognised
+    anchors: list[str]
+    # Dotted schema path ("seller.gstin", "summary.grand_total") -> rules tried in order
+    fields: dict[str, list]
+    required: list[str]
+    # Item rows are read between these markers; named groups map to item fields
+    items_start: str | None = None
+    items_end: str | None = None
+    item_patterns: list[str] = field(default_factory=list)
+    # Lines after an item row that add fields to it (HSN line, second tax line)
+    item_detail_patterns: list[str] = field(default_factory=list)
+    # Bills without an item table (utilities) get one line item for the amount due
+    default_item_name: str | None = None
+    # Independently printed amounts (bill-period charges, arrears) that must add up to the grand
+    # total; required before a bill with a synthesized line item can skip the LLM
+    total_parts: dict[str, list] = field(default_factory=dict)
+
+    def __post_init__(self):
+        flags = re.IGNORECASE | re.MULTILINE
+        self.compiled_anchors = [re.compile(anchor, flags) for anchor in self.anchors]
+        self.compiled_items_start = re.compile(self.items_start, re.IGNORECASE) if self.items_start else None
+        self.compiled_items_end = re.compile(self.items_end, re.IGNORECASE) if self.items_end else None
+        self.compiled_item_patterns = [re.compile(p, re.IGNORECASE) for p in self.item_patterns]
+        self.compiled_item_details = [re.compile(p, re.IGNORECASE) for p in self.item_detail_patterns]
+
+    def matches(self, text: str) -> bool:
+        return all(anchor.search(text) for anchor in self.compiled_anchors)
+
+
+def _set_path(target: dict, path: str, value) -> None:
+    *parents, leaf = path.split(".")
+    for key in parents:
+        target = target.setdefault(key, {})
+    target[leaf] = value
+
+
+def _get_path(source: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(source, dict):
+            return None
+        source = source.get(key)
+    return source
+
+
+def _apply_item_groups(item: dict, groups: dict) -> None:
+    for key, value in groups.items():
+        if value is None or key == "tax_type":
+            continue
+        if key == "tax" and groups.get("tax_type"):
+            item[groups["tax_type"].lower()] = parse_amount(value)
+        elif key == "discount":
+            # Layouts print discounts as negative amounts; the schema stores them positive
+            amount = parse_amount(value)
+            item[key] = abs(amount) if amount is not None else None
+        elif key in ITEM_NUMBER_FIELDS:
+            item[key] = parse_amount(value)
+        elif key in ("item_name", "hsn_sac"):
+            item[key] = value.strip()
+
+
+class TemplateExtractionService:
+    @staticmethod
+    def fingerprint(text: str) -> InvoiceTemplate | None:
+        """The known layout this text comes from, if any."""
+        from app.services.invoice_templates import INVOICE_TEMPLATES
+
+        for template in INVOICE_TEMPLATES:
+            if template.matches(text):
+                return template
+        return None
+
+    @staticmethod
+    def extract_items(template: InvoiceTemplate, lines: list[str]) -> list[dict]:
+        items = []
+        inside = template.compiled_items_start is None
+        for line in lines:
+            if not inside:
+                inside = bool(template.compiled_items_start.search(line))
+                continue
+            if template.compiled_items_end and template.compiled_items_end.search(line):
+                break
+            for pattern in template.compiled_item_patterns:
+                match = pattern.search(line)
+                if match:
+                    item = {"item_name": None, "hsn_sac": None, "quantity": 1, "discount": 0, "cgst": 0, "sgst": 0, "igst": 0}
+                    _apply_item_groups(item, match.groupdict())
+                    items.append(item)
+                    break
+            else:
+                if items:
+                    for pattern in template.compiled_item_details:
+                        match = pattern.search(line)
+                        if match:
+                            _apply_item_groups(items[-1], match.groupdict())
+                            break
+        for item in items:
+            taxes = (item.get("cgst") or 0) + (item.get("sgst") or 0) + (item.get("igst") or 0)
+            if item.get("taxable_value") is None and item.get("total_amount") is not None:
+                item["taxable_value"] = round(item["total_amount"] - taxes, 2)
+            if item.get("gross_amount") is None:
+                item["gross_amount"] = item.get("taxable_value")
+        return items
+
+    @staticmethod
+    def total_parts(template: InvoiceTemplate, text: str) -> list[float]:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        parts = []
+        for rules in template.total_parts.values():
+            value = parse_amount(next((v for v in (rule.apply(text, lines) for rule in rules) if v), None))
+            if value is not None:
+                parts.append(value)
+        return parts
+
+    @staticmethod
+    def confidence(template: InvoiceTemplate, data: dict, text: str = "") -> float:
+        """Share of consistency checks passed; 0 when a required field is missing."""
+        if any(_get_path(data, path) in (None, "") for path in template.required):
+            return 0.0
+        checks = []
+        summary = data["summary"]
+        items = data["items"]
+        grand_total = summary.get("grand_total")
+        if not template.item_patterns and template.default_item_name:
+            # The single item is copied from the grand total, so checking items against it proves
+            # nothing; the total has to be confirmed by amounts printed elsewhere on the bill
+            parts = TemplateExtractionService.total_parts(template, text)
+            checks.append(
+                bool(parts) and grand_total is not None and abs(sum(parts) - grand_total) <= TOTALS_TOLERANCE
+            )
+        else:
+            checks.append(bool(items))
+            for item in items:
+                taxes = (item.get("cgst") or 0) + (item.get("sgst") or 0) + (item.get("igst") or 0)
+                checks.append(
+                    item.get("total_amount") is not None and item.get("taxable_value") is not None
+                    and abs(item["taxable_value"] + taxes - item["total_amount"]) <= TOTALS_TOLERANCE
+                )
+            if grand_total is not None:
+                items_total = sum(item.get("total_amount") or 0 for item in items)
+                checks.append(abs(items_total + (summary.get("shipping_charges") or 0) - grand_total) <= TOTALS_TOLERANCE)
+        for path in ("invoice_date", "due_date", "order_date"):
+            if path in template.fields:
+                # A date rule that matched but did not parse means the layout drifted
+                checks.append(data.get(path) is not None)
+        return sum(checks) / len(checks)
+
+    @staticmethod
+    def apply(template: InvoiceTemplate, text: str) -> dict:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        data = {
+            "bill_id": None, "bill_type": template.bill_type, "invoice_number": None, "order_id": None,
+            "order_date": None, "invoice_date": None, "due_date": None, "payment_status": None,
+            "customer": {"name": None, "address": None},
+            "seller": {"name": None, "gstin": None, "address": None},
+            "items": [],
+            "summary": {},
+        }
+        for path, rules in template.fields.items():
+            value = next((v for v in (rule.apply(text, lines) for rule in rules) if v), None)
+            if path.endswith("_date"):
+                value = parse_date(value)
+            elif path.startswith("summary."):
+                value = parse_amount(value)
+            _set_path(data, path, value)
+
+        items = TemplateExtractionService.extract_items(template, lines) if template.item_patterns else []
+        summary = data["summary"]
+        if not items and template.default_item_name and summary.get("grand_total") is not None:
+            items = [{
+                "item_name": template.default_item_name, "hsn_sac": None, "quantity": 1,
+                "gross_amount": summary["grand_total"], "discount": 0, "taxable_value": summary["grand_total"],
+                "cgst": 0, "sgst": 0, "igst": 0, "total_amount": summary["grand_total"],
+            }]
+        data["items"] = items
+
+        # Fill totals the layout does not print from the item rows
+        for total_key, item_key in (("cgst_total", "cgst"), ("sgst_total", "sgst"), ("igst_total", "igst")):
+            if summary.get(total_key) is None:
+                summary[total_key] = round(sum(item.get(item_key) or 0 for item in items), 2)
+        if summary.get("subtotal") is None:
+            summary["subtotal"] = round(sum(item.get("taxable_value") or 0 for item in items), 2)
+        if summary.get("total_tax") is None:
+            summary["total_tax"] = round(summary["cgst_total"] + summary["sgst_total"] + summary["igst_total"], 2)
+        if summary.get("shipping_charges") is None:
+            summary["shipping_charges"] = 0
+        if not data["bill_id"]:
+            data["bill_id"] = data["invoice_number"]
+        return data
+
+    @staticmethod
+    def extract(text: str) -> dict | None:
+        """Extract a known layout without the LLM; None when no template applies with enough confidence."""
+        if not TEMPLATE_EXTRACTION_ENABLED:
+            return None
+        started = time.perf_counter()
+        template = TemplateExtractionService.fingerprint(text)
+        if template is None:
+            return None
+        try:
+            data = TemplateExtractionService.apply(template, text)
+        except Exception:
+            logger.exception("Template %s failed", template.name)
+            return None
+        confidence = TemplateExtractionService.confidence(template, data, text)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if confidence < TEMPLATE_MIN_CONFIDENCE:
+            logger.info("Template %s matched but confidence %.2f is too low; using the LLM", template.name, confidence)
+            return None
+        logger.info("Template %s extracted in %.1f ms (confidence %.2f)", template.name, elapsed_ms, confidence)
+        data["extraction_metadata"] = {
+            "source": template.source,
+            "extraction_method": f"Template ({template.name})",
+            "confidence_score": round(confidence, 2),
+            "uploaded_by": "System",
+            "extraction_date": datetime.utcnow().strftime("%Y-%m-%d"),
+        }
+        return data
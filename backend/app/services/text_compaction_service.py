@@ -0,0 +1,155 @@
+import os
+import re
+import math
+import time
+from collections import Counter
+
+from app.services.llm_service import estimate_tokens
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TEXT_COMPACTION_ENABLED = os.getenv("TEXT_COMPACTION_ENABLED", "true").lower() == "true"
+# Lines near the top and bottom of each page that are checked for repetition across pages
+COMPACTION_EDGE_LINES = int(os.getenv("COMPACTION_EDGE_LINES", "3"))
+# A header/footer line must repeat on at least this share of pages (and on two or more) to be dropped
+COMPACTION_REPEAT_RATIO = float(os.getenv("COMPACTION_REPEAT_RATIO", "0.5"))
+
+PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d+\s*(?:of|/)\s*\d+$|^page\s*\d+$", re.IGNORECASE)
+SEPARATOR_LINE = re.compile(r"^[\s\-_=.*~|+#]+$")
+DOT_LEADER = re.compile(r"\.{4,}|_{4,}|-{4,}")
+INLINE_SPACE = re.compile(r"[ \t ]+")
+AMOUNT_LIKE = re.compile(r"\d[\d,]*\.\d{2}\b")
+
+# Fixed legal and courtesy text that carries no bill data
+BOILERPLATE_PATTERNS = re.compile(
+    "|".join([
+        r"this is an? (?:computer|system|electronically)[- ]generated (?:invoice|bill|document|statement|receipt)",
+        r"does not require (?:a |any )?(?:physical )?signature",
+        r"^e\.?\s*&\s*o\.?\s*e\.?$",
+        r"subject to .{0,40}\bjurisdiction\b",
+        r"^(?:thank you|thanks) for (?:shopping|your (?:order|business|purchase|payment))",
+        r"^please (?:retain|keep) (?:this|the) (?:invoice|bill|receipt)",
+        r"intended for end user consumption and not for resale",
+        r"^(?:declaration|disclaimer)\s*:?$",
+        r"^(?:for )?queries,? (?:please )?(?:contact|call|write to)\b",
+    ]),
+    re.IGNORECASE,
+)
+# A terms-and-conditions block runs from a heading on its own line until a blank line or a line that looks like bill data
+TERMS_HEADING = re.compile(r"^(?:\d+\.\s*)?(?:terms\s*(?:and|&)\s*conditions|t\s*&\s*c)\s*:?$", re.IGNORECASE)
+# "Due Date: 12-03-2024", "GSTIN 29ABCDE1234F1Z5", "Total ₹1,200", "Bill To": fields printed after the terms
+FIELD_LABEL = re.compile(
+    r"^[a-z][a-z .&/()#'-]{0,40}:\s*\S"
+    r"|^(?:gstin|gst\s*no|pan|total|sub\s*-?\s*total|grand\s+total|net\s+amount|amount|balance|due\s+date"
+    r"|invoice|bill\s+to|ship\s+to|billed\s+to|shipped\s+to|customer|buyer|consignee|address)\b"
+    r"|(?:₹|\brs\.?|\binr)\s*\d",
+    re.IGNORECASE,
+)
+DATE_LIKE = re.compile(
+    r"\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}\s*(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*,?\s*\d{2,4}\b",
+    re.IGNORECASE,
+)
+TERMS_LINE = re.compile(r"^(?:\d+\.\s*)?terms\s*(?:and|&)\s*conditions\b", re.IGNORECASE)
+
+
+def normalize_line(line: str) -> str:
+    """Key for spotting the same header/footer on every page, whatever its page number or date."""
+    return re.sub(r"\d+", "#", INLINE_SPACE.sub(" ", line.strip().lower()))
+
+
+class TextCompactionService:
+    @staticmethod
+    def repeated_edge_lines(pages: list[list[str]]) -> set[str]:
+        """Normalized lines that appear in the top or bottom edge of most pages."""
+        if len(pages) < 2:
+            return set()
+        counts = Counter()
+        for lines in pages:
+            edges = lines[:COMPACTION_EDGE_LINES] + lines[-COMPACTION_EDGE_LINES:]
+            # Item rows often end a page and look alike once digits are masked; never treat them as footers
+            counts.update({
+                normalize_line(TextCompactionService.clean_line(line)) for line in edges if not AMOUNT_LIKE.search(line)
+            })
+        threshold = max(2, math.ceil(COMPACTION_REPEAT_RATIO * len(pages)))
+        return {line for line, count in counts.items() if count >= threshold and line}
+
+    @staticmethod
+    def clean_line(line: str) -> str:
+        # Dot leaders and runs of spaces from table layout become single spaces
+        line = DOT_LEADER.sub(" ", line)
+        return INLINE_SPACE.sub(" ", line).strip()
+
+    @staticmethod
+    def ends_terms(line: str, after_blank: bool) -> bool:
+        """Whether a line inside a terms block starts something else: a new paragraph or bill data."""
+        return after_blank or bool(AMOUNT_LIKE.search(line) or FIELD_LABEL.search(line) or DATE_LIKE.search(line))
+
+    @staticmethod
+    def compact_pages(pages: list[str]) -> tuple[str, dict]:
+        """Compact per-page text for prompting and return (text, stats).
+
+        Drops page numbers, separator rules, headers and footers repeated across
+        pages (the first copy is kept, it usually names the seller), legal
+        boilerplate and terms-and-conditions blocks, and collapses table spacing
+        and blank lines. Stats carry the estimated token counts before and after.
+        """
+        started = time.perf_counter()
+        raw_text = "\n".join(pages).strip()
+        stats = {"tokens_before": estimate_tokens(raw_text)}
+        if not TEXT_COMPACTION_ENABLED:
+            stats.update(tokens_after=stats["tokens_before"], compaction_ms=0.0)
+            return raw_text, stats
+
+        page_lines, paragraph_starts = [], []
+        for page in pages:
+            lines, starts, blank = [], set(), False
+            for line in (page or "").splitlines():
+                if not line.strip():
+                    blank = True
+                    continue
+                if blank and lines:
+                    starts.add(len(lines))
+                lines.append(line)
+                blank = False
+            page_lines.append(lines)
+            # Indices of lines that follow a blank line
+            paragraph_starts.append(starts)
+        repeated = TextCompactionService.repeated_edge_lines(page_lines)
+        seen_repeated = set()
+        removed = Counter()
+
+        kept = []
+        for lines, starts in zip(page_lines, paragraph_starts):
+            in_terms = False
+            for index, line in enumerate(lines):
+                cleaned = TextCompactionService.clean_line(line)
+                at_edge = index < COMPACTION_EDGE_LINES or index >= len(lines) - COMPACTION_EDGE_LINES
+                key = normalize_line(cleaned) if at_edge else None
+                if in_terms and not TextCompactionService.ends_terms(cleaned, index in starts):
+                    removed["terms"] += 1
+                    continue
+                in_terms = False
+                if not cleaned or SEPARATOR_LINE.match(cleaned) or PAGE_NUMBER.match(cleaned):
+                    removed["layout"] += 1
+                elif key in repeated and key in seen_repeated:
+                    removed["repeated"] += 1
+                elif TERMS_HEADING.match(cleaned):
+                    in_terms = True
+                    removed["terms"] += 1
+                elif TERMS_LINE.match(cleaned) or BOILERPLATE_PATTERNS.search(cleaned):
+                    removed["boilerplate"] += 1
+                else:
+                    if key in repeated:
+                        seen_repeated.add(key)
+                    kept.append(cleaned)
+
+        text = "\n".join(kept)
+        stats.update({
+            "tokens_after": estimate_tokens(text),
+            "lines_removed": dict(removed),
+            "compaction_ms": (time.perf_counter() - started) * 1000,
+        })
+        return text, stats
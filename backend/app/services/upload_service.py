@@ -0,0 +1,160 @@
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.services.storage_service import storage, blob_key
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "50"))
+MAX_UPLOAD_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+
+# Leading bytes of each accepted format, checked against the declared extension
+MAGIC_SIGNATURES = (
+    (b"%PDF-", "application/pdf"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+EXTENSION_MIME = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+SNIFF_BYTES = max(len(signature) for signature, _ in MAGIC_SIGNATURES)
+
+
+@dataclass
+class StoredUpload:
+    filename: str
+    # Storage key of the blob (see storage_service.blob_key)
+    file_path: str
+    file_size: int
+    content_hash: str
+    mime_type: str
+    # Finished temp file waiting for UploadService.put_blob; None once it has been handed to storage
+    tmp_path: str | None = None
+    # False when identical bytes were already stored and the existing blob is reused
+    created: bool = False
+
+
+def sniff_mime_type(head: bytes) -> str | None:
+    """Detect the file type from its leading bytes."""
+    for signature, mime_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _finish_blob(tmp_path: str, head: bytes, digest, size: int, ext: str) -> StoredUpload:
+    """Check the sniffed type of a fully written temp file and name its content-addressed key."""
+    mime_type = sniff_mime_type(head)
+    if mime_type is None or mime_type != EXTENSION_MIME.get(ext):
+        raise ValueError("File content does not match its type")
+
+    content_hash = digest.hexdigest()
+    return StoredUpload(
+        filename=f"{content_hash}{ext}",
+        file_path=blob_key(content_hash, ext),
+        file_size=size,
+        content_hash=content_hash,
+        mime_type=mime_type,
+        tmp_path=tmp_path,
+    )
+
+
+class UploadService:
+    @staticmethod
+    async def store_upload(file: UploadFile) -> StoredUpload:
+        """Stream an upload to disk in chunks, hashing and sniffing it in the same pass.
+
+        Bytes go to a temp file in the storage backend's temp directory off the event
+        loop and the size limit is enforced as they arrive. The finished file stays
+        there until put_blob moves it into storage under its content-addressed key.
+        Raises ValueError for files that fail validation.
+        """
+        ext = Path(file.filename).suffix.lower()
+        fd, tmp_path = tempfile.mkstemp(dir=storage.temp_dir(), prefix=".upload-", suffix=".part")
+        out = os.fdopen(fd, "wb")
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise ValueError(f"File size exceeds {MAX_UPLOAD_SIZE_MB}MB limit. Please upload a smaller file.")
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                await run_in_threadpool(_write_chunk, out, digest, chunk)
+            await run_in_threadpool(out.close)
+            return await run_in_threadpool(_finish_blob, tmp_path, head, digest, size, ext)
+        except BaseException:
+            out.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def store_fileobj(source: BinaryIO, filename: str) -> StoredUpload:
+        """Blocking counterpart of store_upload for an open binary file (a spooled upload or a ZIP entry).
+
+        Same chunked copy, size limit, sniffing and content addressing; safe to run
+        from worker threads.
+        """
+        ext = Path(filename).suffix.lower()
+        fd, tmp_path = tempfile.mkstemp(dir=storage.temp_dir(), prefix=".upload-", suffix=".part")
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_SIZE:
+                        raise ValueError(f"File size exceeds {MAX_UPLOAD_SIZE_MB}MB limit. Please upload a smaller file.")
+                    if len(head) < SNIFF_BYTES:
+                        head += chunk[:SNIFF_BYTES - len(head)]
+                    _write_chunk(out, digest, chunk)
+            return _finish_blob(tmp_path, head, digest, size, ext)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def put_blob(stored: StoredUpload) -> None:
+        """Move a staged upload into storage, recording whether this call created the blob.
+
+        Blocking. Call it with the blob locked in the transaction that saves its document
+        (storage_service.lock_blobs), so a concurrent deletion can't remove a reused blob.
+        """
+        if stored.tmp_path is None:
+            return
+        stored.created = storage.put(stored.tmp_path, stored.file_path, stored.mime_type)
+        stored.tmp_path = None
+
+    @staticmethod
+    def discard(stored: StoredUpload) -> None:
+        """Remove a staged upload that was never put into storage."""
+        if stored.tmp_path and os.path.exists(stored.tmp_path):
+            os.remove(stored.tmp_path)
+        stored.tmp_path = None
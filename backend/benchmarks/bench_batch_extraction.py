@@ -0,0 +1,61 @@
+"""Per-document LLM calls vs multi-document prompts for many short receipts.
+
+Extracts the same synthetic one-page receipts twice with the fake provider: once
+with one extract_from_document call each, once through BatchExtractionService,
+which packs short documents into shared prompts. The response cache is disabled
+so both passes pay the simulated LLM latency. No database is needed.
+
+Usage (from backend/):
+    LLM_PROVIDER=fake LLM_FAKE_LATENCY_MS=1500 python -m benchmarks.bench_batch_extraction --docs 40
+"""
+import os
+import sys
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from benchmarks.bench_pdf_extraction import write_synthetic_pdf
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40)
+    args = parser.parse_args()
+
+    if os.getenv("LLM_PROVIDER") != "fake":
+        sys.exit("Set LLM_PROVIDER=fake so the benchmark never calls Gemini")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        os.environ.setdefault("PAGE_TEXT_CACHE_DIR", os.path.join(tmp, "pages"))
+        from app.services.extract_data_service import ExtractionService
+        from app.services.batch_extraction_service import BatchExtractionService, EXTRACTION_BATCH_CONCURRENCY
+
+        docs = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"receipt_{i}.pdf")
+            write_synthetic_pdf(path, 1, summary_page=1, lines_per_page=8 + i % 10)
+            docs.append(SimpleNamespace(id=i + 1, file_path=path, file_type="pdf", content_hash=f"bench-{i}"))
+        # Fill the page cache so both passes measure the LLM side only
+        for doc in docs:
+            ExtractionService.extract_text_from_file(doc.file_path, cache_key=doc.content_hash)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=EXTRACTION_BATCH_CONCURRENCY) as pool:
+            list(pool.map(ExtractionService.extract_from_document, docs))
+        single = time.perf_counter() - started
+        print(f"{'one call per doc':<18} {single:7.2f}s  {args.docs:>4} LLM calls")
+
+        started = time.perf_counter()
+        results, stats = BatchExtractionService.extract(docs)
+        batched = time.perf_counter() - started
+        failed = sum(isinstance(result, Exception) for result in results.values())
+        calls = stats["batched_calls"] + stats["single_calls"]
+        print(f"{'packed prompts':<18} {batched:7.2f}s  {calls:>4} LLM calls  ({stats['fallbacks']} fallbacks, {failed} failed)")
+        print(f"speedup: {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
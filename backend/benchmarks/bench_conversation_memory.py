@@ -0,0 +1,118 @@
+"""Prompt size and latency of long chats: fixed last-20 window vs token-budgeted memory.
+
+Plays scripted conversations of --turns turns each against a throwaway SQLite
+database with the fake LLM provider, building every prompt both ways, and reports
+the prompt tokens per turn, how often the rolling summary was refreshed and the
+time spent loading history.
+
+Usage (from backend/):
+    LLM_PROVIDER=fake python -m benchmarks.bench_conversation_memory --conversations 5 --turns 200
+"""
+import os
+import sys
+import random
+import argparse
+import statistics
+import tempfile
+import time
+
+QUESTIONS = [
+    "What is the grand total on this bill?",
+    "Which seller issued it and what is their GSTIN?",
+    "List every item with its quantity and taxable value.",
+    "How much CGST and SGST was charged in total?",
+    "Was there any discount? Compare it with the one you mentioned earlier.",
+    "When is the payment due, and is it already paid?",
+    "Explain how the subtotal adds up to the grand total.",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=None, help="history token budget (default: CHAT_HISTORY_TOKEN_BUDGET)")
+    args = parser.parse_args()
+
+    if os.getenv("LLM_PROVIDER") != "fake":
+        sys.exit("Set LLM_PROVIDER=fake so the benchmark never calls Gemini")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SUPABASE_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LLM_CACHE_DIR", os.path.join(tmp, "llm"))
+        from app.database import Base, engine, SessionLocal
+        from app.models.user import User  # noqa: F401 (registers the tables chat rows reference)
+        from app.models.document import Document  # noqa: F401
+        from app.models.chat_message import ChatMessage
+        from app.services.chat_service import ChatService
+        from app.services import conversation_memory_service as memory_service
+        from app.services.conversation_memory_service import ConversationMemory, estimate_tokens
+
+        budget = args.budget or memory_service.CHAT_HISTORY_TOKEN_BUDGET
+        Base.metadata.create_all(bind=engine)
+        context = "Document Information:\nGrand Total: ₹1180.00\n" * 20
+        rng = random.Random(0)
+
+        summary_calls = 0
+        summarize = ConversationMemory.summarize
+
+        def counting_summarize(previous_summary, turns):
+            nonlocal summary_calls
+            summary_calls += 1
+            return summarize(previous_summary, turns)
+
+        ConversationMemory.summarize = counting_summarize
+
+        fixed_tokens, memory_tokens, load_ms = [], [], []
+        late_fixed, late_memory = [], []
+        with SessionLocal() as db:
+            for conversation in range(args.conversations):
+                # Chat rows only reference the document by id; SQLite does not enforce the foreign keys
+                document_id, user_id = conversation + 1, 1
+                for turn in range(args.turns):
+                    question = rng.choice(QUESTIONS)
+
+                    recent = db.query(ChatMessage).filter(
+                        ChatMessage.document_id == document_id,
+                        ChatMessage.user_id == user_id
+                    ).order_by(ChatMessage.id.desc()).limit(20).all()
+                    fixed_prompt = ChatService.build_messages(question, context, list(reversed(recent)) or None)
+
+                    started = time.perf_counter()
+                    memory = ConversationMemory.load(db, document_id, user_id, budget=budget)
+                    load_ms.append((time.perf_counter() - started) * 1000)
+                    memory_prompt = ChatService.build_messages(question, context, memory.turns or None, memory.summary)
+
+                    fixed = sum(estimate_tokens(str(m.content)) for m in fixed_prompt)
+                    budgeted = sum(estimate_tokens(str(m.content)) for m in memory_prompt)
+                    fixed_tokens.append(fixed)
+                    memory_tokens.append(budgeted)
+                    if turn >= args.turns - 20:
+                        late_fixed.append(fixed)
+                        late_memory.append(budgeted)
+
+                    # Answers vary in length like real ones do
+                    answer = ChatService.generate_response(question, context, memory.turns, conversation_summary=memory.summary)
+                    answer += " Details: " + " ".join(["amount"] * rng.randint(10, 300))
+                    db.add(ChatMessage(document_id=document_id, user_id=user_id, message=question, response=answer))
+                    db.commit()
+
+        total_turns = args.conversations * args.turns
+        print(f"{args.conversations} conversations x {args.turns} turns, history budget {budget} tokens")
+        print(f"{'strategy':<18} {'mean':>7} {'p50':>7} {'p95':>7} {'max':>7} {'last 20 mean':>13}")
+        for label, values, late in (("last 20 messages", fixed_tokens, late_fixed), ("token budget", memory_tokens, late_memory)):
+            print(
+                f"{label:<18} {statistics.mean(values):>7.0f} {percentile(values, 0.5):>7.0f} "
+                f"{percentile(values, 0.95):>7.0f} {max(values):>7.0f} {statistics.mean(late):>13.0f}"
+            )
+        print(f"summary refreshes: {summary_calls} ({summary_calls / total_turns:.1%} of turns)")
+        print(f"history load: mean {statistics.mean(load_ms):.2f} ms, p95 {percentile(load_ms, 0.95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
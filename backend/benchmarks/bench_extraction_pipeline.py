@@ -0,0 +1,53 @@
+"""Offline load test of the extraction pipeline (text extraction + LLM) with the fake provider.
+
+Runs ExtractionService.extract_from_document over synthetic PDFs from a thread
+pool, twice: the first pass pays the simulated LLM latency, the second is served
+from the prompt-hash response cache. No database or network access is needed.
+
+Usage (from backend/):
+    LLM_PROVIDER=fake LLM_FAKE_LATENCY_MS=1500 python -m benchmarks.bench_extraction_pipeline --docs 50
+"""
+import os
+import sys
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from benchmarks.bench_pdf_extraction import write_synthetic_pdf
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if os.getenv("LLM_PROVIDER") != "fake":
+        sys.exit("Set LLM_PROVIDER=fake so the benchmark never calls Gemini")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep this run's cache entries out of the real cache directory
+        os.environ.setdefault("LLM_CACHE_DIR", os.path.join(tmp, "llm"))
+        os.environ.setdefault("PAGE_TEXT_CACHE_DIR", os.path.join(tmp, "pages"))
+        from app.services.extract_data_service import ExtractionService
+
+        docs = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"bill_{i}.pdf")
+            # Vary the summary page so every document yields a distinct prompt
+            write_synthetic_pdf(path, args.pages, summary_page=1 + i % args.pages, lines_per_page=10 + i)
+            docs.append(SimpleNamespace(file_path=path, file_type="pdf", content_hash=None))
+
+        for label in ("cold (LLM call per doc)", "warm (response cache)"):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(ExtractionService.extract_from_document, docs))
+            elapsed = time.perf_counter() - started
+            print(f"{label:<26} {elapsed:7.2f}s  {len(results) / elapsed:7.1f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark OCR accuracy vs latency for each image preprocessing profile.
+
+Runs every image in a sample corpus through each profile and EasyOCR (in this
+process, so worker IPC does not blur the numbers). Accuracy is the character
+similarity to a ground-truth ``<image stem>.txt`` next to the image when one
+exists, otherwise to the OCR output of the unprocessed image.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_preprocessing path/to/receipts
+"""
+import argparse
+import difflib
+import statistics
+import time
+from pathlib import Path
+
+from app.services.image_preprocess_service import ImagePreprocessService, PREPROCESS_PROFILES
+from app.services.ocr_service import recognize_batch
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def similarity(text: str, reference: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(text.split()), " ".join(reference.split())).ratio()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--profiles", nargs="*", default=list(PREPROCESS_PROFILES))
+    args = parser.parse_args()
+
+    images = sorted(p for p in args.corpus.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not images:
+        raise SystemExit(f"No images found in {args.corpus}")
+
+    # Load the reader before timing anything
+    recognize_batch([ImagePreprocessService.preprocess_file(str(images[0]), PREPROCESS_PROFILES["fast"])[0]])
+
+    references = {}
+    baseline_ocr = {}
+    for path in images:
+        truth = path.with_suffix(".txt")
+        if truth.exists():
+            references[path] = truth.read_text(encoding="utf-8")
+    profiles = ["off"] + [name for name in args.profiles if name != "off"]
+
+    print(f"{len(images)} images, {len(references)} with ground truth")
+    print(f"{'profile':<10} {'pixels':>8} {'prep ms':>8} {'ocr ms':>8} {'saved ms':>9} {'accuracy':>9}")
+    for name in profiles:
+        profile = PREPROCESS_PROFILES[name]
+        ratios, prep_ms, ocr_ms, scores = [], [], [], []
+        for path in images:
+            array, stats = ImagePreprocessService.preprocess_file(str(path), profile)
+            started = time.perf_counter()
+            text = recognize_batch([array])[0]
+            ocr_ms.append((time.perf_counter() - started) * 1000)
+            prep_ms.append(stats["preprocess_ms"])
+            ratios.append(stats["pixel_ratio"])
+            if name == "off":
+                baseline_ocr[path] = (ocr_ms[-1], text)
+            reference = references.get(path, baseline_ocr[path][1])
+            scores.append(similarity(text, reference))
+        saved = statistics.mean(baseline_ocr[p][0] for p in images) - statistics.mean(ocr_ms) - statistics.mean(prep_ms)
+        print(
+            f"{name:<10} {statistics.mean(ratios):>7.0%} {statistics.mean(prep_ms):>8.0f} "
+            f"{statistics.mean(ocr_ms):>8.0f} {saved:>9.0f} {statistics.mean(scores):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark PDF text extraction: sequential vs page-parallel vs early exit.
+
+Builds a synthetic corpus of long multi-page statements (line-item pages with
+the bill summary on a configurable page, followed by terms-and-conditions pages)
+and times each extraction mode over it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_extraction --docs 5 --pages 100 --summary-page 6
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.services.pdf_text_service import PdfTextService, PDF_EXTRACTION_PROCESSES
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path: str, pages: int, summary_page: int, lines_per_page: int = 55) -> None:
+    """Write a plain-text PDF without third-party dependencies."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled once the page tree id is known
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_no in range(1, pages + 1):
+        lines = [f"ACME Utilities Pvt Ltd - Statement page {page_no} of {pages}"]
+        if page_no < summary_page:
+            for i in range(lines_per_page):
+                item = (page_no - 1) * lines_per_page + i + 1
+                lines.append(f"{item:05d} Item {item} HSN 9983 Qty 1 Rate 120.00 CGST 10.80 SGST 10.80 Amount 141.60")
+        elif page_no == summary_page:
+            lines += ["Subtotal 99120.00", "CGST Total 8920.80", "SGST Total 8920.80", "Grand Total 116961.60"]
+        else:
+            for i in range(lines_per_page):
+                lines.append(f"Terms and conditions clause {page_no}.{i}: charges are subject to applicable tariff orders.")
+
+        stream = "BT /F1 8 Tf 40 800 Td 13 TL " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        content_id = add(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1"))
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>".encode("latin-1")
+        ))
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _time(label: str, fn, corpus: list[str]) -> None:
+    timings = []
+    pages_read = 0
+    for path in corpus:
+        started = time.perf_counter()
+        pages_read += len(fn(path))
+        timings.append(time.perf_counter() - started)
+    print(
+        f"{label:<24} total {sum(timings):7.2f}s  "
+        f"median/doc {statistics.median(timings):6.2f}s  pages read {pages_read}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--summary-page", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"statement_{i}.pdf")
+            write_synthetic_pdf(path, args.pages, args.summary_page)
+            corpus.append(path)
+
+        print(f"{args.docs} docs x {args.pages} pages, summary on page {args.summary_page}, "
+              f"{PDF_EXTRACTION_PROCESSES} worker processes")
+        pages = list(range(args.pages))
+        # Warm the process pool so spawn cost is not charged to the first document
+        PdfTextService.extract_layer_parallel(corpus[0], pages)
+
+        _time("sequential", lambda p: PdfTextService.extract_layer_sequential(p, pages, early_exit=False), corpus)
+        _time("parallel", lambda p: PdfTextService.extract_layer_parallel(p, pages, early_exit=False), corpus)
+        _time("sequential + early exit", lambda p: PdfTextService.extract_layer_sequential(p, pages, early_exit=True), corpus)
+        _time("parallel + early exit", lambda p: PdfTextService.extract_layer_parallel(p, pages, early_exit=True), corpus)
+
+
+if __name__ == "__main__":
+    main()
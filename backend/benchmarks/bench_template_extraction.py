@@ -0,0 +1,50 @@
+"""Template fast-path coverage and latency over a folder of real bills.
+
+For every PDF in the corpus, reports which layout template (if any) matched,
+the confidence its rules reached and the time the rules took. Documents that
+match a layout but fall below TEMPLATE_MIN_CONFIDENCE point at a rule to fix.
+
+Usage (from backend/):
+    python -m benchmarks.bench_template_extraction path/to/bills
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from app.services.pdf_text_service import PdfTextService
+from app.services.template_extraction_service import TemplateExtractionService, TEMPLATE_MIN_CONFIDENCE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path)
+    args = parser.parse_args()
+
+    pdfs = sorted(args.corpus.glob("*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {args.corpus}")
+
+    hits, timings = 0, []
+    print(f"{'file':<40} {'template':<24} {'confidence':>10} {'ms':>7}")
+    for path in pdfs:
+        text = PdfTextService.extract_text(str(path))
+        started = time.perf_counter()
+        template = TemplateExtractionService.fingerprint(text)
+        confidence = None
+        if template is not None:
+            data = TemplateExtractionService.apply(template, text)
+            confidence = TemplateExtractionService.confidence(template, data, text)
+        elapsed = (time.perf_counter() - started) * 1000
+        timings.append(elapsed)
+        if confidence is not None and confidence >= TEMPLATE_MIN_CONFIDENCE:
+            hits += 1
+        print(
+            f"{path.name[:40]:<40} {(template.name if template else '-'):<24} "
+            f"{(f'{confidence:.2f}' if confidence is not None else '-'):>10} {elapsed:>7.2f}"
+        )
+    print(f"\n{hits}/{len(pdfs)} documents extracted without the LLM; rules took {statistics.mean(timings):.2f} ms on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Prompt tokens saved by text compaction, per document and overall.
+
+Runs PDF text extraction and then TextCompactionService over a folder of bills,
+or over synthetic statements (repeated page headers, line items, terms pages)
+when no folder is given, and prints estimated tokens before and after.
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_compaction [path/to/bills] [--show]
+"""
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+from app.services.pdf_text_service import PdfTextService
+from app.services.text_compaction_service import TextCompactionService
+from benchmarks.bench_pdf_extraction import write_synthetic_pdf
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, nargs="?")
+    parser.add_argument("--show", action="store_true", help="print the compacted text of each document")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            pdfs = sorted(args.corpus.glob("*.pdf"))
+        else:
+            pdfs = []
+            for i, (pages, summary_page) in enumerate([(2, 2), (4, 3), (8, 5)]):
+                path = Path(tmp) / f"statement_{i}.pdf"
+                write_synthetic_pdf(str(path), pages, summary_page, lines_per_page=20)
+                pdfs.append(path)
+        if not pdfs:
+            raise SystemExit(f"No PDFs found in {args.corpus}")
+
+        total_before = total_after = 0
+        print(f"{'file':<40} {'pages':>5} {'before':>8} {'after':>8} {'saved':>6} {'ms':>6}  removed")
+        for path in pdfs:
+            pages = PdfTextService.extract_pages(str(path))
+            text, stats = TextCompactionService.compact_pages(pages)
+            total_before += stats["tokens_before"]
+            total_after += stats["tokens_after"]
+            saved = 1 - stats["tokens_after"] / max(1, stats["tokens_before"])
+            print(
+                f"{path.name[:40]:<40} {len(pages):>5} {stats['tokens_before']:>8} {stats['tokens_after']:>8} "
+                f"{saved:>6.0%} {stats['compaction_ms']:>6.1f}  {stats['lines_removed']}"
+            )
+            if args.show:
+                print(text + os.linesep)
+        print(f"\ntotal: {total_before} -> {total_after} tokens ({1 - total_after / max(1, total_before):.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+--
+-- Background extraction job queue (drained by the in-process worker pool)
+--
+
+CREATE TABLE IF NOT EXISTS public.extraction_jobs (
+    id serial PRIMARY KEY,
+    document_id integer NOT NULL REFERENCES public.documents(id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    status character varying NOT NULL DEFAULT 'queued',
+    attempts integer NOT NULL DEFAULT 0,
+    error text,
+    extracted_data_id integer REFERENCES public.extracted_data(id) ON DELETE SET NULL,
+    created_at timestamp without time zone,
+    started_at timestamp without time zone,
+    finished_at timestamp without time zone
+);
+
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_id ON public.extraction_jobs USING btree (id);
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_document_id ON public.extraction_jobs USING btree (document_id);
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_user_id ON public.extraction_jobs USING btree (user_id);
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_status ON public.extraction_jobs USING btree (status);
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_created_at ON public.extraction_jobs USING btree (created_at);
@@ -0,0 +1,16 @@
+--
+-- Content-addressed uploads: documents share one blob per SHA-256 and
+-- extraction results are reused across identical uploads
+--
+
+ALTER TABLE public.documents ADD COLUMN IF NOT EXISTS content_hash character varying(64);
+CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON public.documents USING btree (content_hash);
+
+ALTER TABLE public.documents DROP CONSTRAINT IF EXISTS documents_file_path_key;
+CREATE INDEX IF NOT EXISTS ix_documents_file_path ON public.documents USING btree (file_path);
+
+CREATE TABLE IF NOT EXISTS public.extraction_cache (
+    content_hash character varying(64) PRIMARY KEY,
+    result json NOT NULL,
+    created_at timestamp without time zone
+);
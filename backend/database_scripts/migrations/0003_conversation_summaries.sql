@@ -0,0 +1,16 @@
+--
+-- Rolling chat summaries used by the token-budgeted conversation memory
+--
+
+CREATE TABLE IF NOT EXISTS public.conversation_summaries (
+    id serial PRIMARY KEY,
+    document_id integer NOT NULL REFERENCES public.documents(id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    summary text NOT NULL DEFAULT '',
+    summarized_until_id integer NOT NULL DEFAULT 0,
+    updated_at timestamp without time zone,
+    CONSTRAINT uq_conversation_summaries_document_user UNIQUE (document_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_conversation_summaries_id ON public.conversation_summaries USING btree (id);
+CREATE INDEX IF NOT EXISTS ix_conversation_summaries_document_id ON public.conversation_summaries USING btree (document_id);
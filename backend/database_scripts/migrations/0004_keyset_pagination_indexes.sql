@@ -0,0 +1,6 @@
+--
+-- Composite indexes behind keyset pagination of document lists and chat history
+--
+
+CREATE INDEX IF NOT EXISTS ix_documents_user_uploaded_at_id ON public.documents USING btree (user_id, uploaded_at, id);
+CREATE INDEX IF NOT EXISTS ix_chat_messages_document_user_created_at_id ON public.chat_messages USING btree (document_id, user_id, created_at, id);
@@ -0,0 +1,19 @@
+--
+-- Ranked document search: weighted full-text vector plus trigram text per document.
+-- Rows are written by the application; backfill existing documents afterwards with
+--     python -m app.services.search_service
+--
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+CREATE TABLE IF NOT EXISTS public.document_search (
+    document_id integer PRIMARY KEY REFERENCES public.documents(id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    search_text text NOT NULL DEFAULT '',
+    search_vector tsvector,
+    updated_at timestamp without time zone
+);
+
+CREATE INDEX IF NOT EXISTS ix_document_search_user_vector ON public.document_search USING gin (user_id, search_vector);
+CREATE INDEX IF NOT EXISTS ix_document_search_user_text_trgm ON public.document_search USING gin (user_id, search_text gin_trgm_ops);
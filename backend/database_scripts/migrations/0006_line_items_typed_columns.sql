@@ -0,0 +1,44 @@
+--
+-- Typed reporting columns on extracted_data and a normalized line_items table.
+-- Populate them for existing extractions afterwards with
+--     python -m app.services.bill_normalization_service
+--
+
+ALTER TABLE public.extracted_data
+    ADD COLUMN IF NOT EXISTS invoice_date_value date,
+    ADD COLUMN IF NOT EXISTS order_date_value date,
+    ADD COLUMN IF NOT EXISTS due_date_value date,
+    ADD COLUMN IF NOT EXISTS seller_name character varying,
+    ADD COLUMN IF NOT EXISTS seller_gstin character varying(15),
+    ADD COLUMN IF NOT EXISTS subtotal numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS cgst_total numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS sgst_total numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS igst_total numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS total_tax numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS shipping_charges numeric(14, 2),
+    ADD COLUMN IF NOT EXISTS grand_total numeric(14, 2);
+
+CREATE INDEX IF NOT EXISTS ix_extracted_data_document_id ON public.extracted_data USING btree (document_id);
+CREATE INDEX IF NOT EXISTS ix_extracted_data_invoice_date_value ON public.extracted_data USING btree (invoice_date_value);
+CREATE INDEX IF NOT EXISTS ix_extracted_data_seller_gstin ON public.extracted_data USING btree (seller_gstin);
+
+CREATE TABLE IF NOT EXISTS public.line_items (
+    id serial PRIMARY KEY,
+    extracted_data_id integer NOT NULL REFERENCES public.extracted_data(id) ON DELETE CASCADE,
+    document_id integer NOT NULL REFERENCES public.documents(id) ON DELETE CASCADE,
+    "position" integer NOT NULL,
+    item_name character varying,
+    hsn_sac character varying,
+    quantity numeric(14, 3),
+    gross_amount numeric(14, 2),
+    discount numeric(14, 2),
+    taxable_value numeric(14, 2),
+    cgst numeric(14, 2),
+    sgst numeric(14, 2),
+    igst numeric(14, 2),
+    total_amount numeric(14, 2)
+);
+
+CREATE INDEX IF NOT EXISTS ix_line_items_extracted_data_id ON public.line_items USING btree (extracted_data_id);
+CREATE INDEX IF NOT EXISTS ix_line_items_document_id ON public.line_items USING btree (document_id);
+CREATE INDEX IF NOT EXISTS ix_line_items_hsn_sac ON public.line_items USING btree (hsn_sac);
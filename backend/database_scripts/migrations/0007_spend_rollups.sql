@@ -0,0 +1,20 @@
+--
+-- Per-user spend rollups behind the /analytics endpoints. Populate them for
+-- existing extractions (after 0006 and its backfill) with
+--     python -m app.services.spend_rollup_service
+--
+
+CREATE TABLE IF NOT EXISTS public.spend_rollups (
+    user_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    dimension character varying(16) NOT NULL,
+    bucket character varying NOT NULL,
+    label character varying,
+    bill_count integer NOT NULL DEFAULT 0,
+    total_amount numeric(16, 2) NOT NULL DEFAULT 0,
+    total_tax numeric(16, 2) NOT NULL DEFAULT 0,
+    cgst numeric(16, 2) NOT NULL DEFAULT 0,
+    sgst numeric(16, 2) NOT NULL DEFAULT 0,
+    igst numeric(16, 2) NOT NULL DEFAULT 0,
+    updated_at timestamp without time zone,
+    PRIMARY KEY (user_id, dimension, bucket)
+);
@@ -0,0 +1,19 @@
+--
+-- One extraction per document. Duplicates left by concurrent extractions are
+-- removed first, keeping the oldest; rebuild the spend rollups afterwards with
+--     python -m app.services.spend_rollup_service
+--
+
+UPDATE public.extraction_jobs AS j
+SET extracted_data_id = keep.id
+FROM public.extracted_data AS d
+JOIN (SELECT document_id, min(id) AS id FROM public.extracted_data GROUP BY document_id) AS keep
+    ON keep.document_id = d.document_id
+WHERE j.extracted_data_id = d.id AND d.id <> keep.id;
+
+DELETE FROM public.extracted_data AS d
+USING public.extracted_data AS k
+WHERE d.document_id = k.document_id AND d.id > k.id;
+
+DROP INDEX IF EXISTS public.ix_extracted_data_document_id;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_extracted_data_document_id ON public.extracted_data USING btree (document_id);
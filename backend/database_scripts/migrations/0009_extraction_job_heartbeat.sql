@@ -0,0 +1,11 @@
+--
+-- Lease for running extraction jobs: workers refresh heartbeat_at while they
+-- run a job, and jobs whose heartbeat stops are requeued by any live process
+--
+
+ALTER TABLE public.extraction_jobs ADD COLUMN IF NOT EXISTS heartbeat_at timestamp without time zone;
+
+UPDATE public.extraction_jobs SET heartbeat_at = started_at WHERE status = 'running' AND heartbeat_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_extraction_jobs_running_heartbeat_at
+    ON public.extraction_jobs USING btree (heartbeat_at) WHERE status = 'running';
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import pytest
+
+# app.database and app.auth read these at import time; tests never touch a real server or LLM
+_cache_dir = tempfile.mkdtemp(prefix="querybill-tests-")
+# A file rather than :memory:, so the sync and async engines see the same database
+os.environ.setdefault("SUPABASE_DB_URL", f"sqlite:///{_cache_dir}/test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("OCR_WORKERS", "0")
+os.environ.setdefault("LLM_CACHE_DIR", os.path.join(_cache_dir, "llm"))
+os.environ.setdefault("PAGE_TEXT_CACHE_DIR", os.path.join(_cache_dir, "pages"))
+os.environ.setdefault("STORAGE_LOCAL_DIR", os.path.join(_cache_dir, "uploads"))
+
+
+@pytest.fixture
+def db():
+    """Session on a fresh SQLite schema."""
+    from app.database import Base, SessionLocal, engine
+    from app.models import (  # noqa: F401 (registers every table)
+        chat_message, conversation_summary, document, document_search, extracted_data,
+        extraction_cache, extraction_job, line_item, spend_rollup, user,
+    )
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        yield session
+    Base.metadata.drop_all(bind=engine)
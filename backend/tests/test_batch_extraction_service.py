@@ -0,0 +1,58 @@
+import pytest
+
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.user import User
+from app.services.batch_extraction_service import BatchExtractionService
+from app.services.search_service import SearchIndexService
+
+
+def raw_extraction(total: float) -> dict:
+    return {
+        "bill_id": f"BILL-{total}",
+        "seller": {"name": "Acme"},
+        "items": [{"item_name": "Widget", "quantity": 1, "total_amount": total}],
+        "summary": {"grand_total": total},
+    }
+
+
+@pytest.fixture
+def docs(db):
+    db.add(User(id=1, email_id="a@example.com"))
+    docs = {i: Document(id=i, user_id=1, file_type="pdf", content_hash=f"hash-{i}") for i in (1, 2, 3)}
+    db.add_all(docs.values())
+    db.commit()
+    return docs
+
+
+def test_save_results_bulk_insert(db, docs):
+    failure = ValueError("No text could be extracted from the document")
+    inserted, errors = BatchExtractionService.save_results(db, docs, {1: raw_extraction(10), 2: raw_extraction(20), 3: failure})
+    assert set(inserted) == {1, 2}
+    assert errors == {3: failure}
+    assert db.query(ExtractedData).count() == 2
+
+
+def test_save_results_keeps_existing_extraction(db, docs):
+    db.add(ExtractedData(id=50, document_id=2, bill_id="EARLIER"))
+    db.commit()
+    inserted, errors = BatchExtractionService.save_results(db, docs, {1: raw_extraction(10), 2: raw_extraction(20)})
+    assert inserted[2] == 50 and not errors
+    assert db.query(ExtractedData).filter(ExtractedData.document_id == 2).one().bill_id == "EARLIER"
+
+
+def test_save_results_falls_back_to_single_rows(db, docs, monkeypatch):
+    index_document = SearchIndexService.index_document
+
+    def failing_index(session, doc, row):
+        if doc.id == 2:
+            raise RuntimeError("search index unavailable")
+        index_document(session, doc, row)
+
+    monkeypatch.setattr(SearchIndexService, "index_document", failing_index)
+    inserted, errors = BatchExtractionService.save_results(
+        db, docs, {1: raw_extraction(10), 2: raw_extraction(20), 3: raw_extraction(30)}
+    )
+    assert set(inserted) == {1, 3}
+    assert "search index unavailable" in str(errors[2])
+    assert {row.document_id for row in db.query(ExtractedData)} == {1, 3}
@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+import pytest
+
+from app.models.extracted_data import ExtractedData
+from app.models.line_item import LineItem
+from app.services.bill_normalization_service import BillNormalizationService, parse_number
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("₹1,180.00", Decimal("1180.00")),
+    ("Rs. 2,345.5", Decimal("2345.50")),
+    (99.999, Decimal("100.00")),
+    ("999999999999.99", Decimal("999999999999.99")),
+    ("999999999999.995", None),
+    ("1e12", None),
+    ("abc", None),
+    ("NaN", None),
+    (True, None),
+    (None, None),
+])
+def test_parse_number_amount(value, expected):
+    assert parse_number(value, ExtractedData.grand_total) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2.5", Decimal("2.500")),
+    ("99999999999.999", Decimal("99999999999.999")),
+    ("99999999999.9996", None),
+    ("100000000000", None),
+])
+def test_parse_number_quantity(value, expected):
+    assert parse_number(value, LineItem.quantity) == expected
+
+
+def test_line_item_rows_cap_each_field_by_its_column():
+    rows = BillNormalizationService.line_item_rows(1, 1, [
+        {"item_name": "Bulk", "quantity": "500000000000", "total_amount": "500000000000"},
+    ])
+    assert rows[0]["quantity"] is None
+    assert rows[0]["total_amount"] == Decimal("500000000000.00")
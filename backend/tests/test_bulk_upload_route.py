@@ -0,0 +1,44 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.routes import get_current_user
+from app.auth.user_cache import AuthenticatedUser
+from app.database import get_async_db
+from app.routes import document_route
+
+
+@pytest.fixture
+def client():
+    async def no_session():
+        # Rejected files never reach the database
+        yield None
+
+    app = FastAPI()
+    app.include_router(document_route.router)
+    app.dependency_overrides[get_async_db] = no_session
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(id=1)
+    with TestClient(app) as client:
+        yield client
+
+
+def parts(count: int) -> list:
+    return [("files", (f"note{i}.txt", b"x", "text/plain")) for i in range(count)]
+
+
+def test_more_parts_than_starlettes_default_limit(client, monkeypatch):
+    monkeypatch.setattr(document_route, "BULK_UPLOAD_MAX_FILES", 1200)
+    response = client.post("/documents/upload/bulk", files=parts(1001))
+    assert response.status_code == 200
+    assert response.json()["rejected"] == 1001
+
+
+def test_parts_over_the_bulk_limit_are_refused(client, monkeypatch):
+    monkeypatch.setattr(document_route, "BULK_UPLOAD_MAX_FILES", 5)
+    response = client.post("/documents/upload/bulk", files=parts(6))
+    assert response.status_code == 400
+    assert "Maximum number of files is 5" in response.json()["detail"]
+
+
+def test_files_are_required(client):
+    assert client.post("/documents/upload/bulk", data={"other": "x"}).status_code == 400
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+from app.routes import chat_route
+from app.services import chat_service
+
+
+class SlowStream:
+    """Model stream that blocks before its second chunk until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.closed = threading.Event()
+        self.closed_by = None
+        self.produced = []
+
+    def stream(self, messages):
+        try:
+            for token in ("first", "second", "third"):
+                if token == "second":
+                    self.release.wait(5)
+                self.produced.append(token)
+                yield token
+        finally:
+            self.closed_by = threading.current_thread()
+            self.closed.set()
+
+
+def test_cancelled_stream_is_closed_by_its_producer_thread(monkeypatch):
+    model = SlowStream()
+    monkeypatch.setattr(chat_service, "llm", model)
+    cancelled = threading.Event()
+
+    async def consume_one():
+        tokens = chat_route.stream_in_thread([], cancelled)
+        first = await tokens.__anext__()
+        # Client went away while the producer is blocked reading the next chunk
+        await tokens.aclose()
+        assert cancelled.is_set()
+        model.release.set()
+        assert await asyncio.to_thread(model.closed.wait, 5)
+        return first
+
+    assert asyncio.run(consume_one()) == "first"
+    assert model.closed_by is not threading.main_thread()
+    assert model.produced == ["first", "second"]
+
+
+def test_stream_in_thread_yields_every_token(monkeypatch):
+    model = SlowStream()
+    model.release.set()
+    monkeypatch.setattr(chat_service, "llm", model)
+
+    async def consume_all():
+        return [token async for token in chat_route.stream_in_thread([], threading.Event())]
+
+    assert asyncio.run(consume_all()) == ["first", "second", "third"]
+    assert model.closed.is_set()
@@ -0,0 +1,77 @@
+import pytest
+
+from app.models.chat_message import ChatMessage
+from app.models.conversation_summary import ConversationSummary
+from app.models.document import Document
+from app.models.user import User
+from app.services import conversation_memory_service
+from app.services.conversation_memory_service import ConversationMemory
+
+
+@pytest.fixture
+def folds(monkeypatch):
+    """Records the turn ids of each fold; the summary is the number of turns folded so far."""
+    calls = []
+
+    def summarize(previous_summary, turns):
+        calls.append([turn.id for turn in turns])
+        return str(int(previous_summary or 0) + len(turns))
+
+    monkeypatch.setattr(ConversationMemory, "summarize", staticmethod(summarize))
+    monkeypatch.setattr(conversation_memory_service, "CHAT_MEMORY_MAX_PENDING_TURNS", 10)
+    return calls
+
+
+def add_turns(db, count):
+    db.add(User(id=1, email_id="a@example.com"))
+    db.add(Document(id=1, user_id=1, original_filename="bill.pdf"))
+    db.add_all(ChatMessage(id=i, document_id=1, user_id=1, message="q", response="a") for i in range(1, count + 1))
+    db.commit()
+
+
+def test_backlog_is_folded_in_chunks(db, folds):
+    add_turns(db, 35)
+    window = ConversationMemory.load(db, 1, 1, budget=10_000)
+
+    # 25 backlog turns in chunks of at most 10, oldest first; the newest 10 fit the budget verbatim
+    assert folds == [list(range(1, 11)), list(range(11, 21)), list(range(21, 26))]
+    assert window.summary == "25"
+    assert [turn.id for turn in window.turns] == list(range(26, 36))
+    row = db.query(ConversationSummary).one()
+    assert (row.summary, row.summarized_until_id) == ("25", 25)
+
+
+def test_failed_backlog_fold_keeps_progress(db, folds, monkeypatch):
+    add_turns(db, 35)
+    summarize = ConversationMemory.summarize
+
+    def fail_second(previous_summary, turns):
+        if folds:
+            folds.append(None)
+            raise RuntimeError("model unavailable")
+        return summarize(previous_summary, turns)
+
+    monkeypatch.setattr(ConversationMemory, "summarize", staticmethod(fail_second))
+    window = ConversationMemory.load(db, 1, 1, budget=10_000)
+    assert window.summary == "10"
+    assert [turn.id for turn in window.turns] == list(range(26, 36))
+
+    monkeypatch.setattr(ConversationMemory, "summarize", staticmethod(summarize))
+    folds.clear()
+    assert ConversationMemory.load(db, 1, 1, budget=10_000).summary == "25"
+    assert folds == [list(range(11, 21)), list(range(21, 26))]
+
+
+def test_failed_summary_save_keeps_the_previous_summary(db, folds, monkeypatch):
+    add_turns(db, 5)
+
+    def failing_save(*args):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(ConversationMemory, "save_summary", staticmethod(failing_save))
+    budget = 2 * conversation_memory_service.turn_tokens(db.get(ChatMessage, 1)) + 1
+    window = ConversationMemory.load(db, 1, 1, budget=budget)
+
+    # The folded turns are sent verbatim instead, so they must not also be in the summary
+    assert folds and window.summary is None
+    assert [turn.id for turn in window.turns] == [4, 5]
@@ -0,0 +1,34 @@
+import csv
+import io
+from decimal import Decimal
+
+from app.services.export_service import EXPORT_COLUMNS, ExportService
+
+
+def export_csv(**values):
+    row = dict.fromkeys(EXPORT_COLUMNS)
+    row.update(values)
+    data = b"".join(ExportService.csv_chunks(iter([row]))).decode()
+    return dict(zip(EXPORT_COLUMNS, list(csv.reader(io.StringIO(data)))[1]))
+
+
+def test_csv_escapes_formula_cells():
+    row = export_csv(
+        seller_name="=HYPERLINK(\"http://evil\")",
+        item_name="+SUM(A1:A9)",
+        hsn_sac="-2+3",
+        customer_name="@cmd",
+        invoice_number="\tINV",
+        bill_id="INV-=1",
+    )
+    assert row["seller_name"] == "'=HYPERLINK(\"http://evil\")"
+    assert row["item_name"] == "'+SUM(A1:A9)"
+    assert row["hsn_sac"] == "'-2+3"
+    assert row["customer_name"] == "'@cmd"
+    assert row["invoice_number"] == "'\tINV"
+    assert row["bill_id"] == "INV-=1"
+
+
+def test_csv_keeps_negative_amounts_numeric():
+    row = export_csv(discount=Decimal("-12.50"), grand_total=Decimal("100.00"))
+    assert (row["discount"], row["grand_total"]) == ("-12.50", "100.00")
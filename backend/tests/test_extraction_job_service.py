@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.extraction_job import ExtractionJob
+from app.models.user import User
+from app.services.extraction_job_service import ExtractionJobService, ExtractionWorkerPool
+
+
+def seed(db):
+    db.add_all([User(id=1, email_id="a@example.com"), User(id=2, email_id="b@example.com")])
+    db.add_all([Document(id=i, user_id=1 if i <= 4 else 2, file_type="pdf") for i in range(1, 7)])
+    db.add(ExtractedData(id=9, document_id=4))
+    db.commit()
+
+
+def test_enqueue_batch(db):
+    seed(db)
+    results = ExtractionJobService.enqueue_batch(db, [1, 2, 2, 4, 5, 99], user_id=1)
+    assert [(r["document_id"], r["status"]) for r in results] == [
+        (1, "queued"), (2, "queued"), (4, "exists"), (5, "not_found"), (99, "not_found")
+    ]
+    assert db.query(ExtractionJob).count() == 2
+    # Queued again: the active jobs are reported instead of duplicated
+    again = ExtractionJobService.enqueue_batch(db, [1, 2], user_id=1)
+    assert [r["job_id"] for r in again] == [r["job_id"] for r in results[:2]]
+    assert db.query(ExtractionJob).count() == 2
+
+
+def test_claim_next_groups_one_users_jobs(db):
+    seed(db)
+    db.add_all([
+        ExtractionJob(document_id=5, user_id=2, status="queued"),
+        ExtractionJob(document_id=1, user_id=1, status="queued"),
+        ExtractionJob(document_id=6, user_id=2, status="queued"),
+        ExtractionJob(document_id=2, user_id=1, status="queued"),
+    ])
+    db.commit()
+    jobs = ExtractionJobService.claim_next(db, limit=8)
+    assert [job.document_id for job in jobs] == [5, 6]
+    assert all(job.status == "running" and job.attempts == 1 for job in jobs)
+    assert [job.document_id for job in ExtractionJobService.claim_next(db, limit=1)] == [1]
+
+
+def test_requeue_stale_goes_by_heartbeat(db):
+    seed(db)
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    db.add_all([
+        # Long-running, but its worker is alive and renewing the lease
+        ExtractionJob(id=1, document_id=1, user_id=1, status="running", attempts=1, started_at=long_ago, heartbeat_at=datetime.utcnow()),
+        ExtractionJob(id=2, document_id=2, user_id=1, status="running", attempts=1, started_at=long_ago, heartbeat_at=long_ago),
+        # Claimed before heartbeats existed
+        ExtractionJob(id=3, document_id=3, user_id=1, status="running", attempts=3, started_at=long_ago),
+    ])
+    db.commit()
+    assert ExtractionJobService.requeue_stale(db) == 2
+    assert [db.get(ExtractionJob, i).status for i in (1, 2, 3)] == ["running", "queued", "failed"]
+
+
+def test_heartbeat_renews_running_jobs_only(db):
+    seed(db)
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    db.add_all([
+        ExtractionJob(id=1, document_id=1, user_id=1, status="running", heartbeat_at=long_ago),
+        ExtractionJob(id=2, document_id=2, user_id=1, status="done", heartbeat_at=long_ago),
+    ])
+    db.commit()
+    ExtractionJobService.heartbeat(db, [1, 2])
+    assert db.get(ExtractionJob, 1).heartbeat_at > long_ago
+    assert db.get(ExtractionJob, 2).heartbeat_at == long_ago
+
+
+def test_workers_take_turns_sweeping():
+    pool = ExtractionWorkerPool(workers=0, sweep_interval=3600)
+    assert pool._sweep_due()
+    assert not pool._sweep_due()
+    pool._next_sweep = 0.0
+    assert pool._sweep_due()
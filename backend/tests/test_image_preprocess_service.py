@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_preprocess_service import (
+    FLAT_IMAGE_THRESHOLD,
+    PREPROCESS_PROFILES,
+    ImagePreprocessService,
+    otsu_threshold,
+)
+
+
+@pytest.mark.parametrize("level", [0, 200, 255])
+def test_otsu_threshold_on_uniform_image(level):
+    assert otsu_threshold(np.full((40, 30), level, dtype=np.uint8)) == FLAT_IMAGE_THRESHOLD
+
+
+def test_otsu_threshold_separates_ink_from_paper():
+    gray = np.full((40, 30), 240, dtype=np.uint8)
+    gray[10:20, 5:25] = 20
+    assert 20 <= otsu_threshold(gray) < 240
+
+
+@pytest.mark.parametrize("profile", list(PREPROCESS_PROFILES))
+def test_preprocess_uniform_image(profile):
+    array, stats = ImagePreprocessService.preprocess(Image.new("L", (300, 400), 255), PREPROCESS_PROFILES[profile])
+    assert stats["flat"]
+    assert stats["skew_angle"] == 0.0
+    assert "text_height" not in stats
+    assert array.shape[:2] == (400, 300)
@@ -0,0 +1,95 @@
+import json
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.models.document import Document
+from app.services import extract_data_service
+from app.services.llm_service import CachedProvider, LLMProvider, ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(directory=tmp_path, memory_entries=2, ttl_seconds=60)
+
+
+def test_memory_tier_is_an_lru(cache):
+    cache.directory = None
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == ("B", "C")
+
+
+def test_disk_hit_survives_a_restart(cache, tmp_path):
+    cache.set("ab12", "response")
+    assert ResponseCache(directory=tmp_path).get("ab12") == "response"
+
+
+def test_expired_disk_entry_is_removed(cache, tmp_path):
+    path = cache._path("ab12")
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({"created": time.time() - 120, "response": "old"}))
+    assert cache.get("ab12") is None
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("content", [
+    '{"created": 1',
+    '{"response": "no timestamp"}',
+    '{"created": "soon", "response": "x"}',
+    '{"created": 1e12, "response": null}',
+    '["not", "an", "object"]',
+])
+def test_malformed_disk_entry_is_a_miss_and_removed(cache, content):
+    path = cache._path("ab12")
+    path.parent.mkdir(parents=True)
+    path.write_text(content)
+    assert cache.get("ab12") is None
+    assert not path.exists()
+
+
+class ScriptedProvider(LLMProvider):
+    name = "scripted"
+
+    def __init__(self, replies):
+        super().__init__("scripted", 0)
+        self.replies = list(replies)
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return self.replies.pop(0)
+
+
+def test_forget_drops_cached_reply(cache):
+    provider = ScriptedProvider(["bad", "good"])
+    llm = CachedProvider(provider, cache)
+    messages = [HumanMessage(content="prompt")]
+    assert llm.invoke(messages) == "bad"
+    assert llm.invoke(messages) == "bad"
+    llm.forget(messages)
+    assert llm.invoke(messages) == "good"
+    assert provider.calls == 2
+
+
+def test_unparsable_extraction_is_not_served_from_cache_on_retry(cache, monkeypatch):
+    provider = ScriptedProvider(['{"bill_id": "TRUNC', '{"bill_id": "OK"}'])
+    monkeypatch.setattr(extract_data_service, "llm", CachedProvider(provider, cache))
+    doc = Document(id=1, file_type="pdf")
+    with pytest.raises(RuntimeError):
+        extract_data_service.ExtractionService.extract_from_text(doc, "Invoice total 10.00")
+    assert extract_data_service.ExtractionService.extract_from_text(doc, "Invoice total 10.00")["bill_id"] == "OK"
+    assert provider.calls == 2
+
+
+def test_unparsable_batch_reply_is_not_served_from_cache_on_retry(cache, monkeypatch):
+    from app.services import batch_extraction_service
+
+    provider = ScriptedProvider(['{"not": "an array"}', '[{"document_key": "1", "bill_id": "OK"}]'])
+    monkeypatch.setattr(batch_extraction_service, "llm", CachedProvider(provider, cache))
+    group = [(Document(id=1, file_type="pdf"), "Invoice total 10.00")]
+    with pytest.raises(ValueError):
+        batch_extraction_service.BatchExtractionService.extract_group(group)
+    assert batch_extraction_service.BatchExtractionService.extract_group(group)[1]["bill_id"] == "OK"
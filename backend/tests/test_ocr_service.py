@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.ocr_service import OcrBusyError, OcrEngine, OcrTimeoutError
+
+
+class BlockingPool:
+    """Stands in for the worker processes: every batch runs until release is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    def submit(self, fn, images):
+        return self._executor.submit(lambda: self.release.wait(5) and ["text"] * len(images))
+
+
+@pytest.fixture
+def engine():
+    engine = OcrEngine(workers=1, max_pending=1, queue_timeout=0.05, job_timeout=0.05)
+    pool = BlockingPool()
+    engine._get_pool = lambda: pool
+    yield engine, pool
+    pool.release.set()
+
+
+def test_timed_out_batch_keeps_its_slot_until_it_finishes(engine):
+    engine, pool = engine
+    image = np.zeros((4, 4), dtype=np.uint8)
+    with pytest.raises(OcrTimeoutError):
+        engine.recognize([image])
+    # The overrunning batch still occupies the only slot
+    with pytest.raises(OcrBusyError):
+        engine.recognize([image])
+
+    pool.release.set()
+    engine.queue_timeout = 1
+    assert engine.recognize([image]) == ["text"]
+
+
+class RecordingPool:
+    """Stands in for the worker processes, recording the size of every batch."""
+
+    def __init__(self):
+        self.batches = []
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    def submit(self, fn, images):
+        self.batches.append(len(images))
+        return self._executor.submit(lambda: [f"text {int(image[0, 0])}" for image in images])
+
+
+def test_concurrent_single_images_share_a_batch():
+    engine = OcrEngine(workers=1, max_pending=2, batch_window_ms=2000, batch_max_images=4)
+    pool = RecordingPool()
+    engine._get_pool = lambda: pool
+    images = [np.full((4, 4), i, dtype=np.uint8) for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        texts = list(callers.map(engine.recognize_one, images))
+    # A full batch is sent without waiting out the window
+    assert pool.batches == [4]
+    assert texts == [f"text {i}" for i in range(4)]
+
+    # Alone, it goes once the window has passed
+    engine.batch_window = 0.01
+    assert engine.recognize_one(images[1]) == "text 1"
+    assert pool.batches == [4, 1]
+
+
+def test_batch_error_reaches_every_caller(engine):
+    engine, pool = engine
+    engine.batch_window, engine.batch_max_images = 1, 2
+    image = np.zeros((4, 4), dtype=np.uint8)
+    with ThreadPoolExecutor(max_workers=2) as callers:
+        futures = [callers.submit(engine.recognize_one, image) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(OcrTimeoutError):
+                future.result()
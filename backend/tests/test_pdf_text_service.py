@@ -0,0 +1,63 @@
+import os
+import time
+
+from app.services.pdf_text_service import PageTextCache
+
+
+def test_page_text_cache_round_trip(tmp_path):
+    cache = PageTextCache("abc", cache_dir=tmp_path)
+    assert cache.load() == {}
+    cache.store(0, "first page")
+    cache.store(2, "third page")
+    assert PageTextCache("abc", cache_dir=tmp_path).load() == {0: "first page", 2: "third page"}
+
+
+def test_evict_drops_least_recently_used_files(tmp_path):
+    for age, key in enumerate(["new", "used", "old"]):
+        cache = PageTextCache(key, cache_dir=tmp_path)
+        cache.store(0, "x" * 100)
+        os.utime(cache.directory, (1000 - age * 100, 1000 - age * 100))
+    # Reading "used" makes it the most recent one
+    PageTextCache("used", cache_dir=tmp_path).load()
+
+    PageTextCache.evict(tmp_path, max_bytes=250)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new", "used"]
+    PageTextCache.evict(tmp_path, max_bytes=150)
+    assert [path.name for path in tmp_path.iterdir()] == ["used"]
+
+
+def test_store_evicts_every_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(PageTextCache, "EVICTION_INTERVAL", 1)
+    PageTextCache("old", cache_dir=tmp_path, max_bytes=150).store(0, "x" * 100)
+    os.utime(tmp_path / "old", (1000, 1000))
+    PageTextCache("new", cache_dir=tmp_path, max_bytes=150).store(0, "y" * 100)
+    assert [path.name for path in tmp_path.iterdir()] == ["new"]
+
+
+def test_remove(tmp_path):
+    PageTextCache("abc", cache_dir=tmp_path).store(0, "text")
+    PageTextCache.remove("abc", cache_dir=tmp_path)
+    PageTextCache.remove("missing", cache_dir=tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pool_is_created_once_under_concurrency(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services import pdf_text_service
+
+    created = []
+
+    class SlowPool:
+        def __init__(self, **kwargs):
+            time.sleep(0.05)
+            created.append(self)
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(pdf_text_service, "_pool", None)
+    monkeypatch.setattr(pdf_text_service, "ProcessPoolExecutor", SlowPool)
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        pools = list(threads.map(lambda _: pdf_text_service._get_pool(), range(8)))
+    assert len(created) == 1 and all(pool is created[0] for pool in pools)
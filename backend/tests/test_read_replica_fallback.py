@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.user_cache import AuthenticatedUser
+from app.database import Base, async_engine
+from app.models.document import Document
+from app.models.extracted_data import ExtractedData
+from app.models.user import User
+from app.routes import document_route, extract_document_router
+from app.services import read_your_writes
+from app.services.read_your_writes import ReadYourWrites
+
+USER = AuthenticatedUser(id=1)
+
+
+@pytest.fixture
+def lagging_replica(db, tmp_path, monkeypatch):
+    """An empty copy of the schema standing in for a replica that hasn't replayed the primary's writes."""
+    db.add(User(id=1, email_id="a@example.com"))
+    db.add(Document(id=1, user_id=1, original_filename="bill.pdf", file_type="pdf", status="active"))
+    db.add(ExtractedData(id=1, document_id=1, bill_id="BILL-1"))
+    db.commit()
+
+    url = f"sqlite:///{tmp_path}/replica.db"
+    Base.metadata.create_all(bind=create_engine(url))
+    monkeypatch.setattr(extract_document_router, "has_read_replica", lambda: True)
+    monkeypatch.setattr(read_your_writes, "has_read_replica", lambda: True)
+    monkeypatch.setattr(read_your_writes, "_last_writes", read_your_writes.LRUCache(max_entries=10, ttl_seconds=30))
+    return url
+
+
+def test_get_extracted_falls_back_to_primary(lagging_replica):
+    with sessionmaker(bind=create_engine(lagging_replica))() as replica:
+        data = extract_document_router.get_extracted(1, db=replica, current_user=USER)
+    assert data.bill_id == "BILL-1"
+    with sessionmaker(bind=create_engine(lagging_replica))() as replica:
+        with pytest.raises(HTTPException) as missing:
+            extract_document_router.get_extracted(2, db=replica, current_user=USER)
+    assert missing.value.status_code == 404
+
+
+def list_first_page(replica_url):
+    async def first_page():
+        engine = create_async_engine(replica_url.replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with AsyncSession(engine) as replica:
+                return await document_route.list_docs(
+                    Response(), q=None, file_type=None, status_filter=None, cursor=None, offset=0, limit=100,
+                    user=USER, db=replica,
+                )
+        finally:
+            await engine.dispose()
+            # The primary's pooled aiosqlite connections belong to this event loop
+            await async_engine.dispose()
+
+    return [doc["id"] for doc in asyncio.run(first_page())]
+
+
+def test_list_docs_stays_on_replica_without_recent_writes(lagging_replica):
+    assert list_first_page(lagging_replica) == []
+
+
+def test_list_docs_falls_back_to_primary_after_the_users_write(db, lagging_replica):
+    ReadYourWrites.record(db, USER.id)
+    assert list_first_page(lagging_replica) == [1]
+    # Other users' reads are unaffected
+    assert not ReadYourWrites.replica_behind(db, 2)
+
+
+class ReplicaSession:
+    """Replica-side session answering the replay-position check."""
+
+    def __init__(self, caught_up):
+        self.caught_up = caught_up
+        self.params = None
+
+    def execute(self, statement, params):
+        self.params = params
+        return self
+
+    def scalar(self):
+        return self.caught_up
+
+
+def test_replica_behind_compares_wal_positions(monkeypatch):
+    monkeypatch.setattr(read_your_writes, "has_read_replica", lambda: True)
+    monkeypatch.setattr(read_your_writes, "_last_writes", read_your_writes.LRUCache(max_entries=10, ttl_seconds=30))
+    read_your_writes._last_writes.set(1, "0/3000060")
+
+    assert ReadYourWrites.replica_behind(ReplicaSession(False), 1)
+    replica = ReplicaSession(True)
+    assert not ReadYourWrites.replica_behind(replica, 1)
+    assert replica.params == {"position": "0/3000060"}
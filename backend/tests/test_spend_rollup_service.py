@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.elements import ColumnClause, Null, TextClause
+
+from app.models import user  # noqa: F401 (registers the users table the rollups reference)
+from app.services.spend_rollup_service import SpendRollupService
+
+
+class RecordingSession:
+    """Stands in for a Postgres session: records statements instead of running them."""
+
+    def __init__(self):
+        self.statements = []
+        self.bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    def get_bind(self):
+        return self.bind
+
+    def execute(self, statement, *args):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=0)
+
+    def commit(self):
+        pass
+
+
+def is_constant(expression) -> bool:
+    return isinstance(expression, (Null, TextClause)) or (isinstance(expression, ColumnClause) and expression.is_literal)
+
+
+@pytest.mark.parametrize("user_id", [None, 7])
+def test_rebuild_queries_compile_for_postgres(user_id):
+    db = RecordingSession()
+    SpendRollupService.rebuild(db, user_id)
+
+    inserts = db.statements[1:]
+    assert len(inserts) == 4
+    for statement in inserts:
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("INSERT INTO spend_rollups")
+        # Postgres: "non-integer constant in GROUP BY"
+        group_by = statement.select._group_by_clauses
+        assert group_by and not any(is_constant(expression) for expression in group_by)
+        assert "GROUP BY documents.user_id" in sql
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from moto import mock_aws
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.auth.routes import get_current_user, get_current_user_readonly
+from app.auth.user_cache import AuthenticatedUser
+from app.database import ASYNC_DATABASE_URL, get_async_db
+from app.models.document import Document
+from app.models.user import User
+from app.routes import document_route
+from app.services.pdf_text_service import PageTextCache
+from app.services.storage_service import LocalStorage, S3Storage, blob_key, parse_byte_range
+
+BODY = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-50", (950, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=10-5", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-10", None),
+    ("bytes=-", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_parse_byte_range_not_satisfiable(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 1000)
+
+
+def staged(backend, data: bytes = BODY) -> str:
+    fd, path = tempfile.mkstemp(dir=backend.temp_dir())
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        yield LocalStorage(tmp_path / "blobs")
+        return
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="bills")
+        yield S3Storage("bills", prefix="docs/", region="us-east-1")
+
+
+def test_put_is_create_once(backend):
+    key = blob_key(hashlib.sha256(BODY).hexdigest(), ".pdf")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        created = list(pool.map(lambda _: backend.put(staged(backend), key, "application/pdf"), range(8)))
+    assert created.count(True) == 1
+    assert backend.stat(key).size == len(BODY)
+    assert b"".join(backend.iter_range(key, 0, len(BODY) - 1)) == BODY
+
+
+def test_iter_range(backend):
+    backend.put(staged(backend), "ab/cd/blob.pdf")
+    assert b"".join(backend.iter_range("ab/cd/blob.pdf", 100, 199)) == BODY[100:200]
+    assert b"".join(backend.iter_range("ab/cd/blob.pdf", len(BODY) - 1, len(BODY) - 1)) == BODY[-1:]
+
+
+@pytest.fixture
+def client(db, backend, monkeypatch):
+    """The document routes over one stored PDF, on the given storage backend."""
+    content_hash = hashlib.sha256(BODY).hexdigest()
+    key = blob_key(content_hash, ".pdf")
+    backend.put(staged(backend), key, "application/pdf")
+    db.add(User(id=1, email_id="a@example.com"))
+    db.add(Document(id=1, user_id=1, original_filename="bill.pdf", file_path=key, file_size=len(BODY),
+                    file_type="pdf", content_hash=content_hash))
+    db.commit()
+    monkeypatch.setattr(document_route, "storage", backend)
+
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+
+    async def session():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(document_route.router)
+    app.dependency_overrides[get_async_db] = session
+    app.dependency_overrides[get_current_user_readonly] = lambda: AuthenticatedUser(id=1)
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(id=1)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_download_etag_and_revalidation(client):
+    full = client.get("/documents/1")
+    assert full.status_code == 200 and full.content == BODY
+    etag = full.headers["etag"]
+    assert etag == f'"{hashlib.sha256(BODY).hexdigest()}"'
+    assert full.headers["accept-ranges"] == "bytes"
+    assert client.get("/documents/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/documents/1", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/documents/1", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_download_ranges(client):
+    etag = client.get("/documents/1").headers["etag"]
+
+    part = client.get("/documents/1", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+    assert part.content == BODY[100:200]
+
+    suffix = client.get("/documents/1", headers={"Range": "bytes=-50"})
+    assert suffix.status_code == 206 and suffix.content == BODY[-50:]
+
+    beyond = client.get("/documents/1", headers={"Range": f"bytes={len(BODY)}-"})
+    assert beyond.status_code == 416
+
+    stale = client.get("/documents/1", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == BODY
+    fresh = client.get("/documents/1", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert fresh.status_code == 206 and fresh.content == BODY[:10]
+
+
+def test_delete_keeps_shared_blob_until_last_document(client, db, backend):
+    key = db.get(Document, 1).file_path
+    db.add(Document(id=2, user_id=1, original_filename="copy.pdf", file_path=key, file_size=len(BODY), file_type="pdf"))
+    db.commit()
+    assert client.delete("/documents/1").status_code == 200
+    assert backend.stat(key) is not None
+    assert client.delete("/documents/2").status_code == 200
+    assert backend.stat(key) is None
+
+
+def test_delete_removes_cached_pages_with_last_blob(client, db):
+    content_hash = db.get(Document, 1).content_hash
+    pages = PageTextCache(content_hash)
+    pages.store(0, "page text")
+    db.add(Document(id=2, user_id=1, original_filename="copy.pdf", file_path=db.get(Document, 1).file_path,
+                    file_size=len(BODY), file_type="pdf", content_hash=content_hash))
+    db.commit()
+    assert client.delete("/documents/1").status_code == 200
+    assert pages.load() == {0: "page text"}
+    assert client.delete("/documents/2").status_code == 200
+    assert not pages.directory.exists()
+
+
+def test_failed_delete_keeps_blob(client, db, backend, monkeypatch):
+    key = db.get(Document, 1).file_path
+
+    async def failing_commit(self):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+    assert client.delete("/documents/1").status_code == 500
+    assert backend.stat(key) is not None
+
+
+def test_delete_keeps_blob_reused_by_upload_committed_meanwhile(client, db, backend, monkeypatch):
+    key = db.get(Document, 1).file_path
+    lock_blobs = document_route.lock_blobs
+
+    def upload_wins_the_lock(session, keys):
+        # An upload of the same bytes takes the blob's lock first and commits its document
+        db.add(Document(id=2, user_id=1, original_filename="again.pdf", file_path=key, file_size=len(BODY), file_type="pdf"))
+        db.commit()
+        lock_blobs(session, keys)
+
+    monkeypatch.setattr(document_route, "lock_blobs", upload_wins_the_lock)
+    assert client.delete("/documents/1").status_code == 200
+    # References are re-checked under the lock, so the new document keeps its blob
+    assert backend.stat(key) is not None
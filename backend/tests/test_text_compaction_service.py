@@ -0,0 +1,43 @@
+from app.services.text_compaction_service import TextCompactionService
+
+
+def compact(page: str) -> list[str]:
+    return TextCompactionService.compact_pages([page])[0].splitlines()
+
+
+def test_terms_block_is_dropped():
+    lines = compact(
+        "Item A 100.00\n"
+        "Terms & Conditions\n"
+        "1. Goods once sold will not be taken back.\n"
+        "2. Interest @18% p.a. is charged on late payment.\n"
+        "Grand Total 100.00"
+    )
+    assert lines == ["Item A 100.00", "Grand Total 100.00"]
+
+
+def test_fields_after_terms_block_are_kept():
+    lines = compact(
+        "Item A 100.00\n"
+        "Terms & Conditions\n"
+        "Goods once sold will not be taken back.\n"
+        "Due Date: 12-03-2024\n"
+        "GSTIN 29ABCDE1234F1Z5\n"
+        "Total ₹1,200\n"
+        "T&C\n"
+        "Warranty is void if the seal is broken.\n"
+        "\n"
+        "Ravi Kumar, 12 MG Road, Bengaluru"
+    )
+    assert lines == [
+        "Item A 100.00",
+        "Due Date: 12-03-2024",
+        "GSTIN 29ABCDE1234F1Z5",
+        "Total ₹1,200",
+        "Ravi Kumar, 12 MG Road, Bengaluru",
+    ]
+
+
+def test_date_ends_terms_block():
+    lines = compact("Terms and Conditions\nNo returns after 7 days.\nPayable by 5 Mar 2024")
+    assert lines == ["Payable by 5 Mar 2024"]
@@ -0,0 +1,28 @@
+from app.auth.user_cache import AuthenticatedUser, UserCache
+
+
+def test_invalidate_rejects_lookups_that_raced_with_the_update():
+    cache = UserCache(max_entries=10)
+    before = cache.generation()
+    cache.invalidate(1)
+    # A lookup that read the user before the update finished
+    cache.set(1, "token", AuthenticatedUser(id=1, first_name="old"), before)
+    assert cache.get(1, "token") is None
+
+    cache.set(1, "token", AuthenticatedUser(id=1, first_name="new"), cache.generation())
+    assert cache.get(1, "token").first_name == "new"
+
+
+def test_invalidations_are_bounded():
+    cache = UserCache(max_entries=3)
+    cache.set(99, "token", AuthenticatedUser(id=99), cache.generation())
+    for user_id in range(100):
+        cache.invalidate(user_id)
+    assert len(cache._invalidated) == 3
+
+    # Entries older than a forgotten invalidation are looked up again
+    assert cache.get(99, "token") is None
+    cache.set(99, "token", AuthenticatedUser(id=99), cache.generation())
+    assert cache.get(99, "token") == AuthenticatedUser(id=99)
+    cache.set(5, "token", AuthenticatedUser(id=5), cache.generation())
+    assert cache.get(5, "token") == AuthenticatedUser(id=5)
@@ -95,7 +95,21 @@ export async function downloadDocumentApi(docId) {
 }
 
 
+const EXTRACTION_POLL_INTERVAL_MS = 1500;
+
+export async function getExtractionJobApi(jobId) {
+  const response = await axios.get(`${API_BASE}/document/extract/jobs/${jobId}`, {
+    headers: {
+      ...getAuthHeaders(),
+    },
+    withCredentials: true,
+  });
+  return response.data;
+}
+
+// Queues extraction and resolves once the background job has finished
 export async function extractDocumentApi(docId) {
+  let job;
   try {
     const response = await axios.post(`${API_BASE}/document/extract/${docId}`, null, {
       headers: {
@@ -103,13 +117,22 @@ export async function extractDocumentApi(docId) {
       },
       withCredentials: true,
     });
-    return response.data;
+    job = response.data;
   } catch (error) {
     if (error.response?.status === 404) {
       throw new Error("Document not found");
     }
     throw error;
   }
+
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, EXTRACTION_POLL_INTERVAL_MS));
+    job = await getExtractionJobApi(job.id);
+  }
+  if (job.status === "failed") {
+    throw new Error(job.error || "Extraction failed");
+  }
+  return job;
 }
 
 export async function getExtractedDocumentApi(docId) {